@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+"""
+edit-config throughput benchmark
+Streams a generated bulk subscriber load through netconf_edit_config and
+reports entries per second and the peak memory used while parsing.
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'management-plane', 'netconf-server'))
+
+from datastore import Datastore
+from netconf_edit import apply_config, config_events
+
+
+class SubscriberFeed:
+    """File-like object generating a <config> with count subscribers on the fly"""
+
+    def __init__(self, count, operation="merge"):
+        self.count = count
+        self.operation = operation
+        self._next = 0
+        self._pending = (b'<config xmlns:nc="urn:ietf:params:xml:ns:netconf:base:1.0">'
+                         b'<subscribers>')
+
+    def read(self, size=65536):
+        while len(self._pending) < size and self._next <= self.count:
+            if self._next == self.count:
+                self._pending += b'</subscribers></config>'
+            else:
+                imsi = 1010000000000 + self._next
+                self._pending += (
+                    f'<subscriber nc:operation="{self.operation}"><imsi>00{imsi}</imsi>'
+                    f'<msisdn>{imsi}</msisdn><status>active</status><apn>internet</apn>'
+                    f'<qci>9</qci><arp>8</arp><ambr><uplink>100000000</uplink>'
+                    f'<downlink>200000000</downlink></ambr></subscriber>'
+                ).encode()
+            self._next += 1
+        data, self._pending = self._pending[:size], self._pending[size:]
+        return data
+
+
+def empty_store():
+    return Datastore({
+        "network-functions": {"amf": [], "smf": [], "upf": []},
+        "subscribers": {"subscriber": []},
+        "sessions": {"pdu-session": []},
+        "qos-profiles": {"profile": []}
+    })
+
+
+def run(count, operation, trace_memory):
+    datastore = empty_store()
+    if operation in ("delete", "remove"):
+        # Remove the first half of a populated list, so every later entry moves
+        apply_config(datastore, config_events(SubscriberFeed(2 * count)))
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    applied = apply_config(datastore, config_events(SubscriberFeed(count, operation)))
+    elapsed = time.perf_counter() - start
+    peak = None
+    if trace_memory:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return applied, elapsed, peak, len(datastore)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=100000, help="subscribers per edit-config")
+    parser.add_argument("--operations", default="merge,replace,delete", help="comma separated operations")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="report peak traced memory (slows the run down)")
+    args = parser.parse_args()
+
+    print(f"edit-config of {args.count} subscribers")
+    for operation in args.operations.split(","):
+        applied, elapsed, peak, stored = run(args.count, operation, args.trace_memory)
+        line = f"  {operation:8s} {applied / elapsed:12,.0f} entries/s  {elapsed:7.2f} s  stored={stored}"
+        if peak is not None:
+            line += f"  peak={peak / 1e6:.1f} MB"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+"""
+get-config rendering benchmark
+Fills a datastore with generated subscribers and sessions and times full
+get-config renders: the first (cold) read, repeated (warm) reads, and a
+read after a single entry was written. It also compares the peak memory of
+building one reply string with streaming the reply in chunks.
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'management-plane', 'netconf-server'))
+
+from datastore import Datastore
+from netconf_filter import select_all, select_entries
+from netconf_render import ConfigRenderer
+
+SUBSCRIBERS = ("subscribers", "subscriber")
+SESSIONS = ("sessions", "pdu-session")
+
+
+def populated_store(count):
+    datastore = Datastore({
+        "network-functions": {"amf": [], "smf": [], "upf": []},
+        "subscribers": {"subscriber": []},
+        "sessions": {"pdu-session": []},
+        "qos-profiles": {"profile": []}
+    })
+    for i in range(count):
+        imsi = f"00101{i:010d}"
+        datastore.create(SUBSCRIBERS, {
+            "imsi": imsi, "msisdn": str(1000000000 + i), "status": "active", "apn": "internet",
+            "qci": 9, "arp": 8, "ambr": {"uplink": "100000000", "downlink": "200000000"}
+        })
+        datastore.create(SESSIONS, {
+            "session-id": f"session-{i}", "imsi": imsi, "status": "active", "sst": 1, "dnn": "internet",
+            "qos": {"qfi": 1, "arp": 8}
+        })
+    return datastore
+
+
+def timed(renderer, datastore):
+    start = time.perf_counter()
+    data = renderer.render(select_entries(datastore, select_all()))
+    return time.perf_counter() - start, len(data)
+
+
+def peak_memory(function):
+    tracemalloc.start()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=200000, help="subscribers and sessions to generate")
+    parser.add_argument("--repeat", type=int, default=5, help="warm reads to average")
+    args = parser.parse_args()
+
+    datastore = populated_store(args.count)
+    renderer = ConfigRenderer(datastore)
+    print(f"get-config of {args.count} subscribers and {args.count} sessions")
+
+    cold, size = timed(renderer, datastore)
+    print(f"  cold          {cold * 1000:10.1f} ms  ({size / 1e6:.1f} MB)")
+    warm = sum(timed(renderer, datastore)[0] for _ in range(args.repeat)) / args.repeat
+    print(f"  warm          {warm * 1000:10.1f} ms")
+    datastore.merge(SUBSCRIBERS, {"imsi": "001010000000000", "status": "inactive"})
+    after_write, _ = timed(renderer, datastore)
+    print(f"  after 1 write {after_write * 1000:10.1f} ms")
+
+    datastore.merge(SUBSCRIBERS, {"imsi": "001010000000000", "status": "active"})
+    joined = peak_memory(lambda: renderer.render(select_entries(datastore, select_all())))
+    streamed = peak_memory(lambda: sum(len(chunk) for chunk in
+                                       renderer.iter_render(select_entries(datastore, select_all()))))
+    print(f"  peak memory per reply: joined {joined / 1e6:.1f} MB, streamed {streamed / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+"""
+NETCONF notification fan-out benchmark
+Publishes nf-state-change events to a notification stream with many
+subscribed sessions and reports the cost of delivering each event to
+every subscriber, without and with a per-subscriber filter.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'management-plane', 'netconf-server'))
+
+from lxml import etree
+
+from datastore import Datastore
+from netconf_notify import NotificationStream, NfStateMonitor, NOTIFICATION_NS
+
+UPFS = ("network-functions", "upf")
+
+
+def create_subscription(nf_type=None):
+    body = ""
+    if nf_type is not None:
+        body = (f'<filter><nf-state-change xmlns="urn:5g-core:notifications"><nf-type>{nf_type}</nf-type>'
+                '</nf-state-change></filter>')
+    return etree.fromstring(f'<create-subscription xmlns="{NOTIFICATION_NS}">{body}</create-subscription>')
+
+
+async def run(subscribers, events, nf_type):
+    loop = asyncio.get_running_loop()
+    stream = NotificationStream(queue_limit=events)
+    datastore = Datastore({"network-functions": {"amf": [], "smf": [], "upf": []},
+                           "subscribers": {"subscriber": []}, "sessions": {"pdu-session": []},
+                           "qos-profiles": {"profile": []}})
+    NfStateMonitor(datastore, stream)
+    subscriptions = [stream.subscribe(create_subscription(nf_type), lambda: None, lambda: None, loop)
+                     for _ in range(subscribers)]
+
+    start = time.perf_counter()
+    for i in range(events):
+        datastore.merge(UPFS, {"id": f"upf-{i % 100}", "status": "active", "capacity": i})
+    # Let the queued fan-out callbacks run
+    await asyncio.sleep(0)
+    elapsed = time.perf_counter() - start
+    delivered = sum(len(subscription.queue) for subscription in subscriptions)
+    return elapsed, delivered
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--subscribers", type=int, default=500, help="subscribed sessions")
+    parser.add_argument("--events", type=int, default=2000, help="datastore writes producing an event each")
+    args = parser.parse_args()
+
+    print(f"{args.events} events to {args.subscribers} subscribers")
+    for label, nf_type in (("unfiltered", None), ("filtered", "upf")):
+        elapsed, delivered = asyncio.run(run(args.subscribers, args.events, nf_type))
+        print(f"  {label:11} {elapsed / args.events * 1e6:8.1f} us/event  "
+              f"{elapsed / max(delivered, 1) * 1e9:8.0f} ns/delivery  ({delivered} queued)")
+
+
+if __name__ == "__main__":
+    main()
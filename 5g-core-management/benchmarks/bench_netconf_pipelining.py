@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+
+"""
+NETCONF pipelining benchmark
+Runs the NETCONF transport over a generated subscriber datastore and sends
+a mix of filtered <get> reads and small edit-config writes on one session,
+once waiting for every reply before sending the next RPC and once with up
+to --window RPCs in flight, and reports RPCs per second for both.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'management-plane', 'netconf-server'))
+
+import netconf_server
+from netconf_framing import EOM_DELIMITER
+from netconf_transport import NetconfServer
+
+SUBSCRIBERS = ("subscribers", "subscriber")
+APNS = ("internet", "ims", "iot", "enterprise")
+
+CLIENT_HELLO = (
+    b'<hello xmlns="urn:ietf:params:xml:ns:netconf:base:1.0"><capabilities>'
+    b'<capability>urn:ietf:params:netconf:base:1.0</capability>'
+    b'</capabilities></hello>' + EOM_DELIMITER
+)
+
+
+def populate(count):
+    for i in range(count):
+        imsi = f"00102{i:010d}"
+        netconf_server.datastore.create(SUBSCRIBERS, {
+            "imsi": imsi, "msisdn": str(1000000000 + i), "status": "active",
+            "apn": APNS[i % 100] if i % 100 < len(APNS) else "internet",
+            "qci": 9, "arp": 8, "ambr": {"uplink": "100000000", "downlink": "200000000"}
+        })
+
+
+def workload(rpcs, count, write_every):
+    """Return the framed RPCs of the benchmark"""
+    messages = []
+    for n in range(rpcs):
+        if write_every and n % write_every == write_every - 1:
+            body = ('<edit-config><target><running/></target><config><subscribers><subscriber>'
+                    f'<imsi>00102{n % count:010d}</imsi><status>{"inactive" if n % 2 else "active"}</status>'
+                    '</subscriber></subscribers></config></edit-config>')
+        elif n % 4 == 0:
+            body = f'<get><filter type="xpath" select="/subscribers/subscriber[apn=\'{APNS[n % 3 + 1]}\']"/></get>'
+        else:
+            body = (f'<get><filter type="xpath" select="/subscribers/subscriber'
+                    f'[msisdn=\'{1000000000 + n % count}\']"/></get>')
+        messages.append(f'<rpc message-id="{n}" xmlns="urn:ietf:params:xml:ns:netconf:base:1.0">'
+                        f'{body}</rpc>'.encode() + EOM_DELIMITER)
+    return messages
+
+
+async def run_session(host, port, messages, window):
+    reader, writer = await asyncio.open_connection(host, port, limit=2 ** 26)
+    await reader.readuntil(EOM_DELIMITER)
+    writer.write(CLIENT_HELLO)
+    slots = asyncio.Semaphore(window)
+
+    async def send():
+        for message in messages:
+            await slots.acquire()
+            writer.write(message)
+            await writer.drain()
+
+    start = time.perf_counter()
+    sender = asyncio.create_task(send())
+    for n in range(len(messages)):
+        reply = await reader.readuntil(EOM_DELIMITER)
+        if f'message-id="{n}"'.encode() not in reply[:200]:
+            raise RuntimeError(f"reply {n} out of order")
+        slots.release()
+    elapsed = time.perf_counter() - start
+    await sender
+    writer.close()
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=50000, help="subscribers in the datastore")
+    parser.add_argument("--rpcs", type=int, default=2000, help="RPCs per run")
+    parser.add_argument("--write-every", type=int, default=10, help="make every Nth RPC an edit-config (0 for none)")
+    parser.add_argument("--window", type=int, default=32, help="RPCs in flight when pipelining")
+    parser.add_argument("--workers", type=int, default=4, help="server read workers")
+    args = parser.parse_args()
+
+    populate(args.count)
+    server = NetconfServer(netconf_server.netconf_hello_handler, netconf_server.RPC_HANDLERS,
+                           port=0, stream_handlers=netconf_server.STREAM_HANDLERS,
+                           workers=args.workers, pipeline_depth=args.window)
+    loop = asyncio.new_event_loop()
+    host, port = loop.run_until_complete(server.start())
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+
+    messages = workload(args.rpcs, args.count, args.write_every)
+    print(f"{args.rpcs} RPCs on one session over {args.count} subscribers "
+          f"(every {args.write_every or 'no'}th an edit-config)")
+    for label, window in (("one at a time", 1), (f"pipelined x{args.window}", args.window)):
+        elapsed = asyncio.run(run_session(host, port, messages, window))
+        print(f"  {label:16} {args.rpcs / elapsed:10.0f} RPCs/s  ({elapsed * 1000:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
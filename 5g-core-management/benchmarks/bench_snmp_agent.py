@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+
+"""
+SNMP agent request rate benchmark
+Starts the SNMP agent on loopback with the pysnmp (asyncore) dispatcher
+and with the asyncio transport, without and with its response cache, keeps
+a window of GET or GETBULK requests in flight from one or more client
+processes, and reports the sustained responses per second of each.
+"""
+
+import argparse
+import multiprocessing
+import os
+import socket
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'management-plane', 'snmp-monitor'))
+
+from pyasn1.codec.ber import encoder
+from pysnmp.proto.api import v2c
+
+import snmp_agent
+
+UPF_TABLE = snmp_agent.BASE_OID + (2, 3)
+
+
+def encode_request(pdu, oids, **fields):
+    v2c.apiPDU.setDefaults(pdu)
+    v2c.apiPDU.setVarBinds(pdu, [(oid, v2c.Null()) for oid in oids])
+    for name, value in fields.items():
+        getattr(v2c.apiBulkPDU, 'set' + name)(pdu, value)
+    message = v2c.Message()
+    v2c.apiMessage.setDefaults(message)
+    v2c.apiMessage.setCommunity(message, snmp_agent.COMMUNITY)
+    v2c.apiMessage.setPDU(message, pdu)
+    return encoder.encode(message)
+
+
+REQUESTS = {
+    "get": lambda args: encode_request(v2c.GetRequestPDU(), [oid + (0,) for oid, _ in
+                                                             snmp_agent.METRIC_OBJECTS.values()]),
+    "getbulk": lambda args: encode_request(v2c.GetBulkRequestPDU(), [UPF_TABLE], NonRepeaters=0,
+                                           MaxRepetitions=args.max_repetitions),
+    # The whole 5G subtree: the metrics and every NF table row
+    "walk": lambda args: encode_request(v2c.GetBulkRequestPDU(), [snmp_agent.BASE_OID], NonRepeaters=0,
+                                        MaxRepetitions=args.instances * 5 + 9)
+}
+
+
+def free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def run_agent(transport, port, workers, cache_size, instances):
+    agent = snmp_agent.SNMPAgent(nf_url=None, collectors=[], host='127.0.0.1', port=port,
+                                 transport=transport, workers=workers, cache_size=cache_size)
+    agent.nf_tables.sync({"upf": [{"id": f"upf-{i:04d}", "status": "active", "capacity": i % 100,
+                                   "address": "10.0.0.1", "gtp-u-port": 2152} for i in range(instances)]})
+    sys.stdout = open(os.devnull, 'w')
+    agent.start()
+
+
+def run_client(port, payload, window, duration, results):
+    address = ('127.0.0.1', port)
+    client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    client.settimeout(0.5)
+    # Wait until the agent answers
+    deadline = time.monotonic() + 10
+    while True:
+        client.sendto(payload, address)
+        try:
+            client.recv(65535)
+            break
+        except socket.timeout:
+            if time.monotonic() > deadline:
+                results.put(0)
+                return
+    responses = 0
+    for _ in range(window):
+        client.sendto(payload, address)
+    end = time.monotonic() + duration
+    while time.monotonic() < end:
+        try:
+            client.recv(65535)
+        except socket.timeout:
+            # Lost requests shrink the window: refill it
+            for _ in range(window):
+                client.sendto(payload, address)
+            continue
+        responses += 1
+        client.sendto(payload, address)
+    results.put(responses)
+
+
+def measure(transport, workers, cache_size, payload, args):
+    context = multiprocessing.get_context('fork')
+    port = free_port()
+    agent = context.Process(target=run_agent, args=(transport, port, workers, cache_size, args.instances))
+    agent.start()
+    results = context.Queue()
+    clients = [context.Process(target=run_client, args=(port, payload, args.window, args.duration, results))
+               for _ in range(args.clients)]
+    for client in clients:
+        client.start()
+    responses = sum(results.get() for _ in clients)
+    for client in clients:
+        client.join()
+    agent.terminate()
+    agent.join()
+    return responses / args.duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--duration", type=float, default=5, help="seconds measured per run")
+    parser.add_argument("--window", type=int, default=16, help="requests in flight per client")
+    parser.add_argument("--clients", type=int, default=1, help="client processes, each with its own socket")
+    parser.add_argument("--workers", type=int, default=1, help="asyncio agent worker processes (SO_REUSEPORT)")
+    parser.add_argument("--instances", type=int, default=200, help="UPF table rows for GETBULK")
+    parser.add_argument("--max-repetitions", type=int, default=25, help="GETBULK max-repetitions")
+    args = parser.parse_args()
+
+    runs = [("asyncore", 1, 0), ("asyncio", 1, 0), ("asyncio", 1, snmp_agent.RESPONSE_CACHE_SIZE)]
+    if args.workers > 1:
+        runs.append(("asyncio", args.workers, snmp_agent.RESPONSE_CACHE_SIZE))
+    for request in REQUESTS:
+        payload = REQUESTS[request](args)
+        for transport, workers, cache_size in runs:
+            rate = measure(transport, workers, cache_size, payload, args)
+            label = transport + (" cached" if cache_size else "") + (f" x{workers}" if workers > 1 else "")
+            print(f"{request:8} {label:20} {rate:10.0f} req/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+"""
+SNMP Prometheus exporter benchmark
+Publishes the metrics of a fleet of polled targets to the exporter, then
+scrapes /metrics from several concurrent clients over keep-alive
+connections and reports scrapes per second, for the cached exposition and
+for rendering the exposition on every scrape.
+"""
+
+import argparse
+import http.client
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'management-plane', 'snmp-monitor'))
+
+from snmp_exporter import MetricsExporter, serve_metrics
+from snmp_poller import OID_LIST
+
+
+class RenderPerScrape(MetricsExporter):
+    """An exporter that renders its exposition for every scrape"""
+
+    @property
+    def body(self):
+        text = self.render(self.polls).encode()
+        return text, text
+
+    @body.setter
+    def body(self, value):
+        pass
+
+
+def scrape(port, duration, counts, use_gzip):
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    headers = {'Accept-Encoding': 'gzip'} if use_gzip else {}
+    deadline = time.perf_counter() + duration
+    count = 0
+    while time.perf_counter() < deadline:
+        connection.request('GET', '/metrics', headers=headers)
+        connection.getresponse().read()
+        count += 1
+    connection.close()
+    counts.append(count)
+
+
+def run(exporter, clients, duration, use_gzip):
+    server = serve_metrics(exporter, '127.0.0.1', 0)
+    counts = []
+    threads = [threading.Thread(target=scrape, args=(server.server_address[1], duration, counts, use_gzip))
+               for _ in range(clients)]
+    try:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        server.shutdown()
+        server.server_close()
+    return sum(counts) / duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--targets", type=int, default=1000)
+    parser.add_argument("--clients", type=int, default=8, help="concurrent scrapers")
+    parser.add_argument("--duration", type=float, default=3, help="seconds each configuration is scraped")
+    parser.add_argument("--gzip", action="store_true", help="scrape with Accept-Encoding: gzip")
+    args = parser.parse_args()
+
+    timestamp = datetime.now().isoformat()
+    polls = {f'nf-{i:04d}': dict({name: str(i * 10 + index) for index, (name, _) in enumerate(OID_LIST)},
+                                 latency_ms=1.5, timestamp=timestamp) for i in range(args.targets)}
+    cached = MetricsExporter()
+    for target, metrics in polls.items():
+        cached.append(target, metrics)
+    started = time.perf_counter()
+    cached.publish()
+    print(f"Rendered {args.targets} targets ({len(cached.body[0]) / 1e3:.0f} kB, "
+          f"{len(cached.body[1]) / 1e3:.0f} kB gzipped) in {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    rendering = RenderPerScrape()
+    rendering.polls = polls
+    print(f"cached exposition:   {run(cached, args.clients, args.duration, args.gzip):8.0f} scrapes/s")
+    print(f"render per scrape:   {run(rendering, args.clients, args.duration, False):8.0f} scrapes/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+"""
+SNMP fleet poller benchmark
+Serves the agent's metrics on many loopback ports from one process, with
+the asyncio transport, and polls a fleet of targets spread over them (plus
+optionally some that never answer) with the fleet poller, reporting the
+time and poller CPU per polling cycle.
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'management-plane', 'snmp-monitor'))
+
+import snmp_agent
+from snmp_fleet import FleetPoller, Target
+from snmp_mib import MibTree
+from snmp_transport import SnmpResponder, serve
+
+
+def run_agents(count, addresses):
+    tree = MibTree()
+    snmp_agent.register_metrics(tree)
+    responder = SnmpResponder(tree)
+
+    async def main():
+        servers = []
+        for _ in range(count):
+            started = asyncio.get_running_loop().create_future()
+            servers.append(asyncio.ensure_future(serve(responder, '127.0.0.1', 0, started=started.set_result)))
+            addresses.put(await started)
+        await asyncio.gather(*servers)
+
+    asyncio.run(main())
+
+
+async def cycle(poller):
+    results = 0
+    async for _ in poller.poll():
+        results += 1
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--targets", type=int, default=1000, help="agents polled per cycle")
+    parser.add_argument("--ports", type=int, default=100, help="agent endpoints the targets are spread over")
+    parser.add_argument("--unreachable", type=int, default=0, help="extra targets that never answer")
+    parser.add_argument("--concurrency", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=1.0)
+    parser.add_argument("--cycles", type=int, default=5)
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('fork')
+    addresses = context.Queue()
+    agents = context.Process(target=run_agents, args=(args.ports, addresses))
+    agents.start()
+    try:
+        ports = [addresses.get(timeout=30) for _ in range(args.ports)]
+        targets = [Target(f'nf-{i:04d}', *ports[i % len(ports)]) for i in range(args.targets)]
+        # Nothing listens on the discard port
+        targets += [Target(f'down-{i:04d}', '127.0.0.1', 9) for i in range(args.unreachable)]
+        poller = FleetPoller(targets, concurrency=args.concurrency, timeout=args.timeout)
+        for _ in range(args.cycles):
+            wall, cpu = time.perf_counter(), time.process_time()
+            results = asyncio.run(cycle(poller))
+            wall, cpu = time.perf_counter() - wall, time.process_time() - cpu
+            print(f"{results} targets in {wall:6.3f} s, poller CPU {cpu:6.3f} s "
+                  f"({results / wall:8.0f} targets/s)")
+        print(f"responses {poller.stats['responses']}, timeouts {poller.stats['timeouts']}, "
+              f"retries {poller.stats['retries']}")
+    finally:
+        agents.terminate()
+        agents.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+"""
+SNMP poller latency benchmark
+Starts the SNMP agent on loopback and polls its nine metrics the way the
+poller used to, one GET with a fresh engine and transport per metric, and
+with the packed multi-OID GET over the poller's long-lived engine, and
+reports the wall-clock latency and poller CPU time per poll of each. It
+then polls every object of the agent, NF table rows included, by walking
+the whole subtree with GETBULK and from the layout cached by the walk.
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'management-plane', 'snmp-monitor'))
+
+from pysnmp.hlapi import getCmd, SnmpEngine, CommunityData, UdpTransportTarget, ContextData, ObjectType, ObjectIdentity
+
+import snmp_agent
+import snmp_poller
+from bench_snmp_agent import free_port
+
+
+def run_agent(transport, port, instances):
+    agent = snmp_agent.SNMPAgent(nf_url=None, collectors=[], host='127.0.0.1', port=port, transport=transport,
+                                 workers=1)
+    agent.nf_tables.sync({"upf": [{"id": f"upf-{i:04d}", "status": "active", "capacity": i % 100,
+                                   "address": "10.0.0.1", "gtp-u-port": 2152} for i in range(instances)]})
+    sys.stdout = open(os.devnull, 'w')
+    agent.start()
+
+
+def poll_per_oid():
+    """The previous poller: one GET, engine and transport per metric"""
+    values = {}
+    for name, oid in snmp_poller.OID_LIST:
+        errorIndication, errorStatus, _, varBinds = next(getCmd(
+            SnmpEngine(), CommunityData(snmp_poller.SNMP_COMMUNITY),
+            UdpTransportTarget((snmp_poller.SNMP_TARGET, snmp_poller.SNMP_PORT)), ContextData(),
+            ObjectType(ObjectIdentity(oid))))
+        values[name] = None if errorIndication or errorStatus else varBinds[0][1]
+    return values
+
+
+def poll_packed():
+    return snmp_poller.snmp_get_many([oid for _, oid in snmp_poller.OID_LIST])
+
+
+def poll_walk(max_repetitions):
+    """Every object of the agent, walking the subtree on every poll"""
+    return snmp_poller.SubtreePoller(max_repetitions=max_repetitions, rediscover=0).poll
+
+
+def poll_layout(max_repetitions):
+    """Every object of the agent, from the layout found by the first poll's walk"""
+    return snmp_poller.SubtreePoller(max_repetitions=max_repetitions, rediscover=float('inf')).poll
+
+
+def measure(poll, duration):
+    """Poll for at least duration seconds; return the mean latency and CPU time per poll"""
+    if None in poll().values():
+        raise RuntimeError("agent did not answer every metric")
+    polls = 0
+    wall, cpu = time.perf_counter(), time.process_time()
+    while time.perf_counter() - wall < duration:
+        poll()
+        polls += 1
+    return (time.perf_counter() - wall) / polls, (time.process_time() - cpu) / polls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--duration", type=float, default=10, help="seconds measured per method")
+    parser.add_argument("--transport", choices=("asyncore", "asyncio"), default="asyncore",
+                        help="agent transport")
+    parser.add_argument("--instances", type=int, default=200, help="UPF table rows served by the agent")
+    parser.add_argument("--max-repetitions", type=int, default=snmp_poller.MAX_REPETITIONS,
+                        help="GETBULK max-repetitions of the subtree polls")
+    args = parser.parse_args()
+
+    port = free_port()
+    agent = multiprocessing.get_context('fork').Process(target=run_agent, args=(args.transport, port, args.instances))
+    agent.start()
+    snmp_poller.SNMP_TARGET, snmp_poller.SNMP_PORT = '127.0.0.1', port
+    try:
+        # Wait until the agent answers
+        deadline = time.monotonic() + 10
+        while None in poll_packed().values():
+            if time.monotonic() > deadline:
+                raise RuntimeError("agent did not start")
+        for label, poll in (("per-OID GETs", poll_per_oid), ("packed GET", poll_packed),
+                            ("subtree walk", poll_walk(args.max_repetitions)),
+                            ("cached layout", poll_layout(args.max_repetitions))):
+            latency, cpu = measure(poll, args.duration)
+            print(f"{label:14} {latency * 1000:8.2f} ms/poll {cpu * 1000:8.2f} ms CPU/poll")
+    finally:
+        agent.terminate()
+        agent.join()
+
+
+if __name__ == "__main__":
+    main()
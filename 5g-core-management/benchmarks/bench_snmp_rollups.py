@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+
+"""
+SNMP metric rollup benchmark
+Feeds a generated history of polls of the nine agent metrics to the rollup
+engine and to the raw time-series store, reporting the ingest cost per poll,
+and then times dashboard queries (min/max/avg/p95 per bucket of one metric)
+over ranges from an hour to the whole history, answered from the rollups
+and computed from the raw samples.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'management-plane', 'snmp-monitor'))
+
+from snmp_poller import OID_LIST
+from snmp_rollups import RollupEngine
+from snmp_store import MetricStore
+
+NAMES = [name for name, _ in OID_LIST]
+
+
+def raw_rollup(store, metric, start, end, resolution):
+    """Compute the rollup series of a metric from the raw samples, as a query without rollups would"""
+    times, values = store.series('nf', metric, start, end)
+    buckets = ((times - start) // resolution).astype(np.int64)
+    edges = np.flatnonzero(np.diff(buckets)) + 1
+    groups = np.split(values, edges)
+    return {'min': [group.min() for group in groups], 'max': [group.max() for group in groups],
+            'avg': [group.mean() for group in groups], 'p95': [np.percentile(group, 95) for group in groups]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--interval", type=float, default=10, help="seconds between polls")
+    parser.add_argument("--repeat", type=int, default=5, help="times each query is run")
+    args = parser.parse_args()
+
+    count = int(args.days * 86400 / args.interval)
+    rng = np.random.default_rng(1)
+    values = rng.integers(0, 100000, size=(count, len(NAMES))).astype(str)
+    polls = [dict(zip(NAMES, row), timestamp=index * args.interval) for index, row in enumerate(values)]
+
+    engine = RollupEngine()
+    store = MetricStore(capacity=count)
+    started = time.perf_counter()
+    for metrics in polls:
+        engine.append('nf', metrics)
+    rollup_time = time.perf_counter() - started
+    started = time.perf_counter()
+    for metrics in polls:
+        store.append('nf', metrics)
+    store_time = time.perf_counter() - started
+    print(f"{count} polls: rollups {rollup_time / count * 1e6:.0f} us/poll, "
+          f"raw store {store_time / count * 1e6:.0f} us/poll, rollup memory {engine.nbytes() / 1e6:.1f} MB")
+
+    end = count * args.interval
+    print(f"{'range':>8} {'resolution':>11} {'points':>7} {'rollups ms':>11} {'raw ms':>9}")
+    for label, seconds in (('1h', 3600), ('1d', 86400), ('7d', 7 * 86400), (f'{args.days}d', args.days * 86400)):
+        start = max(0, end - seconds)
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            series = engine.query('nf', 'upf_throughput', start, end)
+        rollup_ms = (time.perf_counter() - started) / args.repeat * 1000
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            raw_rollup(store, 'upf_throughput', start, end, series['resolution'])
+        raw_ms = (time.perf_counter() - started) / args.repeat * 1000
+        print(f"{label:>8} {series['resolution']:>10}s {len(series['time']):>7} {rollup_ms:>11.2f} {raw_ms:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+
+"""
+SNMP metric export load benchmark
+Generates a month of poll results for the nine agent metrics and writes them
+as the poller's CSV file, as its per-poll JSON files (a sample of them, the
+rest extrapolated) and as binary columnar segments, then reports the size of
+each and the time to load it back into per-metric arrays, and the time to
+read one day out of the month from the segments.
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'management-plane', 'snmp-monitor'))
+
+from snmp_poller import OID_LIST
+from snmp_segments import SegmentLog
+from snmp_store import parse_timestamp
+
+NAMES = [name for name, _ in OID_LIST]
+
+
+def poll_results(count, interval, start=1704067200):
+    rng = np.random.default_rng(1)
+    values = rng.integers(0, 100000, size=(count, len(NAMES)))
+    for row in range(count):
+        metrics = {name: str(value) for name, value in zip(NAMES, values[row])}
+        metrics['timestamp'] = datetime.fromtimestamp(start + row * interval).isoformat()
+        yield metrics
+
+
+def load_csv(path):
+    columns = {name: [] for name in ['timestamp'] + NAMES}
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            columns['timestamp'].append(parse_timestamp(row['timestamp']))
+            for name in NAMES:
+                columns[name].append(float(row[name]) if row[name] != 'N/A' else np.nan)
+    return {name: np.array(values) for name, values in columns.items()}
+
+
+def load_json(paths):
+    columns = {name: [] for name in ['timestamp'] + NAMES}
+    for path in paths:
+        with open(path) as f:
+            metrics = json.load(f)
+        columns['timestamp'].append(parse_timestamp(metrics['timestamp']))
+        for name in NAMES:
+            columns[name].append(float(metrics[name]) if metrics[name] != 'N/A' else np.nan)
+    return {name: np.array(values) for name, values in columns.items()}
+
+
+def size(paths):
+    return sum(os.path.getsize(path) for path in paths) / 1e6
+
+
+def timed(function, *args):
+    started = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--interval", type=float, default=10, help="seconds between polls")
+    parser.add_argument("--json-samples", type=int, default=8640, help="per-poll JSON files actually written")
+    parser.add_argument("--dtype", default="<f8", help="type of the segment metric columns")
+    args = parser.parse_args()
+
+    count = int(args.days * 86400 / args.interval)
+    directory = tempfile.mkdtemp()
+    try:
+        csv_path = os.path.join(directory, 'metrics.csv')
+        segments = os.path.join(directory, 'segments')
+        started = time.perf_counter()
+        with open(csv_path, 'w', newline='') as f, SegmentLog(segments, args.dtype) as log:
+            writer = csv.writer(f)
+            writer.writerow(['timestamp'] + NAMES)
+            for row, metrics in enumerate(poll_results(count, args.interval)):
+                writer.writerow([metrics['timestamp']] + [metrics[name] for name in NAMES])
+                log.append(metrics)
+                if row < args.json_samples:
+                    with open(os.path.join(directory, f'metrics_{row:07d}.json'), 'w') as out:
+                        json.dump(metrics, out, indent=2)
+        print(f"Generated {count} polls of {len(NAMES)} metrics in {time.perf_counter() - started:.1f} s")
+
+        json_paths = sorted(glob.glob(os.path.join(directory, 'metrics_*.json')))
+        _, csv_time = timed(load_csv, csv_path)
+        _, json_time = timed(load_json, json_paths)
+        json_time *= count / len(json_paths)
+        segment_paths = glob.glob(os.path.join(segments, '*.seg'))
+        with SegmentLog(segments) as log:
+            (times, values), segment_time = timed(log.read)
+            assert len(times) == count
+            day = times[0] + 86400 * (args.days // 2)
+            (day_times, _), day_time = timed(log.read, day, day + 86400)
+
+        print(f"{'format':<20} {'MB':>9} {'load s':>9}")
+        print(f"{'CSV':<20} {size([csv_path]):9.1f} {csv_time:9.3f}")
+        print(f"{'JSON (extrapolated)':<20} {size(json_paths) * count / len(json_paths):9.1f} {json_time:9.3f}")
+        print(f"{'segments':<20} {size(segment_paths):9.1f} {segment_time:9.3f}")
+        print(f"One day ({len(day_times)} polls) from the segments: {day_time * 1000:.2f} ms "
+              f"({csv_time / segment_time:.0f}x faster full load than CSV)")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+
+"""
+Opt-in request profiler for the management plane Flask apps
+Profiles a sample of requests and writes aggregated, flamegraph-compatible
+stack dumps so slow request types can be investigated in production.
+
+Configuration (environment variables):
+    MGMT_PROFILE              off (default), on, or header
+                              'header' only profiles requests carrying the
+                              X-Profile header, 'on' also samples 1 in N
+    MGMT_PROFILE_SAMPLE_RATE  profile one in every N requests (default 100)
+    MGMT_PROFILE_ROUTES       comma separated endpoints or URL rules that
+                              are always profiled
+    MGMT_PROFILE_MODE         sampler (default) or cprofile
+    MGMT_PROFILE_INTERVAL     sampler interval in seconds (default 0.001)
+    MGMT_PROFILE_DIR          output directory (default ./profiles)
+
+The sampler mode writes one '<endpoint>.folded' file per route in the
+collapsed stack format understood by flamegraph.pl and speedscope. The
+cprofile mode writes one aggregated '<endpoint>.pstats' file per route; as
+only one cProfile profiler may be active per process, requests picked while
+another one is being profiled are skipped (and counted). Dumps are written
+by a background thread every few seconds, off the request path.
+"""
+
+import atexit
+import cProfile
+import itertools
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+
+PROFILE_HEADER = 'X-Profile'
+
+
+class StackSampler:
+    """Background thread sampling the stacks of threads being profiled"""
+
+    def __init__(self, interval=0.001):
+        self.interval = interval
+        self.counts = {}
+        self._active = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def start(self, thread_id, name):
+        """Start sampling a thread on behalf of a route"""
+        with self._lock:
+            self._active[thread_id] = name
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='request-profiler')
+                self._thread.daemon = True
+                self._thread.start()
+        self._wakeup.set()
+
+    def stop(self, thread_id):
+        """Stop sampling a thread"""
+        with self._lock:
+            self._active.pop(thread_id, None)
+
+    def snapshot(self, name):
+        """Return the (folded stack, count) pairs sampled so far for a route"""
+        with self._lock:
+            return list(self.counts.get(name, Counter()).items())
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while True:
+            self._wakeup.wait()
+            with self._lock:
+                active = dict(self._active)
+                if not active:
+                    self._wakeup.clear()
+                    continue
+            frames = sys._current_frames()
+            for thread_id, name in active.items():
+                frame = frames.get(thread_id)
+                if frame is None or thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+                stack.reverse()
+                folded = ';'.join(stack)
+                with self._lock:
+                    self.counts.setdefault(name, Counter())[folded] += 1
+            time.sleep(self.interval)
+
+
+class RequestProfiler:
+    """Decides which requests to profile and writes aggregated dumps"""
+
+    def __init__(self, mode='on', sample_rate=100, routes=(), profiler='sampler',
+                 interval=0.001, output_dir='profiles', flush_interval=5.0):
+        self.mode = mode
+        self.sample_rate = max(1, int(sample_rate))
+        self.routes = set(routes)
+        self.profiler = profiler
+        self.output_dir = output_dir
+        self.flush_interval = flush_interval
+        self.sampler = StackSampler(interval) if profiler == 'sampler' else None
+        self.stats = {}
+        self.skipped = 0
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._cprofile_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}
+        self._dirty = set()
+        self._flusher = None
+
+    def should_profile(self, endpoint, rule, headers):
+        """Return True if this request should be profiled"""
+        if headers.get(PROFILE_HEADER):
+            return True
+        if self.mode != 'on':
+            return False
+        if endpoint in self.routes or rule in self.routes:
+            return True
+        return next(self._counter) % self.sample_rate == 0
+
+    def begin(self, name):
+        """Start profiling the current request, returning a token for end() or None when skipped"""
+        if self.sampler is not None:
+            thread_id = threading.get_ident()
+            self.sampler.start(thread_id, name)
+            return (name, thread_id)
+        if not self._cprofile_lock.acquire(blocking=False):
+            with self._lock:
+                self.skipped += 1
+            return None
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiling tool (a debugger or coverage) is already active
+            self._cprofile_lock.release()
+            with self._lock:
+                self.skipped += 1
+            return None
+        return (name, profile)
+
+    def end(self, token):
+        """Stop profiling a request; its samples are aggregated and written by the flusher"""
+        name, handle = token
+        if self.sampler is not None:
+            self.sampler.stop(handle)
+        else:
+            handle.disable()
+            self._cprofile_lock.release()
+        with self._lock:
+            if self.sampler is None:
+                self._pending.setdefault(name, []).append(handle)
+            self._dirty.add(name)
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run_flusher, name='request-profiler-flush')
+                self._flusher.daemon = True
+                self._flusher.start()
+
+    def _run_flusher(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError as e:
+                print(f"Error writing request profiles: {e}")
+
+    def flush(self):
+        """Write the aggregated dumps of every route profiled since the last flush"""
+        with self._flush_lock:
+            with self._lock:
+                dirty, self._dirty = self._dirty, set()
+                pending, self._pending = self._pending, {}
+            if not dirty:
+                return
+            os.makedirs(self.output_dir, exist_ok=True)
+            for name in dirty:
+                filename = re.sub(r'[^A-Za-z0-9_.-]', '_', name)
+                path = os.path.join(self.output_dir, filename)
+                if self.sampler is not None:
+                    with open(path + '.folded', 'w') as f:
+                        for stack, count in self.sampler.snapshot(name):
+                            f.write(f"{stack} {count}\n")
+                else:
+                    for handle in pending.get(name, ()):
+                        if name in self.stats:
+                            self.stats[name].add(handle)
+                        else:
+                            self.stats[name] = pstats.Stats(handle)
+                    self.stats[name].dump_stats(path + '.pstats')
+
+
+def profiler_from_env(environ=None):
+    """Build a RequestProfiler from MGMT_PROFILE_* variables, or None when off"""
+    environ = os.environ if environ is None else environ
+    mode = environ.get('MGMT_PROFILE', 'off').lower()
+    if mode in ('1', 'true', 'yes'):
+        mode = 'on'
+    if mode not in ('on', 'header'):
+        return None
+    routes = [r.strip() for r in environ.get('MGMT_PROFILE_ROUTES', '').split(',') if r.strip()]
+    return RequestProfiler(
+        mode=mode,
+        sample_rate=int(environ.get('MGMT_PROFILE_SAMPLE_RATE', 100)),
+        routes=routes,
+        profiler=environ.get('MGMT_PROFILE_MODE', 'sampler').lower(),
+        interval=float(environ.get('MGMT_PROFILE_INTERVAL', 0.001)),
+        output_dir=environ.get('MGMT_PROFILE_DIR', 'profiles')
+    )
+
+
+def install_request_profiler(app, profiler=None):
+    """Attach the request profiler to a Flask app
+
+    Nothing is registered when profiling is off, so disabled apps pay no
+    per-request cost at all.
+    """
+    if profiler is None:
+        profiler = profiler_from_env()
+    if profiler is None:
+        return None
+
+    from flask import g, request
+
+    @app.before_request
+    def _start_profile():
+        rule = request.url_rule.rule if request.url_rule is not None else None
+        if profiler.should_profile(request.endpoint, rule, request.headers):
+            token = profiler.begin(request.endpoint or 'unmatched')
+            if token is not None:
+                g._request_profile = token
+
+    @app.teardown_request
+    def _stop_profile(exc):
+        token = g.pop('_request_profile', None)
+        if token is not None:
+            profiler.end(token)
+
+    atexit.register(profiler.flush)
+    app.extensions['request_profiler'] = profiler
+    return profiler
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+
+"""
+Keyed datastore for the 5G Core NETCONF server
+Wraps the network_data dictionary and keeps an index from each YANG list
+key to the entry's position, so lookups and writes by key are O(1)
+instead of scanning the lists; removals close the gap so the lists keep
+their insertion order, and a run of removals closes all its gaps in one
+pass over the list. Frequently filtered leaves also get a
+secondary index from leaf value to entry keys.
+
+Writes take the datastore's lock exclusively while reads may share it, so
+a reader holding the read side sees a consistent snapshot for as long as
+it needs, e.g. while a large reply is streamed.
+"""
+
+import threading
+from contextlib import contextmanager
+from itertools import count
+from operator import itemgetter
+
+# YANG lists held in the datastore and their key leaf
+LIST_KEYS = {
+    ("network-functions", "amf"): "id",
+    ("network-functions", "smf"): "id",
+    ("network-functions", "upf"): "id",
+    ("subscribers", "subscriber"): "imsi",
+    ("sessions", "pdu-session"): "session-id",
+    ("qos-profiles", "profile"): "profile-id"
+}
+
+# Lists nested inside list entries and their key leaf
+NESTED_LIST_KEYS = {
+    ("network-functions", "smf", "upf"): "id"
+}
+
+# Integer leaves (uint8/uint16 in the YANG models), as paths inside an entry
+INTEGER_LEAVES = {
+    ("network-functions", "amf"): {"capacity", "region-id", "set-id", "pointer"},
+    ("network-functions", "smf"): {"capacity"},
+    ("network-functions", "upf"): {"capacity", "gtp-u-port"},
+    ("subscribers", "subscriber"): {"qci", "arp"},
+    ("sessions", "pdu-session"): {"sst", "qos/qfi", "qos/arp"},
+    ("qos-profiles", "profile"): {"qfi", "priority-level", "packet-delay-budget"}
+}
+
+# Leaves with a secondary index (value -> keys) used by get-config filters
+INDEXED_LEAVES = {
+    ("network-functions", "amf"): ("status",),
+    ("network-functions", "smf"): ("status",),
+    ("network-functions", "upf"): ("status", "address"),
+    ("subscribers", "subscriber"): ("status", "msisdn", "apn"),
+    ("sessions", "pdu-session"): ("imsi", "status", "dnn"),
+    ("qos-profiles", "profile"): ("qfi", "resource-type")
+}
+
+
+class DatastoreError(Exception):
+    """Base class for datastore write errors"""
+
+
+class DataExistsError(DatastoreError):
+    """Raised when creating an entry whose key already exists"""
+
+
+class DataMissingError(DatastoreError):
+    """Raised when deleting or updating an entry that does not exist"""
+
+
+class ReadWriteLock:
+    """Lock shared by readers and held exclusively by one writer
+
+    Waiting writers block new readers so a stream of reads cannot starve
+    them. The write side is re-entrant and the thread holding it may also
+    read. The read side is counted rather than owned, so it can be
+    released from another thread than the one that acquired it.
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = None
+        self._writer_depth = 0
+        self._writers_waiting = 0
+
+    def acquire_read(self):
+        """Take the shared side"""
+        with self._condition:
+            if self._writer == threading.get_ident():
+                self._writer_depth += 1
+                return
+            while self._writer is not None or self._writers_waiting:
+                self._condition.wait()
+            self._readers += 1
+
+    def release_read(self):
+        """Release the shared side"""
+        with self._condition:
+            if self._writer == threading.get_ident():
+                self._writer_depth -= 1
+                return
+            self._readers -= 1
+            if not self._readers:
+                self._condition.notify_all()
+
+    def acquire_write(self):
+        """Take the exclusive side"""
+        me = threading.get_ident()
+        with self._condition:
+            if self._writer == me:
+                self._writer_depth += 1
+                return
+            self._writers_waiting += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._condition.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = me
+            self._writer_depth = 1
+
+    def release_write(self):
+        """Release the exclusive side"""
+        with self._condition:
+            self._writer_depth -= 1
+            if not self._writer_depth:
+                self._writer = None
+                self._condition.notify_all()
+
+    @contextmanager
+    def read(self):
+        """Hold the shared side for the duration of a with block"""
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self):
+        """Hold the exclusive side for the duration of a with block"""
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+def merge_entry(existing, changes, path=()):
+    """Merge changes into an entry in place, merging nested lists by key"""
+    for name, value in changes.items():
+        current = existing.get(name)
+        nested_key = NESTED_LIST_KEYS.get(path + (name,))
+        if isinstance(value, dict) and isinstance(current, dict):
+            merge_entry(current, value, path + (name,))
+        elif nested_key is not None and isinstance(value, list) and isinstance(current, list):
+            by_key = {item.get(nested_key): item for item in current}
+            for item in value:
+                if item.get(nested_key) in by_key:
+                    merge_entry(by_key[item.get(nested_key)], item)
+                else:
+                    current.append(item)
+        else:
+            existing[name] = value
+    return existing
+
+
+class Datastore:
+    """Keyed access to the YANG lists of a network_data dictionary"""
+
+    def __init__(self, data):
+        self.data = data
+        self.lock = ReadWriteLock()
+        self._positions = {}
+        self._indexes = {}
+        self._versions = {path: 0 for path in LIST_KEYS}
+        self._listeners = []
+        for path, key in LIST_KEYS.items():
+            self._positions[path] = {entry[key]: i for i, entry in enumerate(self.entries(path))}
+            self._indexes[path] = {leaf: {} for leaf in INDEXED_LEAVES.get(path, ())}
+            for entry in self.entries(path):
+                self._index(path, entry)
+
+    def add_listener(self, callback):
+        """Call callback(path, key, entry) after every write
+
+        entry is the new entry, or None when it was removed; key is None
+        when the whole list was cleared.
+        """
+        self._listeners.append(callback)
+
+    def version(self, path):
+        """Return a counter that changes whenever the list is written"""
+        return self._versions[path]
+
+    def _changed(self, path, key, entry):
+        self._versions[path] += 1
+        for callback in self._listeners:
+            callback(path, key, entry)
+
+    def entries(self, path):
+        """Return the list holding the entries of a YANG list"""
+        container, name = path
+        return self.data[container][name]
+
+    def key_of(self, path, entry):
+        """Return the key value of an entry"""
+        return entry[LIST_KEYS[path]]
+
+    def get(self, path, key):
+        """Return the entry with the given key, or None"""
+        position = self._positions[path].get(key)
+        if position is None:
+            return None
+        return self.entries(path)[position]
+
+    def lookup(self, path, leaf, value):
+        """Return the keys of entries whose leaf equals value, or None if the leaf is not indexed"""
+        index = self._indexes[path].get(leaf)
+        if index is None:
+            return None
+        return index.get(str(value), ())
+
+    def select(self, path, predicates):
+        """Return the entries matching every leaf=value predicate, in list order
+
+        Key and indexed-leaf predicates are answered from the indexes, so
+        the cost is proportional to the number of candidates rather than
+        the size of the list.
+        """
+        key_name = LIST_KEYS[path]
+        if key_name in predicates:
+            entry = self.get(path, predicates[key_name])
+            candidates = [] if entry is None else [entry]
+        else:
+            keys = None
+            for leaf, value in predicates.items():
+                matches = self.lookup(path, leaf, value)
+                if matches is not None and (keys is None or len(matches) < len(keys)):
+                    keys = matches
+            if keys is None:
+                candidates = self.entries(path)
+            else:
+                positions = self._positions[path]
+                candidates = [self.entries(path)[i] for i in sorted(positions[k] for k in keys)]
+        # An entry without the leaf never matches, whatever the value
+        return [entry for entry in candidates
+                if all(leaf in entry and str(entry[leaf]) == str(value) for leaf, value in predicates.items())]
+
+    def _index(self, path, entry):
+        key = self.key_of(path, entry)
+        for leaf, index in self._indexes[path].items():
+            if leaf in entry:
+                index.setdefault(str(entry[leaf]), set()).add(key)
+
+    def _unindex(self, path, entry):
+        key = self.key_of(path, entry)
+        for leaf, index in self._indexes[path].items():
+            if leaf in entry:
+                keys = index.get(str(entry[leaf]))
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del index[str(entry[leaf])]
+
+    def __len__(self):
+        return sum(len(positions) for positions in self._positions.values())
+
+    def create(self, path, entry):
+        """Add a new entry, failing if its key already exists"""
+        with self.lock.write():
+            key = self.key_of(path, entry)
+            positions = self._positions[path]
+            if key in positions:
+                raise DataExistsError(f"{path[1]} '{key}' already exists")
+            entries = self.entries(path)
+            positions[key] = len(entries)
+            entries.append(entry)
+            self._index(path, entry)
+            self._changed(path, key, entry)
+            return entry
+
+    def replace(self, path, entry):
+        """Create an entry or replace the existing entry with the same key"""
+        with self.lock.write():
+            key = self.key_of(path, entry)
+            position = self._positions[path].get(key)
+            if position is None:
+                return self.create(path, entry)
+            entries = self.entries(path)
+            self._unindex(path, entries[position])
+            entries[position] = entry
+            self._index(path, entry)
+            self._changed(path, key, entry)
+            return entry
+
+    def merge(self, path, entry, removed=()):
+        """Create an entry or merge it into the existing entry with the same key
+
+        Leaves named in removed, or given as paths like "ambr/uplink" for
+        leaves of containers, are deleted from the existing entry.
+        """
+        with self.lock.write():
+            existing = self.get(path, self.key_of(path, entry))
+            if existing is None:
+                return self.create(path, entry)
+            self._unindex(path, existing)
+            merge_entry(existing, entry, path)
+            for name in removed:
+                # Names of nested leaves are paths such as "ambr/uplink"
+                *parents, leaf = name.split("/")
+                target = existing
+                for parent in parents:
+                    target = target.get(parent)
+                    if not isinstance(target, dict):
+                        break
+                else:
+                    target.pop(leaf, None)
+            self._index(path, existing)
+            self._changed(path, self.key_of(path, existing), existing)
+            return existing
+
+    def update(self, path, key, changes):
+        """Merge changes into an existing entry, failing if it does not exist"""
+        with self.lock.write():
+            existing = self.get(path, key)
+            if existing is None:
+                raise DataMissingError(f"{path[1]} '{key}' does not exist")
+            self._unindex(path, existing)
+            merge_entry(existing, changes, path)
+            self._index(path, existing)
+            self._changed(path, key, existing)
+            return existing
+
+    def delete(self, path, key):
+        """Remove an entry, failing if it does not exist"""
+        with self.lock.write():
+            entry = self.remove(path, key)
+            if entry is None:
+                raise DataMissingError(f"{path[1]} '{key}' does not exist")
+            return entry
+
+    def remove(self, path, key):
+        """Remove an entry if it exists, returning it or None"""
+        removed = self.remove_many(path, [key])
+        return removed[0] if removed else None
+
+    def remove_many(self, path, keys):
+        """Remove the entries with the given keys that exist, returning them in list order
+
+        The gaps are closed together, so removing k of n entries costs
+        O(n + k) however many are removed, instead of a pass per entry.
+        """
+        with self.lock.write():
+            positions = self._positions[path]
+            holes = sorted({positions.pop(key) for key in keys if key in positions})
+            if not holes:
+                return []
+            entries = self.entries(path)
+            removed = [entries[position] for position in holes]
+            # Keep the entries after the first gap in order and renumber them in one C-level pass
+            first = holes[0]
+            holes = set(holes)
+            kept = [entry for position, entry in enumerate(entries[first:], first) if position not in holes]
+            del entries[first:]
+            entries.extend(kept)
+            positions.update(zip(map(itemgetter(LIST_KEYS[path]), kept), count(first)))
+            for entry in removed:
+                self._unindex(path, entry)
+                self._changed(path, self.key_of(path, entry), None)
+            return removed
+
+    def clear(self, path):
+        """Remove every entry of a list"""
+        with self.lock.write():
+            self.entries(path).clear()
+            self._positions[path].clear()
+            for index in self._indexes[path].values():
+                index.clear()
+            self._changed(path, None, None)
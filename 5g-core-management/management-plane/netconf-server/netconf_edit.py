@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+
+"""
+Streaming edit-config for the 5G Core NETCONF server
+Applies the <config> payload of an edit-config one list entry at a time
+from iterparse-style (event, element) pairs. Each entry is applied through
+the datastore's keyed lookups and its element is freed straight away, so
+memory use does not grow with the size of the payload.
+"""
+
+from lxml import etree
+
+from datastore import LIST_KEYS, NESTED_LIST_KEYS, INTEGER_LEAVES, DataExistsError
+
+NETCONF_BASE_NS = "urn:ietf:params:xml:ns:netconf:base:1.0"
+OPERATION_ATTRIBUTE = f"{{{NETCONF_BASE_NS}}}operation"
+OPERATIONS = ("merge", "replace", "create", "delete", "remove")
+DEFAULT_OPERATIONS = ("merge", "replace", "none")
+
+
+class EditConfigError(Exception):
+    """Error in an edit-config request, carrying the NETCONF error-tag"""
+
+    def __init__(self, tag, message):
+        super().__init__(message)
+        self.tag = tag
+        self.message = message
+
+
+def local_name(element):
+    """Return the tag of an element without its namespace"""
+    return element.tag.rpartition("}")[2]
+
+
+def element_operation(element, inherited):
+    """Return the operation attribute of an element, or the inherited one"""
+    operation = element.get(OPERATION_ATTRIBUTE)
+    if operation is None:
+        return inherited
+    if operation not in OPERATIONS:
+        raise EditConfigError("bad-attribute", f"unknown operation '{operation}'")
+    return operation
+
+
+def element_to_entry(element, path, prefix=""):
+    """Convert a list entry element into a dictionary
+
+    Returns the entry and the names of leaves and containers carrying a
+    delete or remove operation, as paths like "ambr/uplink" inside
+    containers. Deleting entries of nested lists is not supported and
+    raises an EditConfigError.
+    """
+    entry = {}
+    removed = []
+    integers = INTEGER_LEAVES.get(path[:2], ())
+    for child in element:
+        if not isinstance(child.tag, str):
+            continue
+        name = local_name(child)
+        deleted = element_operation(child, None) in ("delete", "remove")
+        if NESTED_LIST_KEYS.get(path + (name,)) is not None:
+            item, item_removed = element_to_entry(child, path + (name,))
+            if deleted or item_removed:
+                raise EditConfigError("operation-not-supported",
+                                      f"delete and remove are not supported inside '{name}' entries")
+            entry.setdefault(name, []).append(item)
+        elif deleted:
+            removed.append(prefix + name)
+        elif len(child):
+            entry[name], nested = element_to_entry(child, path, prefix + name + "/")
+            removed.extend(nested)
+        else:
+            text = (child.text or "").strip()
+            if prefix + name in integers:
+                try:
+                    text = int(text)
+                except ValueError:
+                    raise EditConfigError("invalid-value", f"'{name}' must be an integer")
+            entry[name] = text
+    return entry, removed
+
+
+def free_element(element):
+    """Release an applied element and the already applied siblings before it"""
+    element.clear(keep_tail=True)
+    parent = element.getparent()
+    if parent is not None:
+        while element.getprevious() is not None:
+            del parent[0]
+
+
+class ConfigApplier:
+    """Applies the events of a <config> subtree to a datastore
+
+    Events are (event, element) pairs as produced by etree.iterparse(),
+    etree.iterwalk() or an XMLPullParser, starting with the start of the
+    <config> element itself. Consecutive delete and remove operations on
+    one list are queued and applied together when the run ends, so bulk
+    removals close the gaps they leave in one pass over the list.
+    """
+
+    def __init__(self, datastore, default_operation="merge"):
+        if default_operation not in DEFAULT_OPERATIONS:
+            raise EditConfigError("invalid-value", f"unknown default-operation '{default_operation}'")
+        self.datastore = datastore
+        self.default_operation = default_operation
+        self.depth = 0
+        self.container = None
+        self.container_operation = None
+        self.applied = 0
+        self._removal_path = None
+        self._removals = {}
+
+    def feed(self, event, element):
+        """Process one parser event"""
+        if event == "start":
+            self.depth += 1
+            if self.depth == 2:
+                self._start_container(element)
+            return
+
+        try:
+            if self.depth == 3:
+                self._apply_entry(element)
+                free_element(element)
+            elif self.depth == 2:
+                self.flush()
+                free_element(element)
+        except EditConfigError:
+            # Removals that came before the failing entry still take effect
+            self.flush()
+            raise
+        self.depth -= 1
+
+    def flush(self):
+        """Apply the queued removals"""
+        if self._removals:
+            self.datastore.remove_many(self._removal_path, self._removals)
+            self._removals = {}
+
+    def _start_container(self, element):
+        self.container = local_name(element)
+        if not any(container == self.container for container, _ in LIST_KEYS):
+            raise EditConfigError("unknown-element", f"unknown container '{self.container}'")
+        operation = element_operation(element, None)
+        self.container_operation = operation
+        if operation in ("delete", "remove", "replace"):
+            # Operations on the container apply to every list it holds
+            for path in LIST_KEYS:
+                if path[0] == self.container:
+                    self.datastore.clear(path)
+
+    def _apply_entry(self, element):
+        path = (self.container, local_name(element))
+        key_name = LIST_KEYS.get(path)
+        if key_name is None:
+            raise EditConfigError("unknown-element", f"unknown list '{path[1]}' in '{path[0]}'")
+        if self.container_operation in ("delete", "remove"):
+            return
+
+        inherited = self.container_operation or (
+            None if self.default_operation == "none" else self.default_operation)
+        operation = element_operation(element, inherited)
+        if operation is None:
+            return
+
+        entry, removed = element_to_entry(element, path)
+        key = entry.get(key_name)
+        if key in (None, ""):
+            raise EditConfigError("missing-element", f"'{path[1]}' entry is missing its key '{key_name}'")
+
+        if operation in ("delete", "remove"):
+            self._queue_removal(path, key, operation)
+            self.applied += 1
+            return
+
+        self.flush()
+        try:
+            if operation == "merge":
+                self.datastore.merge(path, entry, removed)
+            elif operation == "replace":
+                self.datastore.replace(path, entry)
+            else:
+                self.datastore.create(path, entry)
+        except DataExistsError as e:
+            raise EditConfigError("data-exists", str(e))
+        self.applied += 1
+
+    def _queue_removal(self, path, key, operation):
+        if path != self._removal_path:
+            self.flush()
+            self._removal_path = path
+        if key in self._removals or self.datastore.get(path, key) is None:
+            if operation == "delete":
+                raise EditConfigError("data-missing", f"{path[1]} '{key}' does not exist")
+            return
+        self._removals[key] = None
+
+
+def apply_config(datastore, events, default_operation="merge"):
+    """Apply every (event, element) pair of a <config> subtree, returning the entries applied"""
+    applier = ConfigApplier(datastore, default_operation)
+    for event, element in events:
+        applier.feed(event, element)
+    return applier.applied
+
+
+def config_events(config):
+    """Return iterparse-style events for a <config> element, XML text or file"""
+    if isinstance(config, etree._Element):
+        return etree.iterwalk(config, events=("start", "end"))
+    if isinstance(config, str):
+        config = config.encode("utf-8")
+    if isinstance(config, bytes):
+        return _pull_events(config)
+    return etree.iterparse(config, events=("start", "end"))
+
+
+def _pull_events(data, size=65536):
+    parser = etree.XMLPullParser(events=("start", "end"))
+    for offset in range(0, len(data), size):
+        parser.feed(data[offset:offset + size])
+        yield from parser.read_events()
+    parser.close()
+    yield from parser.read_events()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+
+"""
+get-config filtering for the 5G Core NETCONF server
+Compiles <filter type="subtree"> and a practical XPath subset into a
+selection of datastore lists, leaf predicates and projected fields. The
+selection is answered from the datastore's key and secondary indexes, so
+only matching entries are ever rendered.
+
+Supported XPath forms (namespace prefixes are ignored):
+    /container
+    /container/list
+    /container/list[leaf='value'][other="value"]
+    /container/list[leaf='value']/field
+and unions of these with '|'.
+"""
+
+import re
+
+from datastore import LIST_KEYS
+
+_STEP = re.compile(r"\s*/\s*(?:[\w.-]+:)?([\w.-]+)((?:\s*\[[^\]]*\])*)")
+_PREDICATE = re.compile(r"\[\s*(?:[\w.-]+:)?([\w.-]+)\s*=\s*(?:'([^']*)'|\"([^\"]*)\"|([\w.+-]+))\s*\]")
+
+
+class FilterError(Exception):
+    """Raised for filters outside the supported subset"""
+
+
+class ListSelection:
+    """Entries of one list matching leaf predicates, optionally projected to some fields"""
+
+    def __init__(self, predicates=None, fields=None):
+        self.predicates = predicates or {}
+        self.fields = fields
+
+    def __repr__(self):
+        return f"ListSelection({self.predicates!r}, {self.fields!r})"
+
+
+def _local(tag):
+    return tag.rpartition("}")[2]
+
+
+def _container_lists(container):
+    return [path for path in LIST_KEYS if path[0] == container]
+
+
+def select_all(containers=None):
+    """Return a selection of every list in the given containers (all when None)"""
+    return {path: [ListSelection()] for path in LIST_KEYS
+            if containers is None or path[0] in containers}
+
+
+def parse_subtree_filter(filter_element):
+    """Compile the children of a subtree <filter> element into a selection"""
+    selection = {}
+    for container in filter_element:
+        if not isinstance(container.tag, str):
+            continue
+        lists = _container_lists(_local(container.tag))
+        if not len(container):
+            for path in lists:
+                selection.setdefault(path, []).append(ListSelection())
+            continue
+        for entry in container:
+            if not isinstance(entry.tag, str):
+                continue
+            path = (_local(container.tag), _local(entry.tag))
+            if path not in LIST_KEYS:
+                continue
+            predicates = {}
+            fields = set()
+            for node in entry:
+                if not isinstance(node.tag, str):
+                    continue
+                name = _local(node.tag)
+                text = (node.text or "").strip()
+                if len(node) == 0 and text:
+                    predicates[name] = text
+                else:
+                    fields.add(name)
+            if fields:
+                fields.update(predicates)
+                fields.add(LIST_KEYS[path])
+            selection.setdefault(path, []).append(ListSelection(predicates, fields or None))
+    return selection
+
+
+def parse_xpath_filter(select):
+    """Compile a select expression from the supported XPath subset into a selection"""
+    selection = {}
+    for expression in select.split("|"):
+        expression = expression.strip()
+        steps = []
+        position = 0
+        while position < len(expression):
+            match = _STEP.match(expression, position)
+            if match is None:
+                raise FilterError(f"unsupported XPath expression '{expression}'")
+            predicates = {}
+            for predicate in _PREDICATE.finditer(match.group(2)):
+                value = next(v for v in predicate.group(2, 3, 4) if v is not None)
+                predicates[predicate.group(1)] = value
+            if _PREDICATE.sub("", match.group(2)).strip():
+                raise FilterError(f"unsupported predicate in '{expression}'")
+            steps.append((match.group(1), predicates))
+            position = match.end()
+
+        if not steps or steps[0][1]:
+            raise FilterError(f"unsupported XPath expression '{expression}'")
+        container = steps[0][0]
+        if len(steps) == 1:
+            for path in _container_lists(container):
+                selection.setdefault(path, []).append(ListSelection())
+            continue
+        path = (container, steps[1][0])
+        if path not in LIST_KEYS:
+            continue
+        fields = None
+        if len(steps) == 3 and not steps[2][1]:
+            fields = {steps[2][0], LIST_KEYS[path]}
+        elif len(steps) > 2:
+            raise FilterError(f"unsupported XPath expression '{expression}'")
+        selection.setdefault(path, []).append(ListSelection(steps[1][1], fields))
+    return selection
+
+
+def parse_filter(filter_element):
+    """Compile a NETCONF <filter> element into a selection, or None for no filter"""
+    if filter_element is None:
+        return None
+    filter_type = filter_element.get("type", "subtree")
+    if filter_type == "subtree":
+        return parse_subtree_filter(filter_element)
+    if filter_type == "xpath":
+        select = filter_element.get("select")
+        if not select:
+            raise FilterError("xpath filter is missing the select attribute")
+        return parse_xpath_filter(select)
+    raise FilterError(f"unknown filter type '{filter_type}'")
+
+
+def project(entry, fields):
+    """Return only the given fields of an entry"""
+    if fields is None:
+        return entry
+    return {name: value for name, value in entry.items() if name in fields}
+
+
+def select_entries(datastore, selection):
+    """Yield (path, entries, whole_list) for each selected list in datastore order
+
+    whole_list is True when every entry of the list is selected unprojected,
+    in which case entries is the datastore's own list.
+    """
+    for path in LIST_KEYS:
+        selections = selection.get(path)
+        if not selections:
+            continue
+        if len(selections) == 1:
+            only = selections[0]
+            if not only.predicates and only.fields is None:
+                yield path, datastore.entries(path), True
+                continue
+            entries = datastore.select(path, only.predicates)
+            if only.fields is not None:
+                entries = [project(entry, only.fields) for entry in entries]
+            yield path, entries, False
+            continue
+        # Several selections on one list: union, each entry listed once
+        merged = {}
+        for item in selections:
+            for entry in datastore.select(path, item.predicates):
+                key = datastore.key_of(path, entry)
+                if key not in merged:
+                    merged[key] = (entry, item.fields)
+                else:
+                    fields = merged[key][1]
+                    if fields is not None and item.fields is not None:
+                        merged[key] = (entry, fields | item.fields)
+                    else:
+                        merged[key] = (entry, None)
+        yield path, [project(entry, fields) for entry, fields in merged.values()], False
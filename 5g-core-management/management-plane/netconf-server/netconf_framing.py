@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+
+"""
+NETCONF message framing (RFC 6242)
+Incremental decoders for the base:1.0 end-of-message framing and the
+base:1.1 chunked framing. Decoders hand out payload bytes as soon as they
+arrive instead of buffering whole messages, so large RPCs can be parsed
+while they are still being received. Messages larger than the decoder's
+max_size are a framing error, which bounds what one peer can make the XML
+parser consume.
+"""
+
+EOM_DELIMITER = b"]]>]]>"
+CHUNKED_END = b"\n##\n"
+MAX_CHUNK_SIZE = 4294967295
+MAX_MESSAGE_SIZE = 64 * 1024 * 1024
+
+# Marker yielded by the decoders at the end of each message
+MESSAGE_END = object()
+
+
+class FramingError(Exception):
+    """Raised when the peer violates the framing protocol"""
+
+
+class EomDecoder:
+    """Decoder for ]]>]]> delimited messages"""
+
+    def __init__(self, data=b"", max_size=MAX_MESSAGE_SIZE):
+        self._buffer = bytearray(data)
+        self.max_size = max_size
+        self._size = 0
+
+    def feed(self, data):
+        """Add received bytes"""
+        self._buffer += data
+
+    def take_buffer(self):
+        """Return and forget any bytes not decoded yet"""
+        data, self._buffer = bytes(self._buffer), bytearray()
+        return data
+
+    def events(self):
+        """Yield the available payload of the current message, then MESSAGE_END once complete"""
+        buffer = self._buffer
+        end = buffer.find(EOM_DELIMITER)
+        if end >= 0:
+            _check_size(self._size + end, self.max_size)
+            if end:
+                yield bytes(buffer[:end])
+            del buffer[:end + len(EOM_DELIMITER)]
+            self._size = 0
+            yield MESSAGE_END
+            return
+        # Keep a possible partial delimiter at the tail for the next read
+        safe = len(buffer) - (len(EOM_DELIMITER) - 1)
+        if safe > 0:
+            self._size += safe
+            _check_size(self._size, self.max_size)
+            part = bytes(buffer[:safe])
+            del buffer[:safe]
+            yield part
+
+
+class ChunkedDecoder:
+    """Decoder for base:1.1 chunked messages"""
+
+    def __init__(self, data=b"", max_size=MAX_MESSAGE_SIZE):
+        self._buffer = bytearray(data)
+        self.max_size = max_size
+        self._remaining = 0
+        self._size = 0
+
+    def feed(self, data):
+        """Add received bytes"""
+        self._buffer += data
+
+    def take_buffer(self):
+        """Return and forget any bytes not decoded yet"""
+        data, self._buffer = bytes(self._buffer), bytearray()
+        return data
+
+    def events(self):
+        """Yield the available chunk data of the current message, then MESSAGE_END once complete"""
+        buffer = self._buffer
+        while buffer:
+            if self._remaining:
+                size = min(self._remaining, len(buffer))
+                part = bytes(buffer[:size])
+                del buffer[:size]
+                self._remaining -= size
+                yield part
+                continue
+
+            # Chunk header: LF HASH chunk-size LF, or LF HASH HASH LF at end of chunks
+            if len(buffer) < 4:
+                return
+            if buffer[0:2] != b"\n#":
+                raise FramingError("expected chunk header")
+            if buffer[2:4] == b"#\n":
+                del buffer[:4]
+                self._size = 0
+                yield MESSAGE_END
+                return
+            newline = buffer.find(b"\n", 2, 13)
+            if newline < 0:
+                if len(buffer) >= 13:
+                    raise FramingError("chunk size too long")
+                return
+            digits = bytes(buffer[2:newline])
+            if not digits.isdigit() or digits.startswith(b"0"):
+                raise FramingError(f"invalid chunk size {digits!r}")
+            size = int(digits)
+            if size > MAX_CHUNK_SIZE:
+                raise FramingError("chunk size out of range")
+            self._size += size
+            _check_size(self._size, self.max_size)
+            del buffer[:newline + 1]
+            self._remaining = size
+
+
+def _check_size(size, max_size):
+    if max_size is not None and size > max_size:
+        raise FramingError(f"message larger than {max_size} bytes")
+
+
+def encode_eom(data):
+    """Frame a complete message with the end-of-message delimiter"""
+    return data + EOM_DELIMITER
+
+
+def encode_chunk(data):
+    """Frame one chunk of a chunked message"""
+    return b"\n#%d\n" % len(data) + data
+
+
+def encode_chunked(data):
+    """Frame a complete message as a single chunk plus the end marker"""
+    return encode_chunk(data) + CHUNKED_END
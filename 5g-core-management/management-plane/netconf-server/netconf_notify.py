@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+
+"""
+NETCONF event notifications (RFC 5277) for the 5G Core NETCONF server
+A NotificationStream keeps the most recent events in a fixed-size ring
+buffer, which serves <startTime> replay, and fans each new event out to
+the subscribed sessions. Every event is rendered and encoded once; each
+subscriber only queues a reference to the encoded bytes, so an event costs
+little per subscriber. A subscriber that falls behind has its oldest queued
+events dropped, or is disconnected, depending on the stream's slow reader
+policy.
+
+NfStateMonitor turns datastore writes into nf-state-change events whenever
+a network function is added or removed or its status or capacity changes.
+"""
+
+import bisect
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import datetime, timezone
+
+from datastore import LIST_KEYS
+from netconf_render import escape_text
+from netconf_transport import RpcError, local_name
+
+NOTIFICATION_NS = "urn:ietf:params:xml:ns:netconf:notification:1.0"
+# replayComplete and notificationComplete are defined in the nc-notifications module (RFC 5277)
+NETMOD_NOTIFICATION_NS = "urn:ietf:params:xml:ns:netmod:notification"
+REPLAY_COMPLETE = f'<replayComplete xmlns="{NETMOD_NOTIFICATION_NS}"/>'
+NOTIFICATION_COMPLETE = f'<notificationComplete xmlns="{NETMOD_NOTIFICATION_NS}"/>'
+NOTIFICATION_CAPABILITY = "urn:ietf:params:netconf:capability:notification:1.0"
+INTERLEAVE_CAPABILITY = "urn:ietf:params:netconf:capability:interleave:1.0"
+NF_NOTIFICATIONS_NS = "urn:5g-core:notifications"
+SLOW_POLICIES = ("drop", "disconnect")
+
+Event = namedtuple("Event", "seq time name fields xml")
+
+
+def format_time(timestamp):
+    """Return an epoch timestamp as an RFC 3339 date-and-time"""
+    moment = datetime.fromtimestamp(timestamp, timezone.utc)
+    return moment.isoformat(timespec="microseconds").replace("+00:00", "Z")
+
+
+def parse_time(text):
+    """Return the epoch timestamp of an RFC 3339 date-and-time"""
+    try:
+        moment = datetime.fromisoformat(text.strip().replace("Z", "+00:00"))
+    except ValueError:
+        raise RpcError("bad-element", f"invalid date-and-time '{text}'", error_type="protocol")
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def notification_xml(timestamp, body):
+    """Return the encoded <notification> message carrying an event body"""
+    return (f'<notification xmlns="{NOTIFICATION_NS}"><eventTime>{format_time(timestamp)}</eventTime>'
+            f'{body}</notification>').encode("utf-8")
+
+
+def parse_event_filter(filter_element):
+    """Compile a subtree filter into (event name, leaf predicates) pairs, or None for no filter"""
+    if filter_element is None:
+        return None
+    if filter_element.get("type", "subtree") != "subtree":
+        raise RpcError("invalid-value", "only subtree filters are supported for notifications")
+    filters = []
+    for event in filter_element:
+        if not isinstance(event.tag, str):
+            continue
+        predicates = {}
+        for leaf in event:
+            if isinstance(leaf.tag, str) and (leaf.text or "").strip():
+                predicates[local_name(leaf)] = leaf.text.strip()
+        filters.append((local_name(event), predicates))
+    return filters
+
+
+class Subscription:
+    """Events queued for one subscribed session
+
+    wakeup() is called whenever an event is queued and close() when the
+    subscriber is disconnected for falling behind. Events are only handed
+    out once active is set, i.e. after the <ok/> reply has been sent.
+    """
+
+    def __init__(self, stream, wakeup, close, filters=None, stop=None, last_seq=0):
+        self.stream = stream
+        self.wakeup = wakeup
+        self.close = close
+        self.filters = filters
+        # Subscriptions with equal filters share one match per event
+        self.filter_key = None if filters is None else tuple(
+            (name, tuple(sorted(predicates.items()))) for name, predicates in filters)
+        self.stop = stop
+        self.last_seq = last_seq
+        self.queue = deque()
+        self.active = False
+        self.finished = False
+        self.dropped = 0
+        self._timer = None
+
+    def matches(self, event):
+        """Return True if the event passes the subscription's filter"""
+        if self.filters is None:
+            return True
+        for name, predicates in self.filters:
+            if name == event.name and all(str(event.fields.get(leaf)) == value
+                                          for leaf, value in predicates.items()):
+                return True
+        return False
+
+    def offer(self, event, matched=None):
+        """Queue an event for the subscriber, applying the slow reader policy
+
+        matched is the result of matches() when the caller already knows it.
+        """
+        if event.seq <= self.last_seq or self.finished:
+            return
+        self.last_seq = event.seq
+        if matched is None:
+            matched = self.matches(event)
+        if not matched or (self.stop is not None and event.time > self.stop):
+            return
+        if len(self.queue) >= self.stream.queue_limit:
+            if self.stream.slow_policy == "disconnect":
+                self.cancel()
+                self.close()
+                return
+            self.queue.popleft()
+            self.dropped += 1
+        self.queue.append(event.xml)
+        self.wakeup()
+
+    def complete(self):
+        """End the subscription with a <notificationComplete> event"""
+        if self.finished:
+            return
+        self.queue.append(notification_xml(time.time(), NOTIFICATION_COMPLETE))
+        self.cancel()
+        self.wakeup()
+
+    def cancel(self):
+        """Stop receiving events"""
+        self.finished = True
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.stream.unsubscribe(self)
+
+
+class NotificationStream:
+    """The NETCONF event stream with a bounded replay buffer"""
+
+    def __init__(self, name="NETCONF", replay_size=1024, queue_limit=1024, slow_policy="drop"):
+        if slow_policy not in SLOW_POLICIES:
+            raise ValueError(f"unknown slow reader policy '{slow_policy}'")
+        self.name = name
+        self.queue_limit = queue_limit
+        self.slow_policy = slow_policy
+        self._ring = [None] * replay_size
+        self._seq = 0
+        self._last_time = 0.0
+        self._lock = threading.Lock()
+        self._subscriptions = []
+        self._loop = None
+
+    def publish(self, name, fields, body):
+        """Record an event and deliver it to the subscribers; safe from any thread
+
+        name and fields (leaf name -> value) are what subscription filters
+        match against, body is the XML of the event element.
+        """
+        with self._lock:
+            now = max(time.time(), self._last_time)
+            self._last_time = now
+            self._seq += 1
+            event = Event(self._seq, now, name, fields, notification_xml(now, body))
+            self._ring[self._seq % len(self._ring)] = event
+            deliver = bool(self._subscriptions)
+        if deliver:
+            # One callback per event; the fan-out itself runs on the event loop
+            self._loop.call_soon_threadsafe(self._fan_out, event)
+        return event
+
+    def _fan_out(self, event):
+        matches = {None: True}
+        for subscription in list(self._subscriptions):
+            matched = matches.get(subscription.filter_key)
+            if matched is None:
+                matched = matches[subscription.filter_key] = subscription.matches(event)
+            subscription.offer(event, matched)
+
+    def replay(self, start, stop=None):
+        """Return the buffered events with start <= time <= stop, oldest first"""
+        with self._lock:
+            first = max(1, self._seq - len(self._ring) + 1)
+            events = [self._ring[seq % len(self._ring)] for seq in range(first, self._seq + 1)]
+        begin = bisect.bisect_left([event.time for event in events], start)
+        return [event for event in events[begin:] if stop is None or event.time <= stop]
+
+    def subscribe(self, operation, wakeup, close, loop):
+        """Start a subscription for a <create-subscription> element
+
+        Replayed events are queued straight away, followed by
+        <replayComplete>; live events follow as they are published.
+        """
+        stream = operation.find(f"{{{NOTIFICATION_NS}}}stream")
+        if stream is not None and (stream.text or "").strip() != self.name:
+            raise RpcError("invalid-value", f"unknown stream '{(stream.text or '').strip()}'")
+        filters = parse_event_filter(operation.find(f"{{{NOTIFICATION_NS}}}filter"))
+        start = operation.findtext(f"{{{NOTIFICATION_NS}}}startTime")
+        stop = operation.findtext(f"{{{NOTIFICATION_NS}}}stopTime")
+        start = parse_time(start) if start is not None else None
+        stop = parse_time(stop) if stop is not None else None
+        now = time.time()
+        if stop is not None and start is None:
+            raise RpcError("missing-element", "stopTime requires startTime", error_type="protocol")
+        if start is not None and start > now:
+            raise RpcError("bad-element", "startTime is in the future", error_type="protocol")
+        if stop is not None and stop < start:
+            raise RpcError("bad-element", "stopTime is before startTime", error_type="protocol")
+
+        self._loop = loop
+        with self._lock:
+            subscription = Subscription(self, wakeup, close, filters, stop, self._seq)
+            self._subscriptions.append(subscription)
+        if start is not None:
+            for event in self.replay(start, stop):
+                # Later events reach the subscription through the fan-out
+                if event.seq <= subscription.last_seq and subscription.matches(event):
+                    subscription.queue.append(event.xml)
+            subscription.queue.append(notification_xml(time.time(), REPLAY_COMPLETE))
+        if stop is not None:
+            if stop <= now:
+                subscription.complete()
+            else:
+                subscription._timer = loop.call_later(stop - now, subscription.complete)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove a subscription from the stream"""
+        with self._lock:
+            if subscription in self._subscriptions:
+                self._subscriptions.remove(subscription)
+
+
+class NfStateMonitor:
+    """Publishes nf-state-change events for network function writes"""
+
+    WATCHED = ("status", "capacity")
+
+    def __init__(self, datastore, stream):
+        self.stream = stream
+        self._state = {}
+        for path in LIST_KEYS:
+            if path[0] == "network-functions":
+                self._state[path] = {datastore.key_of(path, entry): self._watched(entry)
+                                     for entry in datastore.entries(path)}
+        datastore.add_listener(self._changed)
+
+    def _watched(self, entry):
+        return tuple(entry.get(leaf) for leaf in self.WATCHED)
+
+    def _changed(self, path, key, entry):
+        state = self._state.get(path)
+        if state is None:
+            return
+        if key is None:
+            for removed in list(state):
+                self._publish(path, removed, "deleted", None)
+            state.clear()
+            return
+        if entry is None:
+            if key in state:
+                del state[key]
+                self._publish(path, key, "deleted", None)
+            return
+        watched = self._watched(entry)
+        if state.get(key, ()) == watched:
+            return
+        operation = "updated" if key in state else "created"
+        state[key] = watched
+        self._publish(path, key, operation, watched)
+
+    def _publish(self, path, key, operation, watched):
+        fields = {"nf-type": path[1], "id": key, "operation": operation}
+        if watched is not None:
+            fields.update((leaf, value) for leaf, value in zip(self.WATCHED, watched) if value is not None)
+        body = "".join(f"<{leaf}>{escape_text(str(value))}</{leaf}>" for leaf, value in fields.items())
+        self.stream.publish("nf-state-change", fields,
+                            f'<nf-state-change xmlns="{NF_NOTIFICATIONS_NS}">{body}</nf-state-change>')
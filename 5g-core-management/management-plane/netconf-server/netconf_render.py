@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+
+"""
+Cached get-config rendering for the 5G Core NETCONF server
+Renders every datastore container as XML text. The fragment of each list
+entry is cached and only re-rendered after that entry is written, and the
+joined XML of a whole list is kept until the list changes, so repeated
+reads of a large datastore mostly join cached strings.
+
+iter_render() produces the same XML as a generator of bounded-size text
+chunks, so a reply can be streamed to a client without ever building the
+whole document in memory. parts() yields the cached fragments themselves,
+so a selection can be snapshotted under the datastore lock for the cost of
+a reference per entry and streamed after the lock is released.
+"""
+
+import re
+
+from datastore import LIST_KEYS
+
+NETCONF_BASE_NS = "urn:ietf:params:xml:ns:netconf:base:1.0"
+CHUNK_SIZE = 65536
+
+# Leaf and container names that can be rendered as unprefixed element names (ASCII NCNames)
+ELEMENT_NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_.-]*\Z")
+
+
+def escape_text(text):
+    """Escape character data for XML element content"""
+    return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def invalid_name(value):
+    """Return the first dictionary key under value that is not a valid element name, or None"""
+    if isinstance(value, dict):
+        for name, item in value.items():
+            if not isinstance(name, str) or not ELEMENT_NAME.match(name):
+                return name
+            name = invalid_name(item)
+            if name is not None:
+                return name
+    elif isinstance(value, list):
+        for item in value:
+            name = invalid_name(item)
+            if name is not None:
+                return name
+    return None
+
+
+def render_value(name, value, out):
+    """Append the XML of a leaf, container or nested list to out
+
+    Booleans are rendered as YANG booleans and None (an unset leaf) is left out.
+    """
+    if value is None:
+        return
+    if isinstance(value, bool):
+        out.append(f"<{name}>{'true' if value else 'false'}</{name}>")
+    elif isinstance(value, dict):
+        out.append(f"<{name}>")
+        for child, item in value.items():
+            render_value(child, item, out)
+        out.append(f"</{name}>")
+    elif isinstance(value, list):
+        for item in value:
+            render_value(name, item, out)
+    else:
+        out.append(f"<{name}>{escape_text(str(value))}</{name}>")
+
+
+def render_entry(name, entry):
+    """Return the XML fragment of one list entry"""
+    out = []
+    render_value(name, entry, out)
+    return "".join(out)
+
+
+class ConfigRenderer:
+    """Renders datastore selections from per-entry cached XML fragments"""
+
+    def __init__(self, datastore):
+        self.datastore = datastore
+        self._fragments = {path: {} for path in LIST_KEYS}
+        self._lists = {}
+        datastore.add_listener(self._invalidate)
+
+    def _invalidate(self, path, key, entry):
+        if key is None:
+            self._fragments[path].clear()
+        else:
+            self._fragments[path].pop(key, None)
+
+    def fragment(self, path, entry):
+        """Return the cached XML of an entry, rendering it if needed"""
+        fragments = self._fragments[path]
+        key = entry[LIST_KEYS[path]]
+        xml = fragments.get(key)
+        if xml is None:
+            xml = fragments[key] = render_entry(path[1], entry)
+        return xml
+
+    def list_xml(self, path):
+        """Return the XML of every entry of a list"""
+        version = self.datastore.version(path)
+        cached = self._lists.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        xml = "".join([self.fragment(path, entry) for entry in self.datastore.entries(path)])
+        self._lists[path] = (version, xml)
+        return xml
+
+    def entries_xml(self, path, entries, whole_list=False):
+        """Return the XML of selected entries; projected entries are rendered uncached"""
+        if whole_list:
+            return self.list_xml(path)
+        key_name = LIST_KEYS[path]
+        parts = []
+        for entry in entries:
+            full = self.datastore.get(path, entry.get(key_name))
+            if full is entry:
+                parts.append(self.fragment(path, entry))
+            else:
+                parts.append(render_entry(path[1], entry))
+        return "".join(parts)
+
+    def render(self, selected):
+        """Render (path, entries, whole_list) triples as a <data> element"""
+        out = [f'<data xmlns="{NETCONF_BASE_NS}">']
+        open_container = None
+        for path, entries, whole_list in selected:
+            xml = self.entries_xml(path, entries, whole_list)
+            if not xml:
+                continue
+            if path[0] != open_container:
+                if open_container is not None:
+                    out.append(f"</{open_container}>")
+                open_container = path[0]
+                out.append(f"<{open_container}>")
+            out.append(xml)
+        if open_container is not None:
+            out.append(f"</{open_container}>")
+        out.append("</data>")
+        return "".join(out)
+
+    def parts(self, selected):
+        """Yield the <data> element for (path, entries, whole_list) triples as tags and entry fragments
+
+        Cached fragments are yielded as they are, so collecting the parts
+        of a selection only takes a reference per entry.
+        """
+        yield f'<data xmlns="{NETCONF_BASE_NS}">'
+        open_container = None
+        for path, entries, whole_list in selected:
+            if not entries:
+                continue
+            if path[0] != open_container:
+                if open_container is not None:
+                    yield f"</{open_container}>"
+                open_container = path[0]
+                yield f"<{open_container}>"
+            key_name = LIST_KEYS[path]
+            for entry in entries:
+                if whole_list or self.datastore.get(path, entry.get(key_name)) is entry:
+                    yield self.fragment(path, entry)
+                else:
+                    yield render_entry(path[1], entry)
+        if open_container is not None:
+            yield f"</{open_container}>"
+        yield "</data>"
+
+    def iter_render(self, selected, chunk_size=CHUNK_SIZE):
+        """Yield the <data> element for (path, entries, whole_list) triples in chunks of about chunk_size characters"""
+        return join_chunks(self.parts(selected), chunk_size)
+
+
+def join_chunks(parts, chunk_size=CHUNK_SIZE):
+    """Join XML text parts into chunks of about chunk_size characters"""
+    buffer = []
+    size = 0
+    for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if size >= chunk_size:
+            yield "".join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield "".join(buffer)
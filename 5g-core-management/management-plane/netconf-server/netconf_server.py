@@ -6,6 +6,7 @@ This server provides configuration management for 5G core network functions
 using YANG models.
 """
 
+import os
 import sys
 from ncclient import manager
 from ncclient.xml_ import to_xml, new_ele, sub_ele
@@ -14,9 +15,23 @@ import json
 import threading
 import time
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from request_profiler import install_request_profiler
+from netconf_transport import NetconfServer, RpcError, local_name, NETCONF_BASE_NS
+from datastore import Datastore, DataExistsError
+from netconf_edit import ConfigApplier, EditConfigError, apply_config, config_events
+from netconf_filter import FilterError, parse_filter, select_all, select_entries
+from netconf_render import ConfigRenderer, invalid_name, join_chunks
+from netconf_notify import NotificationStream, NfStateMonitor, NOTIFICATION_CAPABILITY, INTERLEAVE_CAPABILITY
+
+# NETCONF listener address (RESTCONF keeps port 830)
+NETCONF_HOST = os.environ.get('NETCONF_HOST', '127.0.0.1')
+NETCONF_PORT = int(os.environ.get('NETCONF_PORT', 2022))
+
 
 # Flask app for RESTCONF API
 app = Flask(__name__)
+install_request_profiler(app)
 
 # In-memory data store for network functions and subscribers
 network_data = {
@@ -127,6 +142,15 @@ network_data["subscribers"]["subscriber"].append(sample_subscriber)
 network_data["sessions"]["pdu-session"].append(sample_session)
 network_data["qos-profiles"]["profile"].append(sample_qos_profile)
 
+# Keyed access to network_data; all writes go through the datastore
+datastore = Datastore(network_data)
+renderer = ConfigRenderer(datastore)
+
+# NETCONF event stream fed by network function status and capacity changes
+notifications = NotificationStream()
+nf_state_monitor = NfStateMonitor(datastore, notifications)
+AMF_PATH = ("network-functions", "amf")
+
 # RESTCONF API endpoints
 @app.route('/restconf/data/network-functions', methods=['GET'])
 def get_network_functions():
@@ -151,9 +175,9 @@ def get_qos_profiles():
 @app.route('/restconf/data/network-functions/amf/<amf_id>', methods=['GET'])
 def get_amf(amf_id):
     """Get specific AMF"""
-    for amf in network_data["network-functions"]["amf"]:
-        if amf["id"] == amf_id:
-            return jsonify(amf)
+    amf = datastore.get(AMF_PATH, amf_id)
+    if amf is not None:
+        return jsonify(amf)
     return jsonify({"error": "AMF not found"}), 404
 
 @app.route('/restconf/data/network-functions/amf', methods=['POST'])
@@ -161,7 +185,15 @@ def create_amf():
     """Create new AMF"""
     data = request.json
     if data is not None:
-        network_data["network-functions"]["amf"].append(data)
+        if not isinstance(data, dict) or not isinstance(data.get("id"), str) or not data["id"]:
+            return jsonify({"error": "AMF id is required"}), 400
+        name = invalid_name(data)
+        if name is not None:
+            return jsonify({"error": f"Invalid leaf name {name!r}"}), 400
+        try:
+            datastore.create(AMF_PATH, data)
+        except DataExistsError:
+            return jsonify({"error": "AMF already exists"}), 409
         return jsonify(data), 201
     return jsonify({"error": "Invalid JSON data"}), 400
 
@@ -169,81 +201,166 @@ def create_amf():
 def update_amf(amf_id):
     """Update existing AMF"""
     data = request.json
-    if data is None:
+    if not isinstance(data, dict):
         return jsonify({"error": "Invalid JSON data"}), 400
-    for i, amf in enumerate(network_data["network-functions"]["amf"]):
-        if amf["id"] == amf_id:
-            network_data["network-functions"]["amf"][i] = data
-            data["id"] = amf_id  # Ensure ID remains consistent
-            return jsonify(data)
-    return jsonify({"error": "AMF not found"}), 404
+    name = invalid_name(data)
+    if name is not None:
+        return jsonify({"error": f"Invalid leaf name {name!r}"}), 400
+    if datastore.get(AMF_PATH, amf_id) is None:
+        return jsonify({"error": "AMF not found"}), 404
+    data["id"] = amf_id  # Ensure ID remains consistent
+    datastore.replace(AMF_PATH, data)
+    return jsonify(data)
 
 @app.route('/restconf/data/network-functions/amf/<amf_id>', methods=['DELETE'])
 def delete_amf(amf_id):
     """Delete AMF"""
-    for i, amf in enumerate(network_data["network-functions"]["amf"]):
-        if amf["id"] == amf_id:
-            del network_data["network-functions"]["amf"][i]
-            return '', 204
+    if datastore.remove(AMF_PATH, amf_id) is not None:
+        return '', 204
     return jsonify({"error": "AMF not found"}), 404
 
 # NETCONF handlers
-def netconf_hello_handler():
+def netconf_hello_handler(session_id=None):
     """Handle NETCONF hello message"""
     hello = new_ele("hello")
     caps = sub_ele(hello, "capabilities")
     cap = sub_ele(caps, "capability")
     cap.text = "urn:ietf:params:netconf:base:1.0"
+    cap = sub_ele(caps, "capability")
+    cap.text = "urn:ietf:params:netconf:base:1.1"
+    cap = sub_ele(caps, "capability")
+    cap.text = "urn:ietf:params:netconf:capability:xpath:1.0"
+    cap = sub_ele(caps, "capability")
+    cap.text = NOTIFICATION_CAPABILITY
+    cap = sub_ele(caps, "capability")
+    cap.text = INTERLEAVE_CAPABILITY
+    if session_id is not None:
+        sid = sub_ele(hello, "session-id")
+        sid.text = str(session_id)
     return to_xml(hello)
 
-def netconf_get_config(source):
-    """Handle NETCONF get-config request"""
-    config = new_ele("data")
-    nf_container = sub_ele(config, "network-functions")
-    
-    # Add AMF data
-    for amf in network_data["network-functions"]["amf"]:
-        amf_elem = sub_ele(nf_container, "amf")
-        for key, value in amf.items():
-            elem = sub_ele(amf_elem, key)
-            elem.text = str(value)
-    
-    # Add SMF data
-    for smf in network_data["network-functions"]["smf"]:
-        smf_elem = sub_ele(nf_container, "smf")
-        for key, value in smf.items():
-            if key != "upf":
-                elem = sub_ele(smf_elem, key)
-                elem.text = str(value)
-            else:
-                # Handle nested UPF list
-                for upf_item in value:
-                    upf_elem = sub_ele(smf_elem, "upf")
-                    for upf_key, upf_value in upf_item.items():
-                        upf_sub_elem = sub_ele(upf_elem, upf_key)
-                        upf_sub_elem.text = str(upf_value)
-    
-    # Add UPF data
-    for upf in network_data["network-functions"]["upf"]:
-        upf_elem = sub_ele(nf_container, "upf")
-        for key, value in upf.items():
-            elem = sub_ele(upf_elem, key)
-            elem.text = str(value)
-    
-    return to_xml(config)
+def netconf_get_config(source, filter=None):
+    """Handle NETCONF get-config request
+
+    filter is an optional <filter> element (subtree or XPath). It is
+    resolved against the datastore indexes first, so only the matching
+    entries are rendered. Entries are rendered from cached XML fragments
+    that are only refreshed when the entry is written.
+    """
+    selection = parse_filter(filter)
+    if selection is None:
+        selection = select_all()
+    with datastore.lock.read():
+        data = renderer.render(select_entries(datastore, selection))
+    return '<?xml version="1.0" encoding="UTF-8"?>' + data
+
+def iter_get_config(source, filter=None):
+    """Stream a get-config reply body as XML text chunks
+
+    The filter is compiled and the selected entries' fragments are taken
+    under a short read lock before the generator is returned, so filter
+    errors are raised here and the reply is one snapshot. No lock is held
+    while the chunks are streamed, so a client that stops reading cannot
+    hold up writers.
+    """
+    selection = parse_filter(filter)
+    if selection is None:
+        selection = select_all()
+    with datastore.lock.read():
+        parts = list(renderer.parts(select_entries(datastore, selection)))
+    return join_chunks(parts)
 
-def netconf_edit_config(target, config):
-    """Handle NETCONF edit-config request"""
-    # Parse the config and update our data store
-    # This is a simplified implementation
+def netconf_edit_config(target, config, default_operation="merge"):
+    """Handle NETCONF edit-config request
+
+    The config may be a <config> element, XML text or a file object. It is
+    applied one list entry at a time while it is parsed, so large payloads
+    are processed in bounded memory.
+    """
     try:
-        # In a real implementation, we would parse the XML config
-        # and update our data store accordingly
+        if target != "running":
+            raise EditConfigError("invalid-value", f"target '{target}' is not supported")
+        apply_config(datastore, config_events(config), default_operation)
         return True
     except Exception as e:
         print(f"Error processing edit-config: {e}")
         return False
 
+def edit_config_stream(operation):
+    """Apply an <edit-config> RPC while it is still being received
+
+    Registered as a streaming handler: it is sent the parser events below
+    the <edit-config> element and applies <config> entries as they complete.
+    """
+    target = None
+    default_operation = "merge"
+    applier = None
+    depth = 0
+    try:
+        while True:
+            event, element = yield
+            if event == "start":
+                depth += 1
+                if depth == 2 and local_name(element) == "config":
+                    if target != "running":
+                        raise EditConfigError("invalid-value", f"target '{target}' is not supported")
+                    applier = ConfigApplier(datastore, default_operation)
+            if applier is not None and depth >= 2:
+                applier.feed(event, element)
+            if event == "end":
+                if depth == 2:
+                    name = local_name(element)
+                    if name == "target" and len(element):
+                        target = local_name(element[0])
+                    elif name == "default-operation":
+                        default_operation = (element.text or "").strip()
+                    elif name == "config":
+                        applier = None
+                elif depth == 1:
+                    return "<ok/>"
+                depth -= 1
+    except EditConfigError as e:
+        raise RpcError(e.tag, e.message)
+
+def _datastore_name(operation, name):
+    """Return the datastore named in an operation's <source> or <target>"""
+    container = operation.find(f"{{{NETCONF_BASE_NS}}}{name}")
+    if container is None or len(container) == 0:
+        raise RpcError("missing-element", f"<{name}> is required", error_type="protocol")
+    return local_name(container[0])
+
+def rpc_get_config(operation):
+    """Dispatch a <get-config> RPC, streaming the reply"""
+    source = _datastore_name(operation, "source")
+    try:
+        return iter_get_config(source, operation.find(f"{{{NETCONF_BASE_NS}}}filter"))
+    except FilterError as e:
+        raise RpcError("invalid-value", str(e))
+
+def rpc_get(operation):
+    """Dispatch a <get> RPC; the datastore holds no separate state data"""
+    try:
+        return iter_get_config("running", operation.find(f"{{{NETCONF_BASE_NS}}}filter"))
+    except FilterError as e:
+        raise RpcError("invalid-value", str(e))
+
+# NETCONF operations reachable over the wire
+RPC_HANDLERS = {
+    "get-config": rpc_get_config,
+    "get": rpc_get
+}
+
+# NETCONF operations applied while their payload is still arriving
+STREAM_HANDLERS = {
+    "edit-config": edit_config_stream
+}
+
+def start_netconf_server():
+    """Start the NETCONF listener in a separate thread"""
+    server = NetconfServer(netconf_hello_handler, RPC_HANDLERS, host=NETCONF_HOST, port=NETCONF_PORT,
+                           stream_handlers=STREAM_HANDLERS, notifications=notifications)
+    server.run()
+
 def start_restconf_server():
     """Start the RESTCONF server in a separate thread"""
     app.run(host='0.0.0.0', port=830, debug=False, use_reloader=False)
@@ -253,10 +370,15 @@ if __name__ == "__main__":
     restconf_thread = threading.Thread(target=start_restconf_server)
     restconf_thread.daemon = True
     restconf_thread.start()
+
+    # Start NETCONF listener in a separate thread
+    netconf_thread = threading.Thread(target=start_netconf_server)
+    netconf_thread.daemon = True
+    netconf_thread.start()
     
     print("5G Core NETCONF/RESTCONF Server started")
     print("RESTCONF API available at http://localhost:830/restconf")
-    print("NETCONF server available at localhost:830")
+    print(f"NETCONF server available at {NETCONF_HOST}:{NETCONF_PORT} (TCP, RFC 6242 framing)")
     print("Press Ctrl+C to stop")
     
     try:
@@ -0,0 +1,573 @@
+#!/usr/bin/env python3
+
+"""
+Asyncio NETCONF transport for the 5G Core NETCONF server
+Accepts NETCONF sessions over a local TCP socket using the same message
+framing as the SSH "netconf" subsystem (RFC 6242), performs the hello
+exchange and dispatches RPCs to the server's handlers.
+
+Messages are fed into an incremental XML parser as the framing decoder
+hands out bytes, so an RPC is dispatched as soon as its operation element
+is complete and streaming handlers see their payload while it arrives.
+Handlers may return their reply body as an iterator of XML text chunks,
+which is written to the socket chunk by chunk as the peer drains it.
+
+RPCs are pipelined: a session keeps reading requests while earlier ones
+are still being answered. Read operations run concurrently on a worker
+pool, writes run one at a time on a dedicated writer thread and never
+overtake the reads received before them, and replies are always sent in
+request order carrying each request's message-id (RFC 6241).
+
+When the server has a notification stream, <create-subscription> (RFC 5277)
+is handled here as well and the session's events are interleaved with its
+replies, always between complete messages.
+"""
+
+import asyncio
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+from lxml import etree
+
+from netconf_framing import (EOM_DELIMITER, CHUNKED_END, MAX_MESSAGE_SIZE, MESSAGE_END, EomDecoder,
+                             ChunkedDecoder, FramingError, encode_chunk)
+
+NETCONF_BASE_NS = "urn:ietf:params:xml:ns:netconf:base:1.0"
+BASE_1_0_CAPABILITY = "urn:ietf:params:netconf:base:1.0"
+BASE_1_1_CAPABILITY = "urn:ietf:params:netconf:base:1.1"
+
+# Operations that only read the datastore and may run concurrently
+READ_OPERATIONS = frozenset(("get", "get-config"))
+
+
+class RpcError(Exception):
+    """Error reported to the client as an <rpc-error>"""
+
+    def __init__(self, tag, message, error_type="application", severity="error"):
+        super().__init__(message)
+        self.tag = tag
+        self.message = message
+        self.error_type = error_type
+        self.severity = severity
+
+    def to_xml(self):
+        """Render the <rpc-error> element body"""
+        return (
+            "<rpc-error>"
+            f"<error-type>{self.error_type}</error-type>"
+            f"<error-tag>{self.tag}</error-tag>"
+            f"<error-severity>{self.severity}</error-severity>"
+            f"<error-message>{_escape(self.message)}</error-message>"
+            "</rpc-error>"
+        )
+
+
+def _escape(text):
+    return (str(text).replace("&", "&amp;").replace("<", "&lt;")
+            .replace(">", "&gt;").replace('"', "&quot;"))
+
+
+def strip_xml_declaration(xml):
+    """Remove a leading <?xml ...?> declaration so a document can be embedded"""
+    if xml.startswith("<?xml"):
+        return xml[xml.index("?>") + 2:]
+    return xml
+
+
+def local_name(element):
+    """Return the tag of an element without its namespace"""
+    return element.tag.rpartition("}")[2]
+
+
+class RpcMessage:
+    """Incrementally parsed <rpc> message
+
+    Bytes are pushed with feed() while the message is being received and
+    the operation element is kept once it is complete. Operations with a
+    streaming handler are held back until release() is called; from then
+    on the handler receives every parser event below the operation
+    element as it is produced.
+    """
+
+    def __init__(self, session):
+        self.session = session
+        self.parser = etree.XMLPullParser(events=("start", "end"))
+        self.depth = 0
+        self.attributes = {}
+        self.is_rpc = True
+        self.name = None
+        self.operation = None
+        self.streaming = False
+        self.released = False
+        self.held = []
+        self.consumer = None
+        self.body = None
+        self.error = None
+        self.close = False
+        self.subscribed = False
+
+    @property
+    def waiting(self):
+        """True while a streaming operation waits for release()"""
+        return self.streaming and not self.released and self.error is None
+
+    def feed(self, data):
+        """Parse the next part of the message"""
+        try:
+            self.parser.feed(data)
+        except etree.XMLSyntaxError as e:
+            self._fail(RpcError("malformed-message", str(e), error_type="rpc"))
+            return
+        for event, element in self.parser.read_events():
+            self._event(event, element)
+
+    def release(self):
+        """Start the streaming handler and replay the events held so far"""
+        self.released = True
+        held, self.held = self.held, []
+        if self.error is not None or not held:
+            return
+        try:
+            self.consumer = self.session.server.stream_handlers[self.name](held[0][1])
+            next(self.consumer)
+        except RpcError as e:
+            self._fail(e)
+            return
+        for event, element in held:
+            if self.consumer is None:
+                break
+            self._send(event, element)
+
+    def _fail(self, error):
+        if self.error is None:
+            self.error = error
+        self.held = []
+        if self.consumer is not None:
+            self.consumer.close()
+            self.consumer = None
+
+    def _event(self, event, element):
+        if event == "start":
+            self.depth += 1
+            if self.depth == 1:
+                self._start_rpc(element)
+            elif self.depth == 2 and self.name is None and self.error is None and self.is_rpc:
+                self.name = local_name(element)
+                self.streaming = self.name in self.session.server.stream_handlers
+
+        if self.streaming and self.depth >= 2 and self.error is None:
+            if not self.released:
+                self.held.append((event, element))
+            elif self.consumer is not None:
+                self._send(event, element)
+
+        if event == "end":
+            if self.depth == 2 and self.operation is None and self.name == local_name(element):
+                self.operation = element
+            self.depth -= 1
+
+    def _start_rpc(self, element):
+        if local_name(element) != "rpc":
+            self.is_rpc = False
+            return
+        self.attributes = dict(element.attrib)
+        if "message-id" not in self.attributes:
+            self._fail(RpcError("missing-attribute", "rpc is missing the message-id attribute", error_type="rpc"))
+
+    def _send(self, event, element):
+        try:
+            self.consumer.send((event, element))
+        except StopIteration as stop:
+            self.consumer = None
+            self.body = stop.value if stop.value is not None else "<ok/>"
+        except RpcError as e:
+            self._fail(e)
+        except Exception as e:
+            self._fail(RpcError("operation-failed", str(e)))
+
+    def finish(self):
+        """Complete the message once it has been received"""
+        try:
+            self.parser.close()
+        except etree.XMLSyntaxError as e:
+            self._fail(RpcError("malformed-message", str(e), error_type="rpc"))
+        if not self.is_rpc or self.error is not None:
+            return
+        if self.operation is None:
+            self._fail(RpcError("operation-not-supported", "rpc contains no operation", error_type="rpc"))
+        elif self.streaming:
+            if self.body is None:
+                self._fail(RpcError("operation-failed", f"'{self.name}' did not complete"))
+        elif self.name == "close-session":
+            self.body = "<ok/>"
+            self.close = True
+        elif self.name == "create-subscription" and self.session.server.notifications is not None:
+            try:
+                self.session.subscribe(self.operation)
+            except RpcError as e:
+                self._fail(e)
+                return
+            self.body = "<ok/>"
+            self.subscribed = True
+        elif self.name not in self.session.server.rpc_handlers:
+            self._fail(RpcError("operation-not-supported", f"operation '{self.name}' is not supported",
+                                error_type="protocol"))
+
+    @property
+    def answered(self):
+        """True when the reply body is known without running a handler"""
+        return self.error is not None or self.body is not None
+
+    def reply_body(self):
+        """Return the body of a reply known without running a handler"""
+        return self.error.to_xml() if self.error is not None else self.body
+
+    def execute(self):
+        """Run the operation's handler, returning the reply body"""
+        try:
+            return self.session.server.rpc_handlers[self.name](self.operation)
+        except RpcError as e:
+            return e.to_xml()
+        except Exception as e:
+            return RpcError("operation-failed", str(e)).to_xml()
+
+
+class NetconfSession:
+    """A single NETCONF session on an accepted connection"""
+
+    def __init__(self, server, session_id, reader, writer):
+        self.server = server
+        self.session_id = session_id
+        self.reader = reader
+        self.writer = writer
+        self.client_capabilities = []
+        self.decoder = EomDecoder(max_size=server.max_message_size)
+        self.chunked = False
+        self._replies = None
+        self._outgoing = asyncio.Event()
+        self._reads = []
+        self._last_write = None
+        self.subscription = None
+        self._subscribed = None
+        self.task = None
+
+    async def read_message(self, sink):
+        """Feed the next message into sink.feed() as it arrives; False at EOF"""
+        while True:
+            for part in self.decoder.events():
+                if part is MESSAGE_END:
+                    return True
+                if isinstance(sink, RpcMessage):
+                    await self._feed_rpc(sink, part)
+                else:
+                    sink.feed(part)
+            data = await self.reader.read(self.server.read_size)
+            if not data:
+                return False
+            self.decoder.feed(data)
+
+    async def _feed_rpc(self, message, part):
+        loop = asyncio.get_running_loop()
+        if message.released:
+            # A streaming write applies its payload on the writer thread
+            await loop.run_in_executor(self.server.write_executor, message.feed, part)
+            return
+        message.feed(part)
+        if message.waiting:
+            await self._write_barrier()
+            await loop.run_in_executor(self.server.write_executor, message.release)
+
+    def _take_earlier(self):
+        """Return the pending work a write must wait for and start a new batch"""
+        earlier = self._reads + ([self._last_write] if self._last_write is not None else [])
+        self._reads = []
+        self._last_write = None
+        return earlier
+
+    async def _write_barrier(self):
+        """Wait until earlier reads hold their snapshot and earlier writes are done"""
+        earlier = self._take_earlier()
+        if earlier:
+            await asyncio.wait(earlier)
+
+    async def send_message(self, xml, rest=None):
+        """Send one framed message given as text or text chunks
+
+        rest is an optional iterator of further chunks, advanced on the
+        server's stream pool. Chunks are written one at a time and the
+        socket is drained between them, so a reply never has to be held
+        in memory as a whole.
+        """
+        loop = asyncio.get_running_loop()
+        parts = (xml,) if isinstance(xml, (str, bytes)) else xml
+        pending = bytearray()
+        try:
+            for part in parts:
+                pending = await self._buffer(pending, part)
+            while rest is not None:
+                part = await loop.run_in_executor(self.server.stream_executor, next, rest, None)
+                if part is None:
+                    break
+                pending = await self._buffer(pending, part)
+        finally:
+            # Release whatever the reply generator holds if the peer went away
+            if rest is not None:
+                try:
+                    rest.close()
+                except ValueError:
+                    pass  # still running on a worker; closed when collected
+        if pending:
+            self._write_frame(pending)
+        self.writer.write(CHUNKED_END if self.chunked else EOM_DELIMITER)
+        await self._drain()
+
+    async def _buffer(self, pending, part):
+        pending += part.encode("utf-8") if isinstance(part, str) else part
+        if len(pending) < self.server.write_size:
+            return pending
+        self._write_frame(pending)
+        await self._drain()
+        return bytearray()
+
+    async def _drain(self):
+        """Wait until the peer reads what was written, dropping the session if it stalls for write_timeout"""
+        try:
+            await asyncio.wait_for(self.writer.drain(), self.server.write_timeout)
+        except asyncio.TimeoutError:
+            self.writer.transport.abort()
+            raise ConnectionError(f"session {self.session_id} stopped reading its replies")
+
+    def _write_frame(self, data):
+        self.writer.write(encode_chunk(bytes(data)) if self.chunked else data)
+
+    async def run(self):
+        """Run the session until the client closes it or disconnects"""
+        await self.send_message(self.server.hello_handler(self.session_id))
+        hello = etree.XMLPullParser()
+        if not await self.read_message(hello):
+            return
+        try:
+            root = hello.close()
+        except etree.XMLSyntaxError:
+            return
+        if local_name(root) != "hello" or root.find(f"{{{NETCONF_BASE_NS}}}session-id") is not None:
+            return
+        self.client_capabilities = [cap.text for cap in root.iter(f"{{{NETCONF_BASE_NS}}}capability")]
+
+        # Both peers must advertise base:1.1 to switch to chunked framing
+        if BASE_1_1_CAPABILITY in self.client_capabilities:
+            self.decoder = ChunkedDecoder(self.decoder.take_buffer(), self.server.max_message_size)
+            self.chunked = True
+
+        self._replies = asyncio.Queue(self.server.pipeline_depth)
+        tasks = [asyncio.create_task(self._receive_rpcs()), asyncio.create_task(self._send_replies())]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._discard_replies()
+            if self.subscription is not None:
+                self.subscription.cancel()
+        for task in done:
+            if not task.cancelled() and task.exception() is not None:
+                raise task.exception()
+
+    async def _receive_rpcs(self):
+        """Read RPCs and queue their replies until the session ends"""
+        while True:
+            message = RpcMessage(self)
+            try:
+                if not await self.read_message(message):
+                    break
+            except FramingError:
+                break
+            message.finish()
+            if not message.is_rpc:
+                continue
+            # The bounded queue stops reading when too many replies are outstanding
+            await self._replies.put(self._schedule(message))
+            self._outgoing.set()
+            if message.close:
+                break
+        await self._replies.put(None)
+        self._outgoing.set()
+
+    def subscribe(self, operation):
+        """Start the session's event notification subscription"""
+        if self.subscription is not None and not self.subscription.finished:
+            raise RpcError("operation-failed", "a subscription is already active on this session")
+        self.subscription = self.server.notifications.subscribe(
+            operation, self._outgoing.set, self.writer.close, asyncio.get_running_loop())
+
+    def _schedule(self, message):
+        """Start preparing the reply to a received RPC, returning its task"""
+        loop = asyncio.get_running_loop()
+        if message.answered:
+            future = loop.create_future()
+            future.set_result((self.reply_parts(message.attributes, message.reply_body()), None))
+            if message.subscribed:
+                self._subscribed = future
+            return future
+        if message.name in self.server.read_operations:
+            task = asyncio.create_task(self._run(self.server.read_executor, message,
+                                                 [self._last_write] if self._last_write is not None else []))
+            self._reads.append(task)
+            return task
+        task = asyncio.create_task(self._run(self.server.write_executor, message, self._take_earlier()))
+        self._last_write = task
+        return task
+
+    async def _run(self, executor, message, earlier):
+        if earlier:
+            await asyncio.wait(earlier)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, self._prepare, message)
+
+    def _prepare(self, message):
+        """Run an operation and render the start of its reply; called on a worker thread
+
+        Returns the first chunks and the iterator of the remaining ones (or
+        None). At least the first body chunk is rendered here, so a reader
+        has taken its snapshot by the time this returns.
+        """
+        parts = self.reply_parts(message.attributes, message.execute())
+        chunks = []
+        size = 0
+        try:
+            for part in parts:
+                chunks.append(part)
+                size += len(part)
+                if size >= self.server.write_size and len(chunks) > 1:
+                    return chunks, parts
+        except Exception as e:
+            parts.close()
+            return list(self.reply_parts(message.attributes, RpcError("operation-failed", str(e)).to_xml())), None
+        return chunks, None
+
+    async def _send_replies(self):
+        """Send queued replies in request order, with notifications in between"""
+        while True:
+            subscription = self.subscription
+            if subscription is not None and subscription.active and subscription.queue:
+                await self.send_message(subscription.queue.popleft())
+                continue
+            if self._replies.empty():
+                self._outgoing.clear()
+                await self._outgoing.wait()
+                continue
+            job = self._replies.get_nowait()
+            if job is None:
+                return
+            chunks, rest = await job
+            await self.send_message(chunks, rest)
+            if job is self._subscribed:
+                # Events follow the <ok/> of create-subscription
+                self._subscribed = None
+                self.subscription.active = True
+
+    def _discard_replies(self):
+        """Drop replies that will not be sent, releasing their generators"""
+        while not self._replies.empty():
+            job = self._replies.get_nowait()
+            if job is None:
+                continue
+            if job.done() and not job.cancelled() and job.exception() is None:
+                rest = job.result()[1]
+                if rest is not None:
+                    rest.close()
+            job.cancel()
+
+    def reply_parts(self, attributes, body):
+        """Yield an <rpc-reply> carrying the rpc attributes around a body given as text or chunks"""
+        attrs = "".join(
+            f' {etree.QName(key).localname}="{_escape(value)}"'
+            for key, value in attributes.items()
+        )
+        yield f'<rpc-reply xmlns="{NETCONF_BASE_NS}"{attrs}>'
+        if isinstance(body, str):
+            yield strip_xml_declaration(body)
+        else:
+            yield from body
+        yield "</rpc-reply>"
+
+
+class NetconfServer:
+    """Asyncio TCP server handling many concurrent NETCONF sessions
+
+    Read operations run on a pool of worker threads, writes on a single
+    writer thread, and reply streams are advanced on a separate pool so
+    replies holding a datastore snapshot never wait behind reads blocked
+    on a pending write. A session whose peer does not read a pending
+    write for write_timeout seconds is closed.
+    """
+
+    def __init__(self, hello_handler, rpc_handlers, host="127.0.0.1", port=2022,
+                 max_sessions=1000, read_size=65536, write_size=65536, stream_handlers=None,
+                 read_operations=READ_OPERATIONS, workers=4, pipeline_depth=32, notifications=None,
+                 max_message_size=MAX_MESSAGE_SIZE, write_timeout=30.0):
+        self.hello_handler = hello_handler
+        self.rpc_handlers = rpc_handlers
+        self.stream_handlers = stream_handlers or {}
+        self.read_operations = read_operations
+        self.host = host
+        self.port = port
+        self.max_sessions = max_sessions
+        self.read_size = read_size
+        self.write_size = write_size
+        self.pipeline_depth = pipeline_depth
+        self.max_message_size = max_message_size
+        self.write_timeout = write_timeout
+        self.notifications = notifications
+        self.read_executor = ThreadPoolExecutor(workers, thread_name_prefix="netconf-read")
+        self.stream_executor = ThreadPoolExecutor(workers, thread_name_prefix="netconf-stream")
+        self.write_executor = ThreadPoolExecutor(1, thread_name_prefix="netconf-write")
+        self.sessions = {}
+        self._server = None
+        self._session_ids = itertools.count(1)
+
+    async def start(self):
+        """Start listening, returning the bound (host, port)"""
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def serve_forever(self):
+        """Start the server if needed and serve until cancelled"""
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        """Stop accepting sessions and close the open ones"""
+        if self._server is not None:
+            self._server.close()
+        sessions = list(self.sessions.values())
+        for session in sessions:
+            session.writer.close()
+        if sessions:
+            await asyncio.wait([session.task for session in sessions], timeout=5)
+        if self._server is not None:
+            await self._server.wait_closed()
+        for executor in (self.read_executor, self.stream_executor, self.write_executor):
+            executor.shutdown(wait=False)
+
+    async def _handle_connection(self, reader, writer):
+        if len(self.sessions) >= self.max_sessions:
+            writer.close()
+            return
+        session = NetconfSession(self, next(self._session_ids), reader, writer)
+        session.task = asyncio.current_task()
+        self.sessions[session.session_id] = session
+        try:
+            await session.run()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            del self.sessions[session.session_id]
+            writer.close()
+
+    def run(self):
+        """Run the server in the current thread until interrupted"""
+        asyncio.run(self.serve_forever())
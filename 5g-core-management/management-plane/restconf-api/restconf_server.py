@@ -8,10 +8,16 @@ using YANG models and following RFC 8040 standards.
 
 from flask import Flask, jsonify, request, Response
 import json
+import os
+import sys
 import xml.etree.ElementTree as ET
 from datetime import datetime
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'common'))
+from request_profiler import install_request_profiler
+
 app = Flask(__name__)
+install_request_profiler(app)
 
 # In-memory data store for network functions, subscribers, sessions, and QoS profiles
 network_data = {
@@ -7,16 +7,40 @@ This agent exposes metrics from 5G core network functions via SNMP.
 
 from pysnmp.entity import engine, config
 from pysnmp.entity.rfc3413 import cmdrsp, context
-from pysnmp.carrier.asyncore.dispatch import AsyncoreDispatcher
 from pysnmp.carrier.asyncore.dgram import udp
 from pysnmp.proto.api import v2c
-import random
-import time
+import asyncio
+import multiprocessing
+import os
 import threading
-from datetime import datetime
+import time
+import types
+
+from snmp_mib import MibTree, MibInstrumController, gauge
+from snmp_collectors import (MetricsSnapshot, CollectorScheduler, SimulationCollector, DatastoreCollector,
+                             ProcCollector, ReplayCollector)
+from snmp_tables import NfTables, sync_network_functions
+from snmp_transport import SnmpResponder, serve, run_workers
+from snmp_traps import ThresholdRule, ThresholdMonitor, NotificationSender, parse_receivers
+from snmp_history import MetricHistory
+
+# Agent address and community
+SNMP_HOST = os.environ.get('SNMP_HOST', 'localhost')
+SNMP_PORT = int(os.environ.get('SNMP_PORT', 161))
+COMMUNITY = 'public'
+
+# asyncore: pysnmp engine; asyncio: lightweight responder, optionally in SO_REUSEPORT worker processes
+SNMP_TRANSPORT = os.environ.get('SNMP_TRANSPORT', 'asyncore')
+SNMP_WORKERS = int(os.environ.get('SNMP_WORKERS', 1))
+# Encoded responses cached per metrics generation by the asyncio transport (0 disables the cache)
+RESPONSE_CACHE_SIZE = int(os.environ.get('SNMP_RESPONSE_CACHE', 1024))
 
-# Simulated metric values (in a real implementation, these would come from the actual 5G core)
-metrics = {
+# RESTCONF resource the NF instance tables are fed from
+NETWORK_FUNCTIONS_URL = os.environ.get('SNMP_NF_URL', 'http://localhost:8081/restconf/data/network-functions')
+NF_SYNC_INTERVAL = 30
+
+# Metric values served by the agent, published by the metric collectors
+metrics = MetricsSnapshot({
     'amf_active_sessions': 1250,
     'amf_cpu_utilization': 45,
     'amf_memory_utilization': 60,
@@ -26,22 +50,26 @@ metrics = {
     'upf_active_users': 980,
     'upf_throughput': 125000000,  # bits per second
     'upf_packet_loss': 0.05  # percentage
-}
+})
+
+# Collected samples kept per metric in the history table for pollers catching up after gaps
+HISTORY_SIZE = int(os.environ.get('SNMP_HISTORY_SIZE', 360))
+
+# Notification receivers, comma separated: trap:host:port or inform:host:port
+TRAP_RECEIVERS = parse_receivers(os.environ.get('SNMP_TRAP_RECEIVERS', ''))
+
+# Threshold rules evaluated on every collected snapshot: (name, metric, threshold, clear level)
+THRESHOLD_RULES = [
+    ('upf-packet-loss', 'upf_packet_loss', 0.08, 0.05),  # percentage
+    ('amf-cpu-saturation', 'amf_cpu_utilization', 90, 80),
+    ('smf-cpu-saturation', 'smf_cpu_utilization', 90, 80),
+    ('upf-throughput-drop', 'upf_throughput', 10000000, 50000000, 'below')
+]
 
-# Update metrics periodically with simulated data
-def update_metrics():
-    while True:
-        # Simulate changing metrics
-        metrics['amf_active_sessions'] = random.randint(1000, 1500)
-        metrics['amf_cpu_utilization'] = random.randint(30, 70)
-        metrics['amf_memory_utilization'] = random.randint(50, 80)
-        metrics['smf_active_pdu_sessions'] = random.randint(900, 1300)
-        metrics['smf_cpu_utilization'] = random.randint(25, 60)
-        metrics['smf_memory_utilization'] = random.randint(45, 75)
-        metrics['upf_active_users'] = random.randint(800, 1200)
-        metrics['upf_throughput'] = random.randint(100000000, 150000000)
-        metrics['upf_packet_loss'] = round(random.uniform(0.01, 0.1), 2)
-        time.sleep(5)  # Update every 5 seconds
+# Metric sources, comma separated: simulation, datastore, proc, replay
+COLLECTORS = os.environ.get('SNMP_COLLECTORS', 'simulation')
+DATASTORE_URL = os.environ.get('SNMP_DATASTORE_URL', 'http://localhost:8081/restconf/data')
+REPLAY_FILE = os.environ.get('SNMP_REPLAY_FILE', 'metrics.csv')
 
 # SNMP MIB definitions
 # These OIDs are custom for our 5G core monitoring
@@ -65,9 +93,92 @@ UPF_ACTIVE_USERS_OID = BASE_OID + (1, 3, 1)
 UPF_THROUGHPUT_OID = BASE_OID + (1, 3, 2)
 UPF_PACKET_LOSS_OID = BASE_OID + (1, 3, 3)
 
+# Agent statistics OIDs (asyncio transport)
+AGENT_STATS_OID = BASE_OID + (3,)
+AGENT_REQUESTS_OID = AGENT_STATS_OID + (1,)
+RESPONSE_CACHE_HITS_OID = AGENT_STATS_OID + (2,)
+RESPONSE_CACHE_MISSES_OID = AGENT_STATS_OID + (3,)
+RESPONSE_CACHE_HIT_RATE_OID = AGENT_STATS_OID + (4,)
+
+# Scalar MIB objects serving the metrics dict: name -> (OID, scale)
+# Values are Gauge32; packet loss is served in hundredths of a percent
+METRIC_OBJECTS = {
+    'amf_active_sessions': (AMF_ACTIVE_SESSIONS_OID, 1),
+    'amf_cpu_utilization': (AMF_CPU_UTILIZATION_OID, 1),
+    'amf_memory_utilization': (AMF_MEMORY_UTILIZATION_OID, 1),
+    'smf_active_pdu_sessions': (SMF_ACTIVE_PDU_SESSIONS_OID, 1),
+    'smf_cpu_utilization': (SMF_CPU_UTILIZATION_OID, 1),
+    'smf_memory_utilization': (SMF_MEMORY_UTILIZATION_OID, 1),
+    'upf_active_users': (UPF_ACTIVE_USERS_OID, 1),
+    'upf_throughput': (UPF_THROUGHPUT_OID, 1),
+    'upf_packet_loss': (UPF_PACKET_LOSS_OID, 100)
+}
+
+def register_metrics(tree, values=metrics, objects=METRIC_OBJECTS):
+    """Register a scalar instance (OID.0) for each metric, read live from values"""
+    for name, (oid, scale) in objects.items():
+        tree.register(oid, (0,), lambda name=name, scale=scale: gauge(values[name], scale))
+
+def register_responder_stats(tree, responder):
+    """Register the request and response cache statistics of an asyncio responder
+
+    Counts are Counter32; the hit rate is a Gauge32 in hundredths of a percent.
+    """
+    stats = responder.stats
+
+    def hit_rate():
+        lookups = stats['cache_hits'] + stats['cache_misses']
+        return gauge(stats['cache_hits'] / lookups if lookups else 0, 10000)
+
+    tree.register(AGENT_REQUESTS_OID, (0,), lambda: v2c.Counter32(stats['requests'] % 2 ** 32))
+    tree.register(RESPONSE_CACHE_HITS_OID, (0,), lambda: v2c.Counter32(stats['cache_hits'] % 2 ** 32))
+    tree.register(RESPONSE_CACHE_MISSES_OID, (0,), lambda: v2c.Counter32(stats['cache_misses'] % 2 ** 32))
+    tree.register(RESPONSE_CACHE_HIT_RATE_OID, (0,), hit_rate)
+
+def build_collectors(names=COLLECTORS):
+    """Return the collectors named in a comma separated list"""
+    factories = {
+        'simulation': SimulationCollector,
+        'datastore': lambda: DatastoreCollector(DATASTORE_URL),
+        'proc': ProcCollector,
+        # The poller records served values, so packet loss is scaled back to a percentage
+        'replay': lambda: ReplayCollector(REPLAY_FILE, scales={name: scale for name, (_, scale)
+                                                                in METRIC_OBJECTS.items()})
+    }
+    collectors = []
+    for name in filter(None, (name.strip() for name in names.split(','))):
+        if name not in factories:
+            raise ValueError(f"Unknown metric collector: {name}")
+        collectors.append(factories[name]())
+    return collectors
+
 # SNMP Agent implementation
 class SNMPAgent:
-    def __init__(self):
+    def __init__(self, nf_url=NETWORK_FUNCTIONS_URL, collectors=None, host=SNMP_HOST, port=SNMP_PORT,
+                 transport=SNMP_TRANSPORT, workers=SNMP_WORKERS, cache_size=RESPONSE_CACHE_SIZE):
+        if transport not in ('asyncore', 'asyncio'):
+            raise ValueError(f"Unknown SNMP transport: {transport}")
+        self.host = host
+        self.port = port
+        self.transport = transport
+        self.workers = workers
+        self.cache_size = cache_size
+
+        # Managed objects served by either transport
+        self.mib = MibTree()
+        register_metrics(self.mib)
+        self.nf_tables = NfTables(self.mib)
+        self.nf_url = nf_url
+        self.scheduler = CollectorScheduler(metrics, build_collectors() if collectors is None else collectors)
+        self.sender = NotificationSender(TRAP_RECEIVERS, COMMUNITY)
+        self.history = MetricHistory(self.mib, METRIC_OBJECTS, HISTORY_SIZE)
+        self.monitor = ThresholdMonitor([ThresholdRule(*rule) for rule in THRESHOLD_RULES], self.sender,
+                                        METRIC_OBJECTS)
+
+        if transport == 'asyncore':
+            self._setup_engine()
+
+    def _setup_engine(self):
         # Create SNMP engine
         self.snmpEngine = engine.SnmpEngine()
 
@@ -75,18 +186,24 @@ class SNMPAgent:
         config.addTransport(
             self.snmpEngine,
             udp.domainName,
-            udp.UdpTransport().openServerMode(('localhost', 161))
+            udp.UdpTransport().openServerMode((self.host, self.port))
         )
 
         # SNMPv2c setup
-        config.addV1System(self.snmpEngine, '5g-core-agent', 'public')
+        config.addV1System(self.snmpEngine, '5g-core-agent', COMMUNITY)
 
         config.addTargetParams(
             self.snmpEngine, '5g-core-params', '5g-core-agent', 'noAuthNoPriv', 1
         )
 
-        # Create SNMP context
+        # Read access to the 5G core subtree for SNMPv1 and SNMPv2c
+        config.addVacmUser(self.snmpEngine, 1, '5g-core-agent', 'noAuthNoPriv', readSubTree=BASE_OID)
+        config.addVacmUser(self.snmpEngine, 2, '5g-core-agent', 'noAuthNoPriv', readSubTree=BASE_OID)
+
+        # Create SNMP context served from the metrics MIB
         self.snmpContext = context.SnmpContext(self.snmpEngine)
+        self.snmpContext.unregisterContextName(v2c.OctetString(''))
+        self.snmpContext.registerContextName(v2c.OctetString(''), MibInstrumController(self.mib, metrics))
 
         # Register SNMP applications
         cmdrsp.GetCommandResponder(self.snmpEngine, self.snmpContext)
@@ -94,19 +211,107 @@ class SNMPAgent:
         cmdrsp.NextCommandResponder(self.snmpEngine, self.snmpContext)
         cmdrsp.BulkCommandResponder(self.snmpEngine, self.snmpContext)
 
+    def start_background(self, notifications=True, history=True, tables=None):
+        """Start the metric collectors, metric history, threshold notifications and the NF table sync
+
+        The NF table sync feeds tables (the agent's own NF tables by default).
+        """
+        if history:
+            self.history.attach(metrics)
+        if notifications and self.sender.receivers:
+            self.sender.start()
+            self.monitor.attach(metrics)
+        self.scheduler.start()
+
+        # Keep the per-instance NF tables in sync with the network functions
+        if self.nf_url:
+            nf_thread = threading.Thread(target=sync_network_functions,
+                                         args=(tables or self.nf_tables, self.nf_url, NF_SYNC_INTERVAL))
+            nf_thread.daemon = True
+            nf_thread.start()
+
+    def serve_asyncio(self, reuse_port=False, started=None, notifications=True, background=True):
+        """Start the background threads and answer requests on an asyncio endpoint until cancelled"""
+        if background:
+            self.start_background(notifications)
+        # Responses are cached per metrics generation, except for the agent's own statistics
+        responder = SnmpResponder(self.mib, COMMUNITY, metrics, cache_size=self.cache_size,
+                                  uncached=(AGENT_STATS_OID,))
+        register_responder_stats(self.mib, responder)
+        try:
+            asyncio.run(serve(responder, self.host, self.port, reuse_port, started))
+        except KeyboardInterrupt:
+            pass
+
+    def serve_workers(self):
+        """Answer requests in SO_REUSEPORT worker processes fed from this process
+
+        Only this process runs the collectors, the NF table sync and the
+        threshold notifications. Every published snapshot and every NF table
+        sync is sent to each worker in the same order, so whichever worker the
+        kernel hands a request to serves the same values and history samples.
+        """
+        context = multiprocessing.get_context('fork')
+        feeds = [context.Pipe(duplex=False) for _ in range(self.workers)]
+
+        def forward(message):
+            for _, sender in feeds:
+                try:
+                    sender.send(message)
+                except OSError:
+                    # The worker has exited
+                    pass
+
+        def started():
+            metrics.add_listener(lambda values, generation: forward(('metrics', dict(values), time.time())))
+            tables = types.SimpleNamespace(sync=lambda network_functions: forward(('tables', network_functions, None)))
+            self.start_background(history=False, tables=tables)
+
+        run_workers(lambda index: self.serve_worker(feeds[index][0]), self.workers, started)
+
+    def serve_worker(self, feed):
+        """Answer requests in a worker process with the metrics and NF tables received on feed"""
+        # History samples are stamped with the time they were published, as in every other worker
+        self._published_at = time.time()
+        self.history.clock = lambda: self._published_at
+        self.history.attach(metrics)
+        receiver = threading.Thread(target=self.receive, args=(feed,))
+        receiver.daemon = True
+        receiver.start()
+        self.serve_asyncio(reuse_port=True, background=False)
+
+    def receive(self, feed):
+        """Apply the snapshots and NF table syncs received on feed until it is closed"""
+        while True:
+            try:
+                kind, payload, published_at = feed.recv()
+            except (EOFError, OSError):
+                return
+            if kind == 'metrics':
+                self._published_at = published_at
+                metrics.publish(payload)
+            else:
+                self.nf_tables.sync(payload)
+
     def start(self):
         """Start the SNMP agent"""
-        print("5G Core SNMP Agent starting on localhost:161")
-        print("Community string: public")
+        print(f"5G Core SNMP Agent starting on {self.host}:{self.port} ({self.transport} transport)")
+        print(f"Community string: {COMMUNITY}")
         print("Press Ctrl+C to stop")
-        
-        # Start metrics update thread
-        metrics_thread = threading.Thread(target=update_metrics)
-        metrics_thread.daemon = True
-        metrics_thread.start()
-        
-        # Create and run the SNMP dispatcher
-        dispatcher = AsyncoreDispatcher()
+
+        if self.transport == 'asyncio':
+            if self.workers > 1:
+                self.serve_workers()
+            else:
+                self.serve_asyncio()
+            print("\nShutting down SNMP agent...")
+            return
+
+        self.start_background()
+
+        # Run the engine's SNMP dispatcher
+        dispatcher = self.snmpEngine.transportDispatcher
+        dispatcher.jobStarted(1)
         try:
             dispatcher.runDispatcher()
         except KeyboardInterrupt:
@@ -116,4 +321,4 @@ class SNMPAgent:
 
 if __name__ == "__main__":
     agent = SNMPAgent()
-    agent.start()
\ No newline at end of file
+    agent.start()
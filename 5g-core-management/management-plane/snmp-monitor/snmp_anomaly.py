@@ -0,0 +1,345 @@
+#!/usr/bin/env python3
+
+"""
+Streaming anomaly detection on polled 5G Core metrics
+Scores every polled sample against a baseline learned from the series'
+past, keeping a fixed handful of numbers per series (target and metric)
+instead of its history: an exponentially weighted mean and variance, a
+streaming median and median absolute deviation for a robust score, and
+optionally a seasonal offset per slot of a period (such as each hour of the
+day). All series are held in NumPy arrays, so a whole fleet's polling cycle
+is scored and learned in one vectorized pass.
+
+A series whose score reaches the threshold raises an anomaly event, which
+clears once the score falls back under the clear level; events go to the
+detector's listeners, such as AnomalyTraps to send SNMP notifications.
+
+Run this module to replay recorded poller output (CSV, JSON, fleet JSON
+lines or segment directories) through a detector:
+
+    python snmp_anomaly.py metrics.csv fleet.jsonl --method robust --speed 3600
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from pysnmp.proto.api import v2c
+
+from snmp_segments import SegmentLog, directory_target, read_poll_results
+from snmp_store import POLL_FIELDS, parse_timestamp
+from snmp_traps import (ANOMALY_CLEARED_OID, ANOMALY_EXPECTED_OID, ANOMALY_OID, ANOMALY_SCORE_OID,
+                        ANOMALY_SERIES_OID, ANOMALY_VALUE_OID, NotificationSender, parse_receivers)
+
+METHODS = ('ewma', 'robust')
+# Scales the median absolute deviation to a standard deviation for normally distributed values
+MAD_SCALE = 1.4826
+INTEGER32_MAX = 2 ** 31 - 1
+
+
+class AnomalyDetector:
+    """Scores and learns samples of many series at once
+
+    With method 'ewma' a sample's score is its distance from the
+    exponentially weighted mean in standard deviations; with 'robust' from
+    the streaming median in scaled median absolute deviations, which a few
+    outliers barely move. alpha is the weight of each new sample. season
+    (period, slots) in seconds subtracts a learned offset per slot of the
+    period before scoring, so a daily cycle is not reported as anomalous.
+    Series alert only after warmup samples.
+    """
+
+    def __init__(self, method='ewma', alpha=0.05, threshold=4.0, clear=2.0, warmup=30, season=None,
+                 season_alpha=0.1, min_deviation=1e-9):
+        if method not in METHODS:
+            raise ValueError(f"Unknown anomaly detection method: {method}")
+        if clear > threshold:
+            raise ValueError("Clear level is above the threshold")
+        self.method = method
+        self.alpha = alpha
+        self.threshold = threshold
+        self.clear = clear
+        self.warmup = warmup
+        self.season = season
+        self.season_alpha = season_alpha
+        self.min_deviation = min_deviation
+        self.series = {}
+        self.names = []
+        self.listeners = []
+        self.stats = {'samples': 0, 'anomalies': 0, 'cleared': 0}
+        slots = season[1] if season else 0
+        self.mean = np.zeros(0)
+        self.var = np.zeros(0)
+        self.median = np.zeros(0)
+        self.mad = np.zeros(0)
+        self.count = np.zeros(0, dtype=np.int64)
+        self.active = np.zeros(0, dtype=bool)
+        self.seasonal = np.full((0, slots), np.nan)
+
+    def add_listener(self, callback):
+        """Call callback(event) for every anomaly and cleared event"""
+        self.listeners.append(callback)
+
+    def index(self, target, metric):
+        """Return the series index of a target's metric, adding the series if new"""
+        key = (target, metric)
+        index = self.series.get(key)
+        if index is None:
+            index = self.series[key] = len(self.names)
+            self.names.append(key)
+            if index >= len(self.mean):
+                self._grow(max(16, 2 * len(self.mean)))
+        return index
+
+    def _grow(self, capacity):
+        extra = capacity - len(self.mean)
+        self.mean = np.concatenate([self.mean, np.zeros(extra)])
+        self.var = np.concatenate([self.var, np.zeros(extra)])
+        self.median = np.concatenate([self.median, np.zeros(extra)])
+        self.mad = np.concatenate([self.mad, np.zeros(extra)])
+        self.count = np.concatenate([self.count, np.zeros(extra, dtype=np.int64)])
+        self.active = np.concatenate([self.active, np.zeros(extra, dtype=bool)])
+        self.seasonal = np.concatenate([self.seasonal, np.full((extra, self.seasonal.shape[1]), np.nan)])
+
+    def update(self, indices, values, timestamps):
+        """Score one sample of each series in indices, then learn it; returns the scores
+
+        Each series may appear once per call. NaN values are skipped and
+        scored NaN. timestamps is one time for all samples or one per sample.
+        """
+        indices = np.asarray(indices, dtype=np.intp)
+        values = np.asarray(values, dtype=np.float64)
+        timestamps = np.broadcast_to(np.asarray(timestamps, dtype=np.float64), values.shape)
+        scores = np.full(values.shape, np.nan)
+        present = ~np.isnan(values)
+        if not present.all():
+            indices, values, timestamps = indices[present], values[present], timestamps[present]
+        count = self.count[indices]
+        first = count == 0
+        mean = np.where(first, values, self.mean[indices])
+        median = np.where(first, values, self.median[indices])
+        var, mad = self.var[indices], self.mad[indices]
+        if self.season:
+            period, slots = self.season
+            slot = (timestamps % period // (period / slots)).astype(np.intp)
+            seasonal = self.seasonal[indices, slot]
+            # A slot seen for the first time starts at the value's offset from the baseline
+            unseen = np.isnan(seasonal)
+            seasonal[unseen] = (values - (mean if self.method == 'ewma' else median))[unseen]
+        else:
+            seasonal = 0.0
+        # Deseasonalized values, scored against the state
+        level = values - seasonal
+        deviation = level - mean
+        if self.method == 'ewma':
+            scale = np.maximum(np.sqrt(var), self.min_deviation)
+            score = deviation / scale
+            expected = mean + seasonal
+        else:
+            scale = np.maximum(MAD_SCALE * mad, self.min_deviation)
+            score = (level - median) / scale
+            expected = median + seasonal
+        score[first] = 0.0
+        scores[present] = score
+
+        # Past the warmup a sample is learned as at most threshold from the baseline, so an anomaly only
+        # widens the baseline step by step instead of dragging it along at once
+        bound = np.where(count >= self.warmup, self.threshold * scale, np.inf)
+        deviation = np.clip(deviation, -bound, bound)
+        residual = deviation if self.method == 'ewma' else np.clip(level - median, -bound, bound)
+        alpha = self.alpha
+        self.mean[indices] = mean + alpha * deviation
+        self.var[indices] = (1 - alpha) * (var + alpha * deviation ** 2)
+        # Median steps of a fraction of the spread towards the sample; the spread follows the absolute deviations
+        self.median[indices] = median + alpha * np.sign(level - median) * mad
+        self.mad[indices] = mad + alpha * (np.minimum(np.abs(level - median), bound) - mad)
+        if self.season:
+            self.seasonal[indices, slot] = seasonal + self.season_alpha * residual
+        self.count[indices] = count + 1
+        self.stats['samples'] += len(indices)
+
+        magnitude = np.abs(score)
+        active = self.active[indices]
+        rising = ~active & (count >= self.warmup) & (magnitude >= self.threshold)
+        cleared = active & (magnitude < self.clear)
+        if rising.any() or cleared.any():
+            self.active[indices[rising]] = True
+            self.active[indices[cleared]] = False
+            for event, changed in (('anomaly', rising), ('cleared', cleared)):
+                for position in np.flatnonzero(changed):
+                    self._emit(event, indices[position], values[position], expected[position], score[position],
+                               timestamps[position])
+        return scores
+
+    def _emit(self, event, index, value, expected, score, timestamp):
+        target, metric = self.names[index]
+        self.stats['anomalies' if event == 'anomaly' else 'cleared'] += 1
+        event = {'event': event, 'target': target, 'metric': metric, 'value': float(value),
+                 'expected': float(expected), 'score': float(score), 'timestamp': float(timestamp)}
+        for callback in self.listeners:
+            callback(event)
+
+    def families(self):
+        """Return the detector's statistics as extra Prometheus families (see snmp_exporter)"""
+        return [('snmp_anomaly_series', 'Series scored by the anomaly detector', 'gauge', [(None, len(self.names))]),
+                ('snmp_anomaly_active', 'Series currently anomalous', 'gauge',
+                 [(None, int(self.active.sum()))]),
+                ('snmp_anomalies_total', 'Anomalies raised', 'counter', [(None, self.stats['anomalies'])]),
+                ('snmp_anomalies_cleared_total', 'Anomalies cleared', 'counter', [(None, self.stats['cleared'])])]
+
+    def _samples(self, target, metrics):
+        """Return the (series index, value) of the numeric metrics of one poll"""
+        samples = []
+        for name, value in metrics.items():
+            if name in POLL_FIELDS:
+                continue
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                continue
+            samples.append((self.index(target, name), value))
+        return samples
+
+    def append(self, target, metrics, timestamp=None):
+        """Score and learn one poll of a target: the poller's {name: value} dict with its "timestamp" """
+        samples = self._samples(target, metrics)
+        if samples:
+            indices, values = zip(*samples)
+            self.update(indices, values, parse_timestamp(metrics['timestamp'] if timestamp is None else timestamp))
+
+    def append_many(self, results):
+        """Score and learn a polling cycle of (target, metrics) results in one pass, one result per target"""
+        indices, values, timestamps = [], [], []
+        for target, metrics in results:
+            samples = self._samples(target, metrics)
+            indices.extend(index for index, _ in samples)
+            values.extend(value for _, value in samples)
+            timestamps.extend([parse_timestamp(metrics['timestamp'])] * len(samples))
+        if indices:
+            self.update(indices, values, timestamps)
+
+
+class AnomalyTraps:
+    """A detector listener sending anomalyDetected and anomalyCleared notifications"""
+
+    def __init__(self, sender):
+        self.sender = sender
+
+    def __call__(self, event):
+        score = int(np.clip(np.nan_to_num(event['score'] * 100), -INTEGER32_MAX, INTEGER32_MAX))
+        self.sender.notify(ANOMALY_OID if event['event'] == 'anomaly' else ANOMALY_CLEARED_OID, [
+            (ANOMALY_SERIES_OID, v2c.OctetString(f"{event['target']}/{event['metric']}")),
+            (ANOMALY_SCORE_OID, v2c.Integer32(score)),
+            (ANOMALY_VALUE_OID, v2c.OctetString(f"{event['value']:g}")),
+            (ANOMALY_EXPECTED_OID, v2c.OctetString(f"{event['expected']:g}")),
+        ], limited=event['event'] == 'anomaly')
+
+
+def print_event(event, file=sys.stdout):
+    print(f"{event['event']:8} {event['target']}/{event['metric']} = {event['value']:g} "
+          f"(expected {event['expected']:g}, score {event['score']:+.1f})", file=file)
+
+
+def recorded_cycles(path, target='localhost'):
+    """Yield the polling cycles of recorded poller output
+
+    Each cycle is a list of (target, metrics) results in which every target
+    appears once; results without a target belong to target.
+    """
+    cycle, seen = [], set()
+    for metrics in read_poll_results(path):
+        name = metrics.get('target', target)
+        if name in seen:
+            yield cycle
+            cycle, seen = [], set()
+        cycle.append((name, metrics))
+        seen.add(name)
+    if cycle:
+        yield cycle
+
+
+def replay(paths, detector, speed=None, target='localhost'):
+    """Run recorded poller output through detector, at speed times real time (as fast as possible without)
+
+    Segment directories are read as arrays and fed row by row; the other
+    files cycle by cycle. Returns the polls replayed, the time span they
+    cover and the seconds the replay took.
+    """
+    started = time.monotonic()
+    first = last = None
+    polls = 0
+
+    def pace(timestamp):
+        nonlocal first, last
+        if first is None:
+            first = timestamp
+        last = timestamp
+        if speed:
+            delay = (timestamp - first) / speed - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
+
+    for path in paths:
+        if os.path.isdir(path):
+            with SegmentLog(path) as log:
+                times, values = log.read()
+            name = directory_target(os.path.basename(os.path.normpath(path)))
+            indices = [detector.index(name, metric) for metric in values]
+            matrix = np.column_stack(list(values.values())) if values else np.empty((len(times), 0))
+            for timestamp, row in zip(times, matrix):
+                pace(timestamp)
+                detector.update(indices, row, timestamp)
+                polls += 1
+            continue
+        for cycle in recorded_cycles(path, target):
+            pace(parse_timestamp(cycle[0][1]['timestamp']))
+            detector.append_many(cycle)
+            polls += len(cycle)
+    span = 0.0 if first is None else last - first
+    return polls, span, time.monotonic() - started
+
+
+def parse_season(text):
+    """Parse "period/slots" seconds, such as 86400/24 for hourly slots of a day"""
+    period, _, slots = text.partition('/')
+    return float(period), int(slots or 24)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded 5G core metrics through the anomaly detector")
+    parser.add_argument("paths", nargs='+', help="poller CSV, JSON or JSON lines files or segment directories")
+    parser.add_argument("--method", choices=METHODS, default='ewma')
+    parser.add_argument("--alpha", type=float, default=0.05, help="weight of each new sample")
+    parser.add_argument("--threshold", type=float, default=4.0, help="score raising an anomaly")
+    parser.add_argument("--clear", type=float, default=2.0, help="score under which an anomaly clears")
+    parser.add_argument("--warmup", type=int, default=30, help="samples learned before a series can alert")
+    parser.add_argument("--season", type=parse_season, help="seasonal baseline as period/slots seconds, e.g. 86400/24")
+    parser.add_argument("--speed", type=float, help="replay at this many times real time (default: as fast as possible)")
+    parser.add_argument("--target", default='localhost', help="target of results recorded without one")
+    parser.add_argument("--notify", help="send notifications to trap:host:port or inform:host:port receivers")
+    args = parser.parse_args()
+
+    detector = AnomalyDetector(args.method, args.alpha, args.threshold, args.clear, args.warmup, args.season)
+    detector.add_listener(print_event)
+    sender = None
+    if args.notify:
+        sender = NotificationSender(parse_receivers(args.notify))
+        sender.start()
+        detector.add_listener(AnomalyTraps(sender))
+    try:
+        polls, span, elapsed = replay(args.paths, detector, args.speed, args.target)
+    except KeyboardInterrupt:
+        print("\nStopping replay...", file=sys.stderr)
+        return
+    finally:
+        if sender is not None:
+            sender.stop()
+    print(f"Replayed {polls} polls ({detector.stats['samples']} samples, {span / 3600:.1f} h) in {elapsed:.2f} s, "
+          f"{span / max(elapsed, 1e-9):.0f}x real time: {detector.stats['anomalies']} anomalies, "
+          f"{detector.stats['cleared']} cleared", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+
+"""
+Metric collectors for the 5G Core SNMP agent
+Each collector reads a set of metric values from one source (the shared
+datastore over RESTCONF, /proc, a replay file or the simulation) on its own
+interval. A single scheduler thread runs the collectors when they are due
+and publishes what they return into a double-buffered MetricsSnapshot:
+values are written into a back buffer that then replaces the front buffer
+in one reference swap, so SNMP responders only ever see complete updates.
+"""
+
+import csv
+import heapq
+import json
+import os
+import random
+import threading
+import time
+import urllib.request
+from collections.abc import Mapping
+from contextlib import contextmanager
+
+
+class MetricsSnapshot(Mapping):
+    """Double-buffered metric values
+
+    Readers index the front buffer, which is never modified once published.
+    publish() copies it into a back buffer, applies the new values and swaps
+    the buffers, bumping the generation. A responder can pin the current
+    buffer while it answers a request, so every variable binding of one PDU
+    is read from the same generation.
+    """
+
+    def __init__(self, values=None):
+        self._front = dict(values or {})
+        self.generation = 0
+        self._lock = threading.Lock()
+        self._pinned = threading.local()
+        self._listeners = []
+
+    def add_listener(self, callback):
+        """Call callback(values, generation) with the complete values after every publish"""
+        self._listeners.append(callback)
+
+    def values_dict(self):
+        """Return the buffer the calling thread reads: its pinned buffer or the front buffer"""
+        pinned = getattr(self._pinned, "values", None)
+        return self._front if pinned is None else pinned
+
+    def __getitem__(self, name):
+        return self.values_dict()[name]
+
+    def __iter__(self):
+        return iter(self.values_dict())
+
+    def __len__(self):
+        return len(self.values_dict())
+
+    def publish(self, values):
+        """Atomically replace the published values of the given metrics"""
+        if not values:
+            return
+        with self._lock:
+            back = dict(self._front)
+            back.update(values)
+            self._front = back
+            self.generation += 1
+            generation = self.generation
+        for callback in self._listeners:
+            callback(back, generation)
+
+    @contextmanager
+    def pinned(self):
+        """Read one generation of the values for the duration of the block"""
+        outer = getattr(self._pinned, "values", None)
+        self._pinned.values = self._front if outer is None else outer
+        try:
+            yield self._pinned.values
+        finally:
+            self._pinned.values = outer
+
+
+class Collector:
+    """A source of metric values, collected every interval seconds
+
+    Subclasses implement collect(), returning a dict of metric name to value
+    containing only the metrics the source could read this time.
+    """
+
+    name = "collector"
+
+    def __init__(self, interval):
+        self.interval = interval
+
+    def collect(self):
+        raise NotImplementedError
+
+
+class SimulationCollector(Collector):
+    """Random metric values, for running the agent without a 5G core"""
+
+    name = "simulation"
+
+    RANGES = {
+        'amf_active_sessions': (1000, 1500),
+        'amf_cpu_utilization': (30, 70),
+        'amf_memory_utilization': (50, 80),
+        'smf_active_pdu_sessions': (900, 1300),
+        'smf_cpu_utilization': (25, 60),
+        'smf_memory_utilization': (45, 75),
+        'upf_active_users': (800, 1200),
+        'upf_throughput': (100000000, 150000000)
+    }
+
+    def __init__(self, interval=5, seed=None):
+        super().__init__(interval)
+        self.random = random.Random(seed)
+
+    def collect(self):
+        values = {name: self.random.randint(low, high) for name, (low, high) in self.RANGES.items()}
+        values['upf_packet_loss'] = round(self.random.uniform(0.01, 0.1), 2)
+        return values
+
+
+def fetch_json(url, timeout=5):
+    """Return the JSON document at a URL"""
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.load(response)
+
+
+class DatastoreCollector(Collector):
+    """Session and subscriber counts from the shared datastore
+
+    The datastore is read from the RESTCONF /restconf/data resource:
+    registered (active) subscribers are the AMF's sessions, active PDU
+    sessions the SMF's, and subscribers with an active PDU session the
+    UPF's users.
+    """
+
+    name = "datastore"
+
+    def __init__(self, url, interval=10, fetch=fetch_json):
+        super().__init__(interval)
+        self.url = url
+        self.fetch = fetch
+
+    def collect(self):
+        data = self.fetch(self.url)
+        subscribers = data.get("subscribers", {}).get("subscriber", [])
+        sessions = [session for session in data.get("sessions", {}).get("pdu-session", [])
+                    if session.get("status") == "active"]
+        return {
+            'amf_active_sessions': sum(1 for subscriber in subscribers if subscriber.get("status") == "active"),
+            'smf_active_pdu_sessions': len(sessions),
+            'upf_active_users': len({session.get("imsi") for session in sessions})
+        }
+
+
+class ProcCollector(Collector):
+    """CPU and memory of the NF processes and UPF traffic from /proc
+
+    CPU utilization is the process's CPU time over the wall time since the
+    previous collection, memory utilization its resident set over MemTotal.
+    Throughput and packet loss are read from the counters of the UPF's tunnel
+    interface in /proc/net/dev. Processes that are not running are skipped.
+    """
+
+    name = "proc"
+
+    PROCESSES = {
+        'amf': 'open5gs-amfd',
+        'smf': 'open5gs-smfd',
+        'upf': 'open5gs-upfd'
+    }
+
+    def __init__(self, interval=5, processes=PROCESSES, interface='ogstun', proc='/proc', clock=time.monotonic):
+        super().__init__(interval)
+        self.processes = processes
+        self.interface = interface
+        self.proc = proc
+        self.clock = clock
+        self._pids = {}
+        self._previous = {}
+
+    def _read(self, *path):
+        with open(os.path.join(self.proc, *path)) as f:
+            return f.read()
+
+    def _find_pid(self, command):
+        for entry in os.listdir(self.proc):
+            if entry.isdigit():
+                try:
+                    if self._read(entry, 'comm').strip() == command:
+                        return entry
+                except OSError:
+                    continue
+        return None
+
+    def _rate(self, key, value, now):
+        """Return the change of a counter per second since the previous collection"""
+        previous = self._previous.get(key)
+        self._previous[key] = (value, now)
+        if previous is None or now <= previous[1] or value < previous[0]:
+            return None
+        return (value - previous[0]) / (now - previous[1])
+
+    def collect(self):
+        values = {}
+        now = self.clock()
+        clock_ticks = os.sysconf('SC_CLK_TCK')
+        mem_total = self._mem_total()
+        for nf, command in self.processes.items():
+            pid = self._pids.get(nf) or self._find_pid(command)
+            try:
+                # Fields after the parenthesised command name; utime and stime are 14 and 15
+                stat = self._read(pid, 'stat').rsplit(')', 1)[1].split() if pid else None
+                status = self._read(pid, 'status') if pid else ''
+            except OSError:
+                stat = None
+            if stat is None:
+                self._pids.pop(nf, None)
+                continue
+            self._pids[nf] = pid
+            cpu = self._rate((nf, pid, 'cpu'), (int(stat[11]) + int(stat[12])) / clock_ticks, now)
+            if cpu is not None:
+                values[f'{nf}_cpu_utilization'] = round(cpu * 100, 1)
+            for line in status.splitlines():
+                if line.startswith('VmRSS:') and mem_total:
+                    values[f'{nf}_memory_utilization'] = round(int(line.split()[1]) * 100 / mem_total, 1)
+        values.update(self._interface_stats(now))
+        return values
+
+    def _mem_total(self):
+        try:
+            for line in self._read('meminfo').splitlines():
+                if line.startswith('MemTotal:'):
+                    return int(line.split()[1])
+        except OSError:
+            pass
+        return None
+
+    def _interface_stats(self, now):
+        try:
+            lines = self._read('net', 'dev').splitlines()[2:]
+        except OSError:
+            return {}
+        for line in lines:
+            name, _, counters = line.partition(':')
+            if name.strip() != self.interface:
+                continue
+            counters = [int(counter) for counter in counters.split()]
+            rx_bytes, rx_packets, rx_drop = counters[0], counters[1], counters[3]
+            tx_bytes, tx_packets, tx_drop = counters[8], counters[9], counters[11]
+            values = {}
+            throughput = self._rate('bytes', rx_bytes + tx_bytes, now)
+            packets = self._rate('packets', rx_packets + tx_packets, now)
+            drops = self._rate('drops', rx_drop + tx_drop, now)
+            if throughput is not None:
+                values['upf_throughput'] = int(throughput * 8)
+            if packets and drops is not None:
+                values['upf_packet_loss'] = round(drops * 100 / (packets + drops), 2)
+            return values
+        return {}
+
+
+class ReplayCollector(Collector):
+    """Metric values replayed from a file recorded by the SNMP poller
+
+    Accepts the poller's CSV export (one row per poll) or JSON export (one
+    record or a list of them) and returns the next record on every
+    collection, starting over at the end. The poller records the values as
+    served by the agent, so each metric is divided by its scale in scales.
+    """
+
+    name = "replay"
+
+    def __init__(self, path, interval=5, scales=None, loop=True):
+        super().__init__(interval)
+        self.records = self._load(path, scales or {})
+        self.loop = loop
+        self._position = 0
+
+    @staticmethod
+    def _load(path, scales):
+        with open(path, newline='') as f:
+            if path.endswith('.csv'):
+                rows = list(csv.DictReader(f))
+            else:
+                rows = json.load(f)
+                rows = rows if isinstance(rows, list) else [rows]
+        records = []
+        for row in rows:
+            record = {}
+            for name, value in row.items():
+                if name == 'timestamp':
+                    continue
+                try:
+                    record[name] = float(value) / scales.get(name, 1)
+                except (TypeError, ValueError):
+                    # Metrics the poller could not read ("N/A")
+                    continue
+            records.append(record)
+        return records
+
+    def collect(self):
+        if self._position >= len(self.records):
+            if not self.loop or not self.records:
+                return {}
+            self._position = 0
+        record = self.records[self._position]
+        self._position += 1
+        return record
+
+
+class CollectorScheduler:
+    """Runs collectors on their intervals and publishes their values into a snapshot
+
+    One thread keeps the collectors in a heap ordered by their next
+    deadline. Deadlines advance by whole intervals from the start, so slow
+    collections do not make a collector drift; a collector that overran
+    whole intervals skips them instead of running back to back.
+    """
+
+    def __init__(self, snapshot, collectors):
+        self.snapshot = snapshot
+        self.collectors = list(collectors)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run_once(self, collector):
+        """Collect from one collector and publish its values"""
+        try:
+            self.snapshot.publish(collector.collect())
+        except Exception as e:
+            print(f"Error collecting {collector.name} metrics: {e}")
+
+    def run(self):
+        """Run the collectors until stop() is called"""
+        now = time.monotonic()
+        deadlines = [(now, position, collector) for position, collector in enumerate(self.collectors)]
+        heapq.heapify(deadlines)
+        while deadlines and not self._stop.is_set():
+            deadline, position, collector = deadlines[0]
+            if self._stop.wait(max(deadline - time.monotonic(), 0)):
+                break
+            self.run_once(collector)
+            now = time.monotonic()
+            deadline += collector.interval
+            if deadline <= now:
+                deadline += (now - deadline) // collector.interval * collector.interval + collector.interval
+            heapq.heapreplace(deadlines, (deadline, position, collector))
+
+    def start(self):
+        """Run the collectors on a daemon thread"""
+        self._thread = threading.Thread(target=self.run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+"""
+Prometheus exposition of polled 5G Core metrics
+Serves the latest poll of every target over HTTP in the Prometheus text
+format, labelled with the target. The exposition is rendered (and gzipped)
+once per poll cycle, when the poller publishes it, and scrapes are answered
+from that buffer, so any number of concurrent scrapes cost a socket write.
+
+    exporter = MetricsExporter()
+    serve_metrics(exporter)
+    continuous_polling(interval=10, exporter=exporter)
+"""
+
+import gzip
+import re
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from snmp_store import POLL_FIELDS
+
+DEFAULT_PORT = 9161
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Prefix of metrics whose poller name is not a valid Prometheus name (objects found by a walk)
+OID_PREFIX = 'snmp_oid_'
+
+METRIC_NAME = re.compile(r'[a-zA-Z_:][a-zA-Z0-9_:]*$')
+# Table cells are named <column>[<index>] by the walk poller
+TABLE_CELL = re.compile(r'(.+)\[(.*)\]$')
+
+
+def metric_name(name):
+    """Return the Prometheus metric name and extra labels of a poller metric name"""
+    labels = {}
+    cell = TABLE_CELL.match(name)
+    if cell:
+        name, labels['index'] = cell.groups()
+    if not METRIC_NAME.match(name):
+        name = OID_PREFIX + re.sub(r'[^a-zA-Z0-9_]', '_', name)
+    return name, labels
+
+
+def escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    return '{' + ','.join(f'{name}="{escape(str(value))}"' for name, value in labels.items()) + '}'
+
+
+class MetricsExporter:
+    """The latest poll of every target, rendered in the Prometheus text format
+
+    Poll results are appended during a cycle and become visible when the
+    cycle is published: targets not polled in the cycle are dropped, so a
+    target removed from the inventory disappears from the next scrape.
+    """
+
+    def __init__(self):
+        self._polls = {}
+        self._lock = threading.Lock()
+        # (plain, gzipped) exposition, replaced as a whole on publish
+        self.body = (b'', gzip.compress(b''))
+        self.stats = {'publishes': 0, 'scrapes': 0}
+
+    def append(self, target, metrics):
+        """Record one poll of a target: the poller's {name: value} dict"""
+        with self._lock:
+            self._polls[target] = metrics
+
+    def render(self, polls, extra=()):
+        """Return the exposition text of {target: metrics}
+
+        extra holds further families as (name, help, type, [(labels, value)]),
+        such as the poller's own statistics.
+        """
+        families = {}
+        up = []
+        latency = []
+        for target, metrics in polls.items():
+            samples = 0
+            for name, value in metrics.items():
+                if name in POLL_FIELDS:
+                    continue
+                try:
+                    float(value)
+                except (TypeError, ValueError):
+                    # N/A and string values (NF ids, addresses) are not samples
+                    continue
+                name, labels = metric_name(name)
+                families.setdefault(name, []).append((dict(target=target, **labels), str(value).strip()))
+                samples += 1
+            if metrics.get('latency_ms') is not None:
+                # How long the poll took, not a metric of the target
+                latency.append(({'target': target}, repr(float(metrics['latency_ms']) / 1000)))
+            # A target that timed out, or answered no object, is down
+            up.append(({'target': target}, '1' if samples and 'error' not in metrics else '0'))
+        lines = ['# HELP snmp_up Whether the target answered its last poll', '# TYPE snmp_up gauge']
+        lines += [f'snmp_up{format_labels(labels)} {value}' for labels, value in up]
+        for name, samples in families.items():
+            lines.append(f'# TYPE {name} gauge')
+            lines += [f'{name}{format_labels(labels)} {value}' for labels, value in samples]
+        if latency:
+            lines += ['# HELP snmp_poll_latency_seconds Time the last poll of the target took',
+                      '# TYPE snmp_poll_latency_seconds gauge']
+            lines += [f'snmp_poll_latency_seconds{format_labels(labels)} {value}' for labels, value in latency]
+        for name, description, kind, samples in extra:
+            lines += [f'# HELP {name} {description}', f'# TYPE {name} {kind}']
+            lines += [f'{name}{format_labels(labels) if labels else ""} {value}' for labels, value in samples]
+        return '\n'.join(lines) + '\n'
+
+    def publish(self, extra=()):
+        """Render the polls appended since the last publish and serve them from now on"""
+        with self._lock:
+            polls, self._polls = self._polls, {}
+        text = self.render(polls, extra).encode()
+        self.body = (text, gzip.compress(text, compresslevel=6))
+        self.stats['publishes'] += 1
+
+
+def serve_metrics(exporter, host='0.0.0.0', port=DEFAULT_PORT):
+    """Serve exporter's exposition at /metrics from a background thread, returning the server"""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body are separate writes: keep-alive scrapes would wait on delayed ACKs
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404)
+                return
+            plain, compressed = exporter.body
+            exporter.stats['scrapes'] += 1
+            use_gzip = 'gzip' in self.headers.get('Accept-Encoding', '')
+            body = compressed if use_gzip else plain
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            if use_gzip:
+                self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"Serving Prometheus metrics on http://{host}:{server.server_address[1]}/metrics", file=sys.stderr)
+    return server
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+
+"""
+Fleet poller for 5G Core SNMP agents
+Polls the metrics of every SNMP agent in an inventory concurrently from one
+asyncio loop: requests go out from a single UDP socket, are encoded with the
+agent's BER codec and are matched to their responses by request-id, so one
+core keeps up with a thousand agents per polling interval. A semaphore bounds
+the requests in flight, each target gets a timeout and retries, and results
+are emitted as they arrive, in the poller's export format.
+
+The inventory is a file (JSON list of {"name", "host", "port", "community"}
+or lines of "name host[:port] [community]") or a RESTCONF network-functions
+URL, in which case every instance with an "snmp-address" is polled (the
+others at --host, when given).
+
+    python snmp_fleet.py --inventory targets.txt --interval 30
+"""
+
+import argparse
+import asyncio
+import collections
+import itertools
+import json
+import os
+import socket
+import sys
+import time
+from datetime import datetime
+
+from snmp_anomaly import METHODS, AnomalyDetector, AnomalyTraps, print_event
+from snmp_exporter import MetricsExporter, serve_metrics
+from snmp_poller import OID_LIST
+from snmp_scheduler import Scheduler, phase
+from snmp_tables import fetch_network_functions
+from snmp_traps import NotificationSender, parse_receivers
+from snmp_transport import (DecodeError, GET, RESPONSE, SNMP_V2C, NULL, decode_oid, encode_integer, encode_oid,
+                            read_integer, read_tlv, tlv)
+
+# Default inventory, the RESTCONF resource the agent's NF tables are fed from
+NETWORK_FUNCTIONS_URL = os.environ.get('SNMP_NF_URL', 'http://localhost:8081/restconf/data/network-functions')
+
+Target = collections.namedtuple('Target', 'name host port community', defaults=(161, 'public'))
+
+# Value tags returned as integers; noSuchObject, noSuchInstance and endOfMibView have no value
+UNSIGNED_TAGS = (0x41, 0x42, 0x43, 0x46, 0x47)
+NO_VALUE_TAGS = (0x05, 0x80, 0x81, 0x82)
+
+# Socket receive buffer reserved per request in flight (capped by net.core.rmem_max)
+RECEIVE_BUFFER_PER_REQUEST = 8192
+
+
+def parse_inventory(text, port=161, community='public'):
+    """Return the targets of an inventory file's contents"""
+    if text.lstrip().startswith('['):
+        return [Target(entry['name'], entry['host'], int(entry.get('port', port)),
+                       entry.get('community', community)) for entry in json.loads(text)]
+    targets = []
+    for line in text.splitlines():
+        fields = line.split('#', 1)[0].split()
+        if not fields:
+            continue
+        if len(fields) < 2:
+            raise ValueError(f"Inventory line needs a name and a host: {line}")
+        host, _, target_port = fields[1].partition(':')
+        targets.append(Target(fields[0], host, int(target_port or port),
+                              fields[2] if len(fields) > 2 else community))
+    return targets
+
+
+def network_function_targets(network_functions, port=161, community='public', host=None, log=None):
+    """Return a target for every network function instance with an SNMP address
+
+    The service "address" of an instance (such as a UPF's N3 address) is not
+    where its agent listens, so instances without an "snmp-address" are polled
+    at host when one is given, and otherwise skipped with a line on log
+    (stderr by default).
+    """
+    log = log or sys.stderr
+    targets = []
+    for nf_type, instances in network_functions.items():
+        for entry in instances:
+            if not isinstance(entry, dict) or 'id' not in entry:
+                print(f"Skipping {nf_type} instance without an id: {entry!r}", file=log)
+                continue
+            address = entry.get('snmp-address') or host
+            if not address:
+                print(f"Skipping {nf_type} {entry['id']}: no snmp-address", file=log)
+                continue
+            targets.append(Target(entry['id'], address, int(entry.get('snmp-port', port)), community))
+    return targets
+
+
+def load_inventory(source, port=161, community='public', host=None):
+    """Return the targets of an inventory file or RESTCONF network-functions URL"""
+    if source.startswith(('http://', 'https://')):
+        return network_function_targets(fetch_network_functions(source), port, community, host)
+    with open(source) as f:
+        return parse_inventory(f.read(), port, community)
+
+
+def decode_value(tag, content):
+    """Return a BER encoded SNMP value as an int, str or None"""
+    if tag == 0x02 or tag in UNSIGNED_TAGS:
+        return int.from_bytes(content, 'big', signed=tag == 0x02)
+    if tag == 0x04:
+        return content.decode('utf-8', 'replace')
+    if tag == 0x40:
+        return '.'.join(map(str, content))
+    if tag == 0x06:
+        return '.'.join(map(str, decode_oid(content)))
+    if tag in NO_VALUE_TAGS:
+        return None
+    return content.hex()
+
+
+def decode_response(data):
+    """Return (request_id, error_status, error_index, [(oid, value)]) of a response message"""
+    _, position, end = read_tlv(data, 0, 0x30)
+    _, position = read_integer(data, position)
+    _, _, position = read_tlv(data, position, 0x04)
+    _, position, end = read_tlv(data, position, RESPONSE)
+    request_id, position = read_integer(data, position)
+    error_status, position = read_integer(data, position)
+    error_index, position = read_integer(data, position)
+    _, position, end = read_tlv(data, position, 0x30)
+    varbinds = []
+    while position < end:
+        _, start, position = read_tlv(data, position, 0x30)
+        _, start, oid_end = read_tlv(data, start, 0x06)
+        tag, value_start, value_end = read_tlv(data, oid_end)
+        varbinds.append((decode_oid(bytes(data[start:oid_end])),
+                         decode_value(tag, bytes(data[value_start:value_end]))))
+    return request_id, error_status, error_index, varbinds
+
+
+class FleetPoller:
+    """Polls the metrics of many SNMP agents concurrently
+
+    At most concurrency targets are awaited at a time. A target that does
+    not answer within timeout seconds is asked again, up to retries times,
+    before it is reported as unreachable. With spread, each target is polled
+    at a stable offset of up to spread seconds into the cycle instead of all
+    at once, so the agents (and shared links) do not see synchronized bursts.
+    """
+
+    def __init__(self, targets, oids=OID_LIST, concurrency=256, timeout=1.0, retries=2, spread=0.0):
+        self.targets = list(targets)
+        self.names = [name for name, _ in oids]
+        self.oids = [tuple(int(arc) for arc in oid.split('.')) for _, oid in oids]
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.spread = spread
+        self.stats = {'polls': 0, 'responses': 0, 'timeouts': 0, 'retries': 0, 'errors': 0}
+        # The variable bindings are the same in every request
+        self._varbinds = tlv(0x30, b''.join(tlv(0x30, encode_oid(oid) + NULL) for oid in self.oids))
+        self._request_ids = itertools.count(1)
+        self._pending = {}
+        self._addresses = {}
+        self._transport = None
+
+    def _request(self, community, request_id):
+        pdu = encode_integer(0x02, request_id) + b'\x02\x01\x00\x02\x01\x00' + self._varbinds
+        return tlv(0x30, encode_integer(0x02, SNMP_V2C) + tlv(0x04, community.encode()) + tlv(GET, pdu))
+
+    def _received(self, data):
+        try:
+            response = decode_response(data)
+        except DecodeError:
+            self.stats['errors'] += 1
+            return
+        waiter = self._pending.pop(response[0], None)
+        if waiter is not None and not waiter.done():
+            waiter.set_result(response)
+
+    async def _address(self, target):
+        """Return the resolved address of a target, resolving each host once"""
+        key = (target.host, target.port)
+        address = self._addresses.get(key)
+        if address is None:
+            loop = asyncio.get_running_loop()
+            infos = await loop.getaddrinfo(target.host, target.port, family=socket.AF_INET, type=socket.SOCK_DGRAM)
+            address = self._addresses[key] = infos[0][4]
+        return address
+
+    async def _poll_target(self, target, limit):
+        if self.spread:
+            await asyncio.sleep(phase(target.name, self.spread, 1.0))
+        async with limit:
+            started = time.monotonic()
+            try:
+                address = await self._address(target)
+            except OSError as e:
+                return self._result(target, None, f"cannot resolve {target.host}: {e}", started)
+            loop = asyncio.get_running_loop()
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    self.stats['retries'] += 1
+                request_id = next(self._request_ids) & 0x7fffffff
+                waiter = self._pending[request_id] = loop.create_future()
+                self._transport.sendto(self._request(target.community, request_id), address)
+                try:
+                    response = await asyncio.wait_for(waiter, self.timeout)
+                except asyncio.TimeoutError:
+                    continue
+                finally:
+                    self._pending.pop(request_id, None)
+                _, error_status, error_index, varbinds = response
+                if error_status:
+                    return self._result(target, None, f"error status {error_status} at {error_index}", started)
+                return self._result(target, varbinds, None, started)
+            self.stats['timeouts'] += 1
+            return self._result(target, None, "timeout", started)
+
+    def _result(self, target, varbinds, error, started):
+        metrics = {'target': target.name}
+        values = dict(varbinds or ())
+        for name, oid in zip(self.names, self.oids):
+            value = values.get(oid)
+            metrics[name] = "N/A" if value is None else str(value)
+        metrics['timestamp'] = datetime.now().isoformat()
+        metrics['latency_ms'] = round((time.monotonic() - started) * 1000, 1)
+        if error:
+            metrics['error'] = error
+            self.stats['errors'] += error != "timeout"
+        else:
+            self.stats['responses'] += 1
+        return metrics
+
+    async def poll(self):
+        """Poll every target once, yielding each target's metrics as they arrive"""
+        loop = asyncio.get_running_loop()
+        poller = self
+
+        class Protocol(asyncio.DatagramProtocol):
+            def datagram_received(self, data, address):
+                poller._received(data)
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        # Room for every response in flight: the kernel charges each queued datagram a few KB
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.concurrency * RECEIVE_BUFFER_PER_REQUEST)
+        sock.bind(('0.0.0.0', 0))
+        self._transport, _ = await loop.create_datagram_endpoint(Protocol, sock=sock)
+        limit = asyncio.Semaphore(self.concurrency)
+        tasks = [asyncio.ensure_future(self._poll_target(target, limit)) for target in self.targets]
+        try:
+            for done in asyncio.as_completed(tasks):
+                self.stats['polls'] += 1
+                yield await done
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._transport.close()
+
+
+async def poll_fleet(poller, output, interval=None, store=None, rollups=None, exporter=None, detector=None):
+    """Poll the fleet every interval seconds (once without one), writing each result as a JSON line
+
+    Results are also appended to store (a snmp_store.MetricStore) and rollups
+    (a snmp_rollups.RollupEngine) if given, each cycle is scored in one pass
+    by detector (a snmp_anomaly.AnomalyDetector) and published to exporter
+    (a snmp_exporter.MetricsExporter) for Prometheus. Cycles start
+    on absolute deadlines, so they do not drift by the time a cycle takes.
+    """
+    scheduler = Scheduler()
+    job = scheduler.add('fleet', interval) if interval is not None else None
+    while True:
+        if job is not None:
+            _, delay = scheduler.next()
+            await asyncio.sleep(max(0, delay))
+            scheduler.started(job)
+        started = time.monotonic()
+        results = []
+        async for metrics in poller.poll():
+            if store is not None:
+                store.append(metrics['target'], metrics)
+            if rollups is not None:
+                rollups.append(metrics['target'], metrics)
+            if exporter is not None:
+                exporter.append(metrics['target'], metrics)
+            if detector is not None:
+                results.append((metrics['target'], metrics))
+            output.write(json.dumps(metrics) + '\n')
+            output.flush()
+        elapsed = time.monotonic() - started
+        families = fleet_families(poller, elapsed) + scheduler.families()
+        if detector is not None:
+            detector.append_many(results)
+            families += detector.families()
+        if exporter is not None:
+            exporter.publish(families)
+        print(f"Polled {len(poller.targets)} targets in {elapsed:.2f} s "
+              f"({poller.stats['timeouts']} timeouts, {poller.stats['errors']} errors)", file=sys.stderr)
+        if job is None:
+            return
+        scheduler.finished(job)
+
+
+def fleet_families(poller, elapsed):
+    """Return the fleet poller's statistics as extra Prometheus families"""
+    return [('snmp_fleet_cycle_seconds', 'Duration of the last polling cycle', 'gauge', [(None, repr(elapsed))]),
+            ('snmp_fleet_timeouts_total', 'Targets that did not answer any retry', 'counter',
+             [(None, poller.stats['timeouts'])]),
+            ('snmp_fleet_retries_total', 'Requests sent again after a timeout', 'counter',
+             [(None, poller.stats['retries'])])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent SNMP poller for a fleet of 5G core agents")
+    parser.add_argument("--inventory", default=NETWORK_FUNCTIONS_URL,
+                        help="inventory file or RESTCONF network-functions URL")
+    parser.add_argument("--port", type=int, default=161, help="SNMP port of targets that do not give one")
+    parser.add_argument("--community", default="public")
+    parser.add_argument("--host", help="SNMP host of network functions without an snmp-address (default: skip them)")
+    parser.add_argument("--concurrency", type=int, default=256, help="targets awaited at a time")
+    parser.add_argument("--timeout", type=float, default=1.0, help="seconds before a request is retried")
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--interval", type=float, help="poll every interval seconds instead of once")
+    parser.add_argument("--spread", type=float, default=0.0,
+                        help="spread the targets' polls over this many seconds of each cycle")
+    parser.add_argument("--output", help="JSON lines file to append results to (default: stdout)")
+    parser.add_argument("--metrics-port", type=int, help="serve the latest results to Prometheus on this port")
+    parser.add_argument("--detect", choices=METHODS, help="report anomalous metrics found by this method")
+    parser.add_argument("--notify", help="send anomaly notifications to trap:host:port or inform:host:port receivers")
+    args = parser.parse_args()
+
+    targets = load_inventory(args.inventory, args.port, args.community, args.host)
+    poller = FleetPoller(targets, concurrency=args.concurrency, timeout=args.timeout, retries=args.retries,
+                         spread=args.spread)
+    exporter = None
+    if args.metrics_port is not None:
+        exporter = MetricsExporter()
+        serve_metrics(exporter, port=args.metrics_port)
+    detector = sender = None
+    if args.detect:
+        detector = AnomalyDetector(args.detect)
+        detector.add_listener(lambda event: print_event(event, sys.stderr))
+        if args.notify:
+            sender = NotificationSender(parse_receivers(args.notify))
+            sender.start()
+            detector.add_listener(AnomalyTraps(sender))
+    output = open(args.output, 'a') if args.output else sys.stdout
+    try:
+        asyncio.run(poll_fleet(poller, output, args.interval, exporter=exporter, detector=detector))
+    except KeyboardInterrupt:
+        print("\nStopping fleet polling...", file=sys.stderr)
+    finally:
+        if args.output:
+            output.close()
+        if sender is not None:
+            sender.stop()
+
+
+if __name__ == "__main__":
+    main()
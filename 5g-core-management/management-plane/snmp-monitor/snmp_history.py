@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+
+"""
+Metric history for the 5G Core SNMP agent
+Records every metrics snapshot the collectors publish as a numbered sample
+in fixed-size ring buffers, one array per metric, and serves the samples
+still held as an SNMP table indexed by sample sequence number. A poller
+that missed samples GETBULKs every column from the last sequence it has
+and receives all the newer rows, oldest first.
+
+Table layout under BASE_OID + (5,):
+    historyTable (5.1)  historyEntry (5.1.1)
+        column 1: sequence number, column 2: sample time (Unix seconds),
+        columns 3...: one per metric, in the order of the metric objects
+    historyLatestSequence (5.2.0), historySize (5.3.0)
+"""
+
+import threading
+import time
+from array import array
+
+from pysnmp.proto.api import v2c
+
+from snmp_mib import gauge
+
+BASE_OID = (1, 3, 6, 1, 4, 1, 55555)
+HISTORY_OID = BASE_OID + (5,)
+HISTORY_ENTRY_OID = HISTORY_OID + (1, 1)
+HISTORY_LATEST_OID = HISTORY_OID + (2,)
+HISTORY_SIZE_OID = HISTORY_OID + (3,)
+
+UNSIGNED32_MAX = 4294967295
+
+
+class MetricHistory:
+    """The last size samples of a set of metrics in preallocated arrays
+
+    objects maps metric names to (OID, scale) like the agent's metric
+    objects; a metric missing from a sample is recorded as 0.
+    """
+
+    def __init__(self, tree, objects, size=360, clock=time.time):
+        self.tree = tree
+        self.objects = objects
+        self.names = list(objects)
+        self.size = size
+        self.clock = clock
+        self.latest = 0
+        # Sequence number held by each slot, 0 while the slot is being written
+        self._sequences = array('L', bytes(array('L').itemsize * size))
+        self._times = array('d', bytes(8 * size))
+        self._values = {name: array('d', bytes(8 * size)) for name in self.names}
+        self._lock = threading.Lock()
+        self._columns = [(1, self._sequence), (2, self._time)] + [
+            (column, self._metric(name)) for column, name in enumerate(self.names, 3)]
+        tree.register(HISTORY_LATEST_OID, (0,), lambda: v2c.Unsigned32(self.latest))
+        tree.register(HISTORY_SIZE_OID, (0,), lambda: v2c.Unsigned32(self.size))
+
+    def attach(self, snapshot):
+        snapshot.add_listener(self.record)
+
+    def record(self, values, generation=None):
+        """Store a sample of values as the next sequence number, evicting the oldest sample
+
+        The new row and the evicted one are one MIB update, a few in-place insertions and deletions.
+        """
+        with self._lock:
+            sequence = self.latest % UNSIGNED32_MAX + 1
+            slot = sequence % self.size
+            evicted = self._sequences[slot]
+            # Readers check the slot's sequence after reading, so a half-written sample is never served
+            self._sequences[slot] = 0
+            self._times[slot] = self.clock()
+            for name in self.names:
+                self._values[name][slot] = float(values.get(name, 0))
+            self._sequences[slot] = sequence
+            self.latest = sequence
+            self.tree.update(
+                added=[(HISTORY_ENTRY_OID + (column,), (sequence,), lambda read=read, sequence=sequence:
+                        read(sequence)) for column, read in self._columns],
+                removed=[(HISTORY_ENTRY_OID + (column,), (evicted,)) for column, _ in self._columns] if evicted else ())
+        return sequence
+
+    def _read(self, buffer, sequence):
+        slot = sequence % self.size
+        value = buffer[slot]
+        if self._sequences[slot] != sequence:
+            raise KeyError(sequence)
+        return value
+
+    def _sequence(self, sequence):
+        return v2c.Unsigned32(self._read(self._sequences, sequence))
+
+    def _time(self, sequence):
+        return v2c.Unsigned32(int(self._read(self._times, sequence)))
+
+    def _metric(self, name):
+        buffer = self._values[name]
+        scale = self.objects[name][1]
+        return lambda sequence: gauge(self._read(buffer, sequence), scale)
+
+    def samples(self, since=0):
+        """Return [(sequence, time, {metric: value})] of the held samples newer than since"""
+        samples = []
+        first = max(since + 1, self.latest - self.size + 1, 1)
+        for sequence in range(first, self.latest + 1):
+            try:
+                sample = {name: self._read(self._values[name], sequence) for name in self.names}
+                samples.append((sequence, self._read(self._times, sequence), sample))
+            except KeyError:
+                continue
+        return samples
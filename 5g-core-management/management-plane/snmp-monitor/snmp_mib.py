@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+
+"""
+MIB instrumentation for the 5G Core SNMP agent
+Keeps the agent's managed object instances in an OID-sorted index so GET is
+a dictionary lookup and GETNEXT/GETBULK a binary search, and plugs the index
+into pysnmp as the MIB instrumentation of the default SNMP context.
+
+Each instance is served by a getter that reads the live value when it is
+requested, so values never have to be copied into the MIB. The responder
+reads the sorted OID index without taking a lock: small changes are binary
+search insertions and deletions, each atomic, and large ones build a new
+index that replaces the old.
+"""
+
+import bisect
+import contextlib
+import functools
+import threading
+
+from pyasn1.error import PyAsn1Error
+from pysnmp.proto.api import v2c
+from pysnmp.smi import error, instrum
+
+GAUGE32_MAX = 4294967295
+
+# Updates changing more than this fraction of the instances rebuild the index in one merge
+REBUILD_FRACTION = 1 / 8
+
+
+def gauge(value, scale=1):
+    """Return a Gauge32 for a numeric value multiplied by scale, clamped to the Gauge32 range"""
+    return _gauge(min(max(int(round(float(value) * scale)), 0), GAUGE32_MAX))
+
+
+@functools.lru_cache(maxsize=4096)
+def _gauge(value):
+    # pyasn1 values are immutable, so one object per value is shared instead of built on every read
+    return v2c.Gauge32(value)
+
+
+class MibTree:
+    """OID-sorted index of object instances and the getters serving them
+
+    Instances that come and go are inserted and deleted in place with a
+    binary search, so an update costs O(log n) comparisons and a memory move
+    per changed instance rather than a rebuild of the whole index; only an
+    update changing a large part of the index merges a new one. GETNEXT is a
+    binary search, skipped when it starts from the instance the previous
+    GETNEXT returned, as every step of a walk or GETBULK does.
+    """
+
+    def __init__(self):
+        self._oids = []
+        # (oid, position) of the last instance next() returned; checked before use, as the index may have changed
+        self._last = (None, 0)
+        self._getters = {}
+        self._objects = {}
+        self._lock = threading.Lock()
+        # Bumped whenever instances or the data behind them change
+        self.version = 0
+
+    def __len__(self):
+        return len(self._oids)
+
+    def register(self, object_oid, index, getter):
+        """Serve the instance object_oid + index with getter(), which returns an SNMP value"""
+        self.update(added=[(object_oid, index, getter)])
+
+    def unregister(self, object_oid, index):
+        """Stop serving an instance"""
+        self.update(removed=[(object_oid, index)])
+
+    def invalidate(self):
+        """Record that values served by existing getters have changed"""
+        self.version += 1
+
+    def update(self, added=(), removed=()):
+        """Add (object_oid, index, getter) and remove (object_oid, index) instances in one step"""
+        with self._lock:
+            gone = set()
+            for object_oid, index in removed:
+                object_oid = tuple(object_oid)
+                oid = object_oid + tuple(index)
+                if self._getters.pop(oid, None) is None:
+                    continue
+                gone.add(oid)
+                if self._objects[object_oid] == 1:
+                    del self._objects[object_oid]
+                else:
+                    self._objects[object_oid] -= 1
+            new = []
+            for object_oid, index, getter in added:
+                object_oid = tuple(object_oid)
+                oid = object_oid + tuple(index)
+                if oid not in self._getters:
+                    new.append(oid)
+                    self._objects[object_oid] = self._objects.get(object_oid, 0) + 1
+                self._getters[oid] = getter
+            if not gone and not new:
+                if added:
+                    # Getters replaced
+                    self.version += 1
+                return
+            oids = self._oids
+            if len(gone) + len(new) > len(oids) * REBUILD_FRACTION:
+                if gone:
+                    oids = [oid for oid in oids if oid not in gone]
+                # Two sorted runs: the sort merges them in linear time
+                new.sort()
+                oids = oids + new
+                oids.sort()
+                self._oids = oids
+            else:
+                for oid in gone:
+                    del oids[bisect.bisect_left(oids, oid)]
+                for oid in new:
+                    bisect.insort(oids, oid)
+            # After the index changed, so readers never cache the old one under the new version
+            self.version += 1
+
+    def is_object(self, oid):
+        """Return True if oid or one of its prefixes is a registered object"""
+        return any(oid[:length] in self._objects for length in range(len(oid), 0, -1))
+
+    def get(self, oid):
+        """Return the value of an instance, or None if it is not served"""
+        getter = self._getters.get(oid)
+        if getter is None:
+            return None
+        try:
+            return getter()
+        except (KeyError, IndexError, ValueError, TypeError, PyAsn1Error):
+            # Instance removed meanwhile, or a value that does not fit its type
+            return None
+
+    def next(self, oid):
+        """Return (oid, value) of the first served instance after oid, or None at the end of the MIB"""
+        oids = self._oids
+        last, position = self._last
+        if last != oid or position >= len(oids) or oids[position] != oid:
+            # The last instance at or before oid
+            position = bisect.bisect_right(oids, oid) - 1
+        while True:
+            position += 1
+            try:
+                found = oids[position]
+            except IndexError:
+                # End of the MIB, or instances removed meanwhile
+                return None
+            value = self.get(found)
+            if value is not None:
+                self._last = (found, position)
+                return found, value
+
+
+class MibInstrumController(instrum.AbstractMibInstrumController):
+    """pysnmp MIB instrumentation answering from a MibTree
+
+    Access is checked per variable binding with the responder's access
+    control function when one is given. With a metrics snapshot, the values
+    of one request are all read from the same generation of the snapshot.
+    """
+
+    def __init__(self, tree, snapshot=None):
+        self.tree = tree
+        self.snapshot = snapshot
+
+    def _pinned(self):
+        return self.snapshot.pinned() if self.snapshot is not None else contextlib.nullcontext()
+
+    def readVars(self, varBinds, acInfo=(None, None)):
+        with self._pinned():
+            return self._readVars(varBinds, acInfo)
+
+    def readNextVars(self, varBinds, acInfo=(None, None)):
+        with self._pinned():
+            return self._readNextVars(varBinds, acInfo)
+
+    def _readVars(self, varBinds, acInfo):
+        acFun, acCtx = acInfo
+        result = []
+        for idx, (name, _) in enumerate(varBinds):
+            oid = tuple(name)
+            value = self.tree.get(oid)
+            if value is not None and acFun is not None and acFun(name, value, idx, 'read', acCtx):
+                value = None
+            if value is None:
+                value = v2c.NoSuchInstance() if self.tree.is_object(oid) else v2c.NoSuchObject()
+            result.append((name, value))
+        return result
+
+    def _readNextVars(self, varBinds, acInfo):
+        acFun, acCtx = acInfo
+        result = []
+        for idx, (name, _) in enumerate(varBinds):
+            oid = tuple(name)
+            while True:
+                found = self.tree.next(oid)
+                if found is None:
+                    result.append((name, v2c.EndOfMibView()))
+                    break
+                oid, value = found
+                if acFun is None or not acFun(v2c.ObjectIdentifier(oid), value, idx, 'read', acCtx):
+                    result.append((v2c.ObjectIdentifier(oid), value))
+                    break
+        return result
+
+    def writeVars(self, varBinds, acInfo=(None, None)):
+        # All metrics are read-only
+        raise error.NotWritableError(name=varBinds[0][0], idx=0)
@@ -6,18 +6,37 @@ This script polls metrics from the 5G core network functions via SNMP
 and exports them to various formats.
 """
 
-from pysnmp.hlapi import getCmd, SnmpEngine, CommunityData, UdpTransportTarget, ContextData, ObjectType, ObjectIdentity  # type: ignore
+from pysnmp.hlapi import getCmd, bulkCmd, SnmpEngine, CommunityData, UdpTransportTarget, ContextData, ObjectType, ObjectIdentity  # type: ignore
+from pysnmp.proto.api import v2c
 
 import json
 import csv
-import time
 from datetime import datetime
 
+from snmp_scheduler import Scheduler
+
 # SNMP target configuration
 SNMP_TARGET = 'localhost'
 SNMP_PORT = 161
 SNMP_COMMUNITY = 'public'
 
+# GET requests are packed so their responses fit one unfragmented UDP datagram
+MAX_MESSAGE_SIZE = 1472
+# Allowance for the message and PDU headers, and per variable binding for its value and headers
+MESSAGE_OVERHEAD = 64
+VARBIND_OVERHEAD = 24
+
+# Segment export: directory, and seconds buffered polls may wait before they are written
+SEGMENTS_DIRECTORY = 'metrics_segments'
+SEGMENTS_FLUSH_AFTER = 300
+
+# Example metric groups for continuous_polling(groups=...): {group: (interval, metric names)}
+METRIC_GROUPS = {
+    'upf': (10, ['upf_active_users', 'upf_throughput', 'upf_packet_loss']),
+    'control-plane': (60, ['amf_active_sessions', 'amf_cpu_utilization', 'amf_memory_utilization',
+                           'smf_active_pdu_sessions', 'smf_cpu_utilization', 'smf_memory_utilization']),
+}
+
 # Base OID for our 5G core metrics
 BASE_OID = '1.3.6.1.4.1.55555'
 
@@ -36,52 +55,131 @@ UPF_ACTIVE_USERS_OID = f'{BASE_OID}.1.3.1'
 UPF_THROUGHPUT_OID = f'{BASE_OID}.1.3.2'
 UPF_PACKET_LOSS_OID = f'{BASE_OID}.1.3.3'
 
-# List of OIDs to poll
+# List of OIDs to poll (scalar instances, OID.0)
 OID_LIST = [
-    ('amf_active_sessions', AMF_ACTIVE_SESSIONS_OID),
-    ('amf_cpu_utilization', AMF_CPU_UTILIZATION_OID),
-    ('amf_memory_utilization', AMF_MEMORY_UTILIZATION_OID),
-    ('smf_active_pdu_sessions', SMF_ACTIVE_PDU_SESSIONS_OID),
-    ('smf_cpu_utilization', SMF_CPU_UTILIZATION_OID),
-    ('smf_memory_utilization', SMF_MEMORY_UTILIZATION_OID),
-    ('upf_active_users', UPF_ACTIVE_USERS_OID),
-    ('upf_throughput', UPF_THROUGHPUT_OID),
-    ('upf_packet_loss', UPF_PACKET_LOSS_OID)
+    ('amf_active_sessions', f'{AMF_ACTIVE_SESSIONS_OID}.0'),
+    ('amf_cpu_utilization', f'{AMF_CPU_UTILIZATION_OID}.0'),
+    ('amf_memory_utilization', f'{AMF_MEMORY_UTILIZATION_OID}.0'),
+    ('smf_active_pdu_sessions', f'{SMF_ACTIVE_PDU_SESSIONS_OID}.0'),
+    ('smf_cpu_utilization', f'{SMF_CPU_UTILIZATION_OID}.0'),
+    ('smf_memory_utilization', f'{SMF_MEMORY_UTILIZATION_OID}.0'),
+    ('upf_active_users', f'{UPF_ACTIVE_USERS_OID}.0'),
+    ('upf_throughput', f'{UPF_THROUGHPUT_OID}.0'),
+    ('upf_packet_loss', f'{UPF_PACKET_LOSS_OID}.0')
 ]
 
+# Metric names of the scalar instances, by OID
+METRIC_NAMES = {tuple(int(arc) for arc in oid.split('.')): name for name, oid in OID_LIST}
+
+# Agent statistics (requests and response cache)
+AGENT_STATS_OID = f'{BASE_OID}.3'
+
+# Agent metric history table, indexed by sample sequence number
+HISTORY_OID = f'{BASE_OID}.5'
+HISTORY_ENTRY_OID = f'{HISTORY_OID}.1.1'
+HISTORY_COLUMNS = ['sequence', 'time'] + [name for name, _ in OID_LIST]
+
+# GETBULK repetitions per request when walking the BASE_OID subtree
+MAX_REPETITIONS = 50
+# Subtrees the walk skips: the agent's statistics, and the history table poll_history reads incrementally
+WALK_EXCLUDE = [AGENT_STATS_OID, HISTORY_OID]
+# Polls served from a discovered layout before the subtree is walked again
+REDISCOVER_EVERY = 10
+
+# Instances at BASE_OID + (group, table, 1, column) and below are table cells
+# indexed by the remaining arcs; other instances are scalars (object.0)
+BASE_ARCS = tuple(int(arc) for arc in BASE_OID.split('.'))
+COLUMN_DEPTH = len(BASE_ARCS) + 4
+
+# Values returned in place of a missing instance
+NO_VALUE = (v2c.NoSuchObject.tagSet, v2c.NoSuchInstance.tagSet, v2c.EndOfMibView.tagSet)
+
+# Engine, credentials and transport reused by every request to the same agent
+_session = None
+
+def get_session():
+    """Return the long-lived (engine, community, transport, context) for the configured agent"""
+    global _session
+    target = (SNMP_TARGET, SNMP_PORT, SNMP_COMMUNITY)
+    if _session is None or _session[0] != target:
+        _session = (target, (SnmpEngine(), CommunityData(SNMP_COMMUNITY),
+                             UdpTransportTarget((SNMP_TARGET, SNMP_PORT)), ContextData()))
+    return _session[1]
+
+def oid_size(oid):
+    """Return the BER encoded length of a dotted OID"""
+    arcs = [int(arc) for arc in oid.strip('.').split('.')]
+    return 1 + sum(max(1, (arc.bit_length() + 6) // 7) for arc in arcs[2:])
+
+def pack_oids(oids, max_size=MAX_MESSAGE_SIZE):
+    """Split OIDs into batches whose GET responses fit in max_size bytes"""
+    batches = []
+    batch, size = [], MESSAGE_OVERHEAD + len(SNMP_COMMUNITY)
+    for oid in oids:
+        length = oid_size(oid) + VARBIND_OVERHEAD
+        if batch and size + length > max_size:
+            batches.append(batch)
+            batch, size = [], MESSAGE_OVERHEAD + len(SNMP_COMMUNITY)
+        batch.append(oid)
+        size += length
+    if batch:
+        batches.append(batch)
+    return batches
+
+def snmp_get_many(oids):
+    """GET many OIDs in as few requests as fit the message size
+
+    Returns {oid: value}, with None for OIDs the agent has no value for.
+    """
+    values = {}
+    pending = pack_oids(oids)
+    while pending:
+        batch = pending.pop()
+        errorIndication, errorStatus, errorIndex, varBinds = next(getCmd(
+            *get_session(),
+            *[ObjectType(ObjectIdentity(oid)) for oid in batch],
+            lookupMib=False
+        ))
+
+        if errorIndication:
+            print(f"SNMP Error: {errorIndication}")
+            values.update(dict.fromkeys(batch))
+        elif errorStatus:
+            if int(errorStatus) == 1 and len(batch) > 1:
+                # tooBig: retry in halves
+                pending.extend([batch[:len(batch) // 2], batch[len(batch) // 2:]])
+            elif 0 < int(errorIndex) <= len(batch):
+                # One failing variable binding (SNMPv1 noSuchName): retry without it
+                failed = batch[int(errorIndex) - 1]
+                print(f"SNMP Error: {errorStatus.prettyPrint()} at {failed}")
+                values[failed] = None
+                rest = [oid for oid in batch if oid != failed]
+                if rest:
+                    pending.append(rest)
+            else:
+                print(f"SNMP Error: {errorStatus.prettyPrint()}")
+                values.update(dict.fromkeys(batch))
+        else:
+            for oid, (_, value) in zip(batch, varBinds):
+                values[oid] = None if value.tagSet in NO_VALUE else value
+    return values
+
 def snmp_get(oid):
     """Perform SNMP GET operation for a single OID"""
-    iterator = getCmd(
-        SnmpEngine(),
-        CommunityData(SNMP_COMMUNITY),
-        UdpTransportTarget((SNMP_TARGET, SNMP_PORT)),
-        ContextData(),
-        ObjectType(ObjectIdentity(oid))
-    )
-    
-    errorIndication, errorStatus, errorIndex, varBinds = next(iterator)
-    
-    if errorIndication:
-        print(f"SNMP Error: {errorIndication}")
-        return None
-    elif errorStatus:
-        print(f"SNMP Error: {errorStatus.prettyPrint()}")
-        return None
-    else:
-        for varBind in varBinds:
-            # Return the value part of the OID-value pair
-            return varBind[1]
-    return None
+    return snmp_get_many([oid])[oid]
 
-def poll_metrics():
-    """Poll all metrics from the SNMP agent"""
+def poll_metrics(names=None):
+    """Poll all metrics (or those in names) from the SNMP agent"""
     metrics = {}
     timestamp = datetime.now().isoformat()
+    oid_list = OID_LIST if names is None else [(name, oid) for name, oid in OID_LIST if name in names]
     
     print(f"Polling metrics at {timestamp}")
     
-    for name, oid in OID_LIST:
-        value = snmp_get(oid)
+    # All metrics in one request
+    values = snmp_get_many([oid for _, oid in oid_list])
+    for name, oid in oid_list:
+        value = values[oid]
         if value is not None:
             metrics[name] = str(value)
             print(f"  {name}: {value}")
@@ -92,6 +190,208 @@ def poll_metrics():
     metrics['timestamp'] = timestamp
     return metrics
 
+def counter_oids(names):
+    """Return (name, oid) of scalar counters named by their OID below BASE_OID, as the walk names them (3.1)"""
+    return [(name, f'{BASE_OID}.{name}.0') for name in names]
+
+def poll_counters(names):
+    """Poll scalar counters named as by counter_oids(), for rates between polls"""
+    oid_list = counter_oids(names)
+    values = snmp_get_many([oid for _, oid in oid_list])
+    return {name: "N/A" if values[oid] is None else str(values[oid]) for name, oid in oid_list}
+
+def poll_history(since=0, max_rows=100):
+    """Fetch the agent's history samples newer than sequence number since, oldest first
+
+    One GETBULK returns up to max_rows samples; more are fetched with further requests.
+    """
+    column_oids = {name: tuple(int(arc) for arc in f'{HISTORY_ENTRY_OID}.{column}'.split('.'))
+                   for column, name in enumerate(HISTORY_COLUMNS, 1)}
+    iterator = bulkCmd(
+        *get_session(),
+        0, max_rows,
+        *[ObjectType(ObjectIdentity('.'.join(map(str, oid + (since,))))) for oid in column_oids.values()],
+        lexicographicMode=True, lookupMib=False
+    )
+
+    samples = {}
+    for errorIndication, errorStatus, errorIndex, varBinds in iterator:
+        if errorIndication:
+            print(f"SNMP Error: {errorIndication}")
+            break
+        elif errorStatus:
+            print(f"SNMP Error: {errorStatus.prettyPrint()}")
+            break
+        row = False
+        for name, (oid, value) in zip(HISTORY_COLUMNS, varBinds):
+            oid = tuple(oid)
+            # Past the last sample this column's walk continues into the next column
+            if oid[:-1] != column_oids[name]:
+                continue
+            row = True
+            samples.setdefault(oid[-1], {})[name] = str(value)
+        if not row:
+            break
+
+    return [samples[sequence] for sequence in sorted(samples)]
+
+def walk_subtree(root=BASE_OID, max_repetitions=MAX_REPETITIONS, exclude=()):
+    """Return [(oid, value)] of every instance under root, fetched with GETBULK
+
+    The subtrees under the exclude prefixes are not fetched: the walk
+    resumes past each one it reaches.
+    """
+    root = tuple(int(arc) for arc in root.split('.'))
+    excluded = [tuple(int(arc) for arc in prefix.split('.')) for prefix in exclude]
+    excluded = [prefix for prefix in excluded if root[:len(prefix)] != prefix]
+    instances = []
+    start = root
+    while start is not None:
+        resume, start = start, None
+        for errorIndication, errorStatus, errorIndex, varBinds in bulkCmd(
+            *get_session(),
+            0, max_repetitions,
+            ObjectType(ObjectIdentity('.'.join(map(str, resume)))),
+            lexicographicMode=True, lookupMib=False
+        ):
+            if errorIndication:
+                print(f"SNMP Error: {errorIndication}")
+                break
+            elif errorStatus:
+                print(f"SNMP Error: {errorStatus.prettyPrint()}")
+                break
+            oid, value = varBinds[0]
+            oid = tuple(oid)
+            if oid[:len(root)] != root or value.tagSet in NO_VALUE:
+                break
+            skipped = [prefix for prefix in excluded if oid[:len(prefix)] == prefix]
+            if skipped:
+                # Continue from the next sibling of the excluded subtree
+                start = skipped[0][:-1] + (skipped[0][-1] + 1,)
+                break
+            if value.tagSet != v2c.Null.tagSet:
+                instances.append((oid, value))
+    return instances
+
+def table_column(oid):
+    """Return the column of a table cell instance, or None for a scalar instance"""
+    if len(oid) > COLUMN_DEPTH and oid[len(BASE_ARCS) + 2] == 1:
+        return oid[:COLUMN_DEPTH]
+    return None
+
+def instance_name(oid):
+    """Return the metric name of a scalar instance or column[index] of a table cell"""
+    if table_column(oid) is None:
+        return METRIC_NAMES.get(oid, '.'.join(map(str, oid[len(BASE_ARCS):-1])))
+    column, index = oid[:COLUMN_DEPTH], oid[COLUMN_DEPTH:]
+    # Length-prefixed string indexes (NF instance ids) are shown as the string
+    if index[0] == len(index) - 1 and all(32 <= arc < 127 for arc in index[1:]):
+        index = ''.join(map(chr, index[1:]))
+    else:
+        index = '.'.join(map(str, index))
+    return f"{'.'.join(map(str, column[len(BASE_ARCS):]))}[{index}]"
+
+class SubtreePoller:
+    """Polls every object under BASE_OID, discovering them with a subtree walk
+
+    The first poll walks the subtree with GETBULK and records the scalar
+    instances and table columns found, and how many rows each column had.
+    Later polls fetch the scalars with one packed GET and every column with
+    GETBULK sized to the known rows, which also picks up rows added or
+    removed since; the columns are split across requests while the agent
+    answers tooBig. A missing scalar, or every rediscover polls, the subtree
+    is walked again to find new objects.
+
+    The subtrees under the exclude prefixes are not polled: by default the
+    agent's statistics and its history table. Pass exclude=[HISTORY_OID] to
+    poll the statistics too.
+    """
+
+    def __init__(self, root=BASE_OID, max_repetitions=MAX_REPETITIONS, rediscover=REDISCOVER_EVERY,
+                 exclude=WALK_EXCLUDE):
+        self.root = root
+        self.max_repetitions = max_repetitions
+        self.rediscover = rediscover
+        self.exclude = exclude
+        self.scalars = None
+        self.columns = None
+        self.polls = 0
+
+    def discover(self):
+        """Walk the subtree and record its layout; return the walked instances"""
+        instances = walk_subtree(self.root, self.max_repetitions, self.exclude)
+        self.scalars = [oid for oid, _ in instances if table_column(oid) is None]
+        self.columns = {}
+        for oid, _ in instances:
+            column = table_column(oid)
+            if column is not None:
+                self.columns[column] = self.columns.get(column, 0) + 1
+        self.polls = 0
+        return instances
+
+    def _poll_layout(self):
+        instances = []
+        values = snmp_get_many(['.'.join(map(str, oid)) for oid in self.scalars])
+        for oid in self.scalars:
+            value = values['.'.join(map(str, oid))]
+            if value is None:
+                # An object went away: walk again next time
+                self.scalars = None
+                continue
+            instances.append((oid, value))
+        if not self.columns:
+            return instances
+
+        rows = dict.fromkeys(self.columns, 0)
+        pending = [list(self.columns)]
+        while pending:
+            columns = pending.pop()
+            found = []
+            for errorIndication, errorStatus, errorIndex, varBinds in bulkCmd(
+                *get_session(),
+                # Past the known rows, one repetition shows where each column ends and one more
+                # lets the walk finish without another request; the agent truncates to its message size
+                0, max(self.columns[column] for column in columns) + 2,
+                *[ObjectType(ObjectIdentity('.'.join(map(str, column)))) for column in columns],
+                lexicographicMode=False, lookupMib=False
+            ):
+                if errorIndication:
+                    print(f"SNMP Error: {errorIndication}")
+                    break
+                elif errorStatus:
+                    if int(errorStatus) == 1 and len(columns) > 1:
+                        # tooBig: retry in halves
+                        pending.extend([columns[:len(columns) // 2], columns[len(columns) // 2:]])
+                        found = []
+                    else:
+                        print(f"SNMP Error: {errorStatus.prettyPrint()}")
+                        # Walk again next time, with the walk's repetitions
+                        self.scalars = None
+                    break
+                for column, (oid, value) in zip(columns, varBinds):
+                    oid = tuple(oid)
+                    # Columns already walked to their end are padded with Null
+                    if oid[:COLUMN_DEPTH] != column or value.tagSet in NO_VALUE or value.tagSet == v2c.Null.tagSet:
+                        continue
+                    found.append((oid, value))
+            for oid, value in found:
+                rows[oid[:COLUMN_DEPTH]] += 1
+            instances.extend(found)
+        self.columns = rows
+        return instances
+
+    def poll(self):
+        """Return {name: value} of every object under the root, and the poll timestamp"""
+        timestamp = datetime.now().isoformat()
+        if self.scalars is None or self.polls >= self.rediscover:
+            instances = self.discover()
+        else:
+            instances = self._poll_layout()
+        self.polls += 1
+        metrics = {instance_name(oid): str(value) for oid, value in sorted(instances, key=lambda instance: instance[0])}
+        metrics['timestamp'] = timestamp
+        return metrics
+
 def export_to_json(metrics, filename):
     """Export metrics to JSON file"""
     with open(filename, 'w') as f:
@@ -100,52 +400,126 @@ def export_to_json(metrics, filename):
 
 def export_to_csv(metrics, filename):
     """Export metrics to CSV file"""
-    # Create file with headers if it doesn't exist
-    file_exists = False
-    try:
-        with open(filename, 'r'):
-            file_exists = True
-    except FileNotFoundError:
-        pass
-    
     with open(filename, 'a', newline='') as f:
         writer = csv.writer(f)
         
         # Write headers if file is new
-        if not file_exists:
+        if f.tell() == 0:
             headers = ['timestamp'] + [name for name, _ in OID_LIST]
             writer.writerow(headers)
         
         # Write metrics data
-        row = [metrics['timestamp']] + [metrics[name] for name, _ in OID_LIST]
+        row = [metrics['timestamp']] + [metrics.get(name, "N/A") for name, _ in OID_LIST]
         writer.writerow(row)
     
     print(f"Metrics appended to {filename}")
 
-def continuous_polling(interval=30, export_format='json'):
-    """Continuously poll metrics at specified interval"""
+def export_to_segments(metrics, log):
+    """Append metrics to a segment log (snmp_segments.SegmentLog)"""
+    log.append(metrics)
+    print(f"Metrics appended to {log.directory}")
+
+def continuous_polling(interval=30, export_format='json', walk=False, store=None, rollups=None, exporter=None,
+                       groups=None, jitter=0.0, detector=None, counters=None):
+    """Continuously poll metrics at specified interval
+
+    With walk, every object under BASE_OID is polled, NF table rows included,
+    as discovered by walking the subtree instead of the metrics in OID_LIST.
+    Each poll is also appended to store (a snmp_store.MetricStore) and
+    rollups (a snmp_rollups.RollupEngine) if given, scored by detector (a
+    snmp_anomaly.AnomalyDetector), and published to exporter (a
+    snmp_exporter.MetricsExporter) for Prometheus. The
+    'segments' format appends to binary columnar segments in
+    SEGMENTS_DIRECTORY, written a block at a time.
+
+    Polls run on absolute deadlines (snmp_scheduler), so the interval does
+    not drift by the poll and export time. groups ({group: (interval, metric
+    names)}, such as METRIC_GROUPS) polls each group on its own interval,
+    and the metrics in no group every interval; the exports then hold the
+    latest value of every metric. jitter spreads the first poll of each
+    group over that fraction of its interval, at a stable offset per target.
+
+    counters (names as by counter_oids(), by default the counters of
+    rollups) are read with every poll of the ungrouped metrics or of the
+    subtree, even where the walk excludes them, so rollups can turn them
+    into rates.
+    """
     print(f"Starting continuous polling every {interval} seconds...")
     print("Press Ctrl+C to stop")
+    subtree = SubtreePoller() if walk else None
+    segments = None
+    if export_format.lower() == 'segments':
+        from snmp_segments import SegmentLog
+        segments = SegmentLog(SEGMENTS_DIRECTORY, flush_after=SEGMENTS_FLUSH_AFTER)
+    scheduler = Scheduler()
+    latest = {}
+    if counters is None:
+        counters = rollups.counters if rollups is not None else ()
+    # Metrics of OID_LIST are polled anyway
+    counters = [name for name in counters if name not in {name for name, _ in OID_LIST}]
+
+    def with_counters(metrics):
+        if counters:
+            metrics.update(poll_counters(counters))
+        return metrics
+
+    def record(metrics):
+        if store is not None:
+            store.append(SNMP_TARGET, metrics)
+        if rollups is not None:
+            rollups.append(SNMP_TARGET, metrics)
+        if detector is not None:
+            detector.append(SNMP_TARGET, metrics)
+        if len(scheduler.jobs) > 1:
+            latest.update(metrics)
+            metrics = dict(latest)
+        if exporter is not None:
+            exporter.append(SNMP_TARGET, metrics)
+            exporter.publish(scheduler.families() + (detector.families() if detector is not None else []))
+        
+        # Export based on format
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        
+        if export_format.lower() == 'json':
+            export_to_json(metrics, f"metrics_{timestamp}.json")
+        elif export_format.lower() == 'csv':
+            export_to_csv(metrics, "metrics.csv")
+        elif export_format.lower() == 'both':
+            export_to_json(metrics, f"metrics_{timestamp}.json")
+            export_to_csv(metrics, "metrics.csv")
+        elif export_format.lower() == 'segments':
+            export_to_segments(metrics, segments)
+
+    def poll_group(names):
+        return lambda: record(poll_metrics(names))
+
+    if walk:
+        scheduler.add('walk', interval, lambda: record(with_counters(subtree.poll())), jitter,
+                      f"{SNMP_TARGET}/walk")
+    else:
+        grouped = set()
+        for group, (group_interval, names) in (groups or {}).items():
+            unknown = set(names) - {name for name, _ in OID_LIST}
+            if unknown:
+                raise ValueError(f"Unknown metrics in group {group}: {', '.join(sorted(unknown))}")
+            scheduler.add(group, group_interval, poll_group(names), jitter, f"{SNMP_TARGET}/{group}")
+            grouped.update(names)
+        rest = [name for name, _ in OID_LIST if name not in grouped]
+        if rest or counters:
+            ungrouped = None if not grouped else rest
+            scheduler.add('metrics', interval, lambda: record(with_counters(poll_metrics(ungrouped))), jitter,
+                          f"{SNMP_TARGET}/metrics")
     
     try:
-        while True:
-            metrics = poll_metrics()
-            
-            # Export based on format
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            
-            if export_format.lower() == 'json':
-                export_to_json(metrics, f"metrics_{timestamp}.json")
-            elif export_format.lower() == 'csv':
-                export_to_csv(metrics, "metrics.csv")
-            elif export_format.lower() == 'both':
-                export_to_json(metrics, f"metrics_{timestamp}.json")
-                export_to_csv(metrics, "metrics.csv")
-            
-            print(f"Waiting {interval} seconds...\n")
-            time.sleep(interval)
+        scheduler.run()
     except KeyboardInterrupt:
         print("\nStopping continuous polling...")
+        for job in scheduler.jobs:
+            print(f"  {job.name}: {job.stats['runs']} polls, {job.stats['missed']} missed deadlines, "
+                  f"max lag {job.stats['max_lag']:.3f} s")
+    finally:
+        if segments is not None:
+            segments.close()
 
 def main():
     """Main function"""
@@ -158,6 +532,12 @@ def main():
     
     # Uncomment the following line to start continuous polling
     # continuous_polling(interval=30, export_format='both')
+    # or, for every object the agent serves, NF table rows included:
+    # continuous_polling(interval=30, export_format='json', walk=True)
+    # or, serving the latest poll to Prometheus at http://localhost:9161/metrics:
+    # from snmp_exporter import MetricsExporter, serve_metrics
+    # exporter = MetricsExporter(); serve_metrics(exporter)
+    # continuous_polling(interval=30, export_format='segments', exporter=exporter)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+
+"""
+Multi-resolution rollups of polled 5G Core metrics
+Aggregates every poll, as it arrives, into min/max/avg/p95 series at several
+resolutions (1 minute, 5 minutes and 1 hour by default), each kept for its
+own retention period in a fixed ring of buckets, so dashboards read a
+precomputed series whose length depends on the time range and resolution,
+not on how many raw samples fell in it. A sample updates the open bucket of
+every resolution with vector operations over all of a target's metrics at
+once; the percentile is computed from the open bucket's samples when it
+closes. Counter metrics are rolled up as per-second rates, with 32 and 64
+bit wraps handled and counter resets left out.
+"""
+
+import numpy as np
+
+from snmp_store import POLL_FIELDS, parse_timestamp
+
+# (resolution, retention) in seconds: 1 minute for a day, 5 minutes for a week, 1 hour for 90 days
+RESOLUTIONS = ((60, 86400), (300, 7 * 86400), (3600, 90 * 86400))
+
+# Counter metrics and their width in bits: the agent's Counter32 statistics, as named by the walk poller;
+# continuous_polling reads the counters of its rollups even though the walk excludes them
+COUNTERS = {'3.1': 32, '3.2': 32, '3.3': 32}
+
+# Points a query returns at most before a coarser resolution is used
+MAX_POINTS = 1500
+
+
+def percentile(rows, q):
+    """Return the q-th percentile of every column of rows, ignoring NaN
+
+    Matches numpy.nanpercentile's linear interpolation, computed for all
+    columns at once from one sort (NaN sorts last).
+    """
+    rows = np.sort(rows, axis=0)
+    count = np.count_nonzero(~np.isnan(rows), axis=0)
+    last = np.maximum(count - 1, 0)
+    position = last * (q / 100)
+    low = np.floor(position).astype(np.intp)
+    high = np.minimum(low + 1, last)
+    columns = np.arange(rows.shape[1])
+    lower, upper = rows[low, columns], rows[high, columns]
+    result = lower + (upper - lower) * (position - low)
+    result[count == 0] = np.nan
+    return result
+
+
+class Tier:
+    """Buckets of one resolution for one target's metrics
+
+    Bucket number b covers [b * resolution, (b + 1) * resolution) and is kept
+    in slot b % buckets, so a slot is overwritten once its bucket is older
+    than the retention.
+    """
+
+    def __init__(self, resolution, retention, metrics, percentile=95):
+        self.resolution = resolution
+        self.retention = retention
+        self.percentile = percentile
+        self.buckets = max(1, retention // resolution)
+        self.numbers = np.full(self.buckets, -1, dtype=np.int64)
+        self.min = np.full((self.buckets, metrics), np.nan)
+        self.max = np.full((self.buckets, metrics), np.nan)
+        self.sum = np.zeros((self.buckets, metrics))
+        self.count = np.zeros((self.buckets, metrics), dtype=np.int32)
+        self.p95 = np.full((self.buckets, metrics), np.nan)
+        # Number and samples of the bucket being filled
+        self.open = None
+        self.samples = []
+
+    def grow(self, metrics):
+        """Add columns for new metrics"""
+        extra = metrics - self.min.shape[1]
+        if extra <= 0:
+            return
+        pad = ((0, 0), (0, extra))
+        self.min = np.pad(self.min, pad, constant_values=np.nan)
+        self.max = np.pad(self.max, pad, constant_values=np.nan)
+        self.sum = np.pad(self.sum, pad)
+        self.count = np.pad(self.count, pad)
+        self.p95 = np.pad(self.p95, pad, constant_values=np.nan)
+
+    def _percentile(self):
+        """Return the percentile of every metric over the open bucket's samples"""
+        rows = np.full((len(self.samples), self.min.shape[1]), np.nan)
+        for row, values in enumerate(self.samples):
+            rows[row, :len(values)] = values
+        return percentile(rows, self.percentile)
+
+    def add(self, timestamp, values):
+        """Add one sample of every metric; returns False for a sample older than the open bucket"""
+        number = int(timestamp // self.resolution)
+        if self.open is not None and number < self.open:
+            return False
+        if number != self.open:
+            if self.open is not None:
+                self.p95[self.open % self.buckets] = self._percentile()
+            slot = number % self.buckets
+            self.numbers[slot] = number
+            self.min[slot] = self.max[slot] = self.p95[slot] = np.nan
+            self.sum[slot] = self.count[slot] = 0
+            self.open, self.samples = number, []
+        slot = self.open % self.buckets
+        present = ~np.isnan(values)
+        np.fmin(self.min[slot], values, out=self.min[slot])
+        np.fmax(self.max[slot], values, out=self.max[slot])
+        self.sum[slot] += np.where(present, values, 0)
+        self.count[slot] += present
+        self.samples.append(values)
+        return True
+
+    def query(self, start, end, column):
+        """Return {'time', 'min', 'max', 'avg', 'p95', 'count'} arrays of the buckets overlapping [start, end)
+
+        Every bucket of the range is returned; those without samples are NaN
+        with a count of 0.
+        """
+        numbers = np.arange(int(start // self.resolution), -int(-end // self.resolution), dtype=np.int64)
+        series = {'time': (numbers * self.resolution).astype(np.float64)}
+        series.update({name: np.full(len(numbers), np.nan) for name in ('min', 'max', 'avg', 'p95')})
+        series['count'] = np.zeros(len(numbers), dtype=np.int32)
+        if column is None or column >= self.min.shape[1]:
+            return series
+        slots = numbers % self.buckets
+        held = self.numbers[slots] == numbers
+        slots = slots[held]
+        count = self.count[slots, column]
+        series['min'][held] = self.min[slots, column]
+        series['max'][held] = self.max[slots, column]
+        series['p95'][held] = self.p95[slots, column]
+        series['count'][held] = count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            series['avg'][held] = np.where(count > 0, self.sum[slots, column] / count, np.nan)
+        if self.open is not None and self.open in numbers[held]:
+            series['p95'][np.searchsorted(numbers, self.open)] = self._percentile()[column]
+        return series
+
+    def nbytes(self):
+        return sum(array.nbytes for array in (self.numbers, self.min, self.max, self.sum, self.count, self.p95))
+
+
+class TargetRollups:
+    """Rollups of every resolution for one target"""
+
+    def __init__(self, resolutions, counters, percentile):
+        self.columns = {}
+        # Largest reading of each counter column, 0 for gauges
+        self.masks = np.zeros(0, dtype=np.uint64)
+        self.counters = counters
+        self.tiers = [Tier(resolution, retention, 0, percentile) for resolution, retention in resolutions]
+        self.latest = None
+        # Previous counter readings, for rates
+        self.previous = None
+        self.previous_time = None
+
+    def _column(self, name):
+        column = self.columns.get(name)
+        if column is None:
+            column = self.columns[name] = len(self.columns)
+            self.masks = np.append(self.masks, np.uint64(2 ** self.counters.get(name, 0) - 1))
+        return column
+
+    def _rates(self, timestamp, values, readings):
+        """Replace the counter readings in values by their per-second rate since the previous poll"""
+        counters = np.flatnonzero(self.masks)
+        if not len(counters):
+            return
+        current = np.zeros(len(self.masks), dtype=np.uint64)
+        valid = np.zeros(len(self.masks), dtype=bool)
+        for column in counters:
+            reading = readings.get(column)
+            if reading is not None:
+                current[column], valid[column] = reading, True
+        rates = np.full(len(counters), np.nan)
+        if self.previous is not None and timestamp > self.previous_time:
+            known = len(self.previous[0])
+            before = np.zeros(len(self.masks), dtype=np.uint64)
+            before[:known] = self.previous[0]
+            was_valid = np.zeros(len(self.masks), dtype=bool)
+            was_valid[:known] = self.previous[1]
+            mask = self.masks[counters]
+            # Unsigned subtraction wraps, so a counter that wrapped past its width still gives its increase
+            delta = (current[counters] - before[counters]) & mask
+            # A drop by more than half the counter range is a reset, not a wrap
+            usable = valid[counters] & was_valid[counters] & (delta <= mask >> np.uint64(1))
+            rates[usable] = delta[usable].astype(np.float64) / (timestamp - self.previous_time)
+        values[counters] = rates
+        self.previous, self.previous_time = (current, valid), timestamp
+
+    def add(self, timestamp, metrics):
+        """Add one poll result; returns False if it is older than the open buckets"""
+        if self.latest is not None and timestamp < self.latest:
+            return False
+        readings = {}
+        entries = []
+        for name, value in metrics.items():
+            if name in POLL_FIELDS:
+                continue
+            column = self._column(name)
+            if self.masks[column]:
+                try:
+                    readings[column] = int(value) & int(self.masks[column])
+                except (TypeError, ValueError):
+                    pass
+                continue
+            try:
+                entries.append((column, float(value)))
+            except (TypeError, ValueError):
+                pass
+        values = np.full(len(self.columns), np.nan)
+        if entries:
+            columns, numbers = zip(*entries)
+            values[list(columns)] = numbers
+        self._rates(timestamp, values, readings)
+        for tier in self.tiers:
+            tier.grow(len(self.columns))
+            tier.add(timestamp, values)
+        self.latest = timestamp
+        return True
+
+
+class RollupEngine:
+    """Min/max/avg/p95 rollups of every polled target's metrics at several resolutions
+
+    resolutions is a list of (resolution, retention) pairs in seconds, and
+    counters a {metric: bits} dict of the counter metrics (COUNTERS by
+    default), which are rolled up as per-second rates; they have to be in
+    every poll appended. A target's rollups take a fixed
+    buckets * metrics * 36 bytes per resolution.
+    """
+
+    def __init__(self, resolutions=RESOLUTIONS, counters=None, percentile=95):
+        self.resolutions = sorted(resolutions)
+        self.counters = COUNTERS if counters is None else counters
+        self.percentile = percentile
+        self.targets = {}
+        self.stats = {'samples': 0, 'late': 0}
+
+    def append(self, target, metrics, timestamp=None):
+        """Add one poll of a target: the poller's {name: value} dict with its "timestamp" """
+        rollups = self.targets.get(target)
+        if rollups is None:
+            rollups = self.targets[target] = TargetRollups(self.resolutions, self.counters, self.percentile)
+        added = rollups.add(parse_timestamp(metrics['timestamp'] if timestamp is None else timestamp), metrics)
+        self.stats['samples' if added else 'late'] += 1
+
+    def query(self, target, metric, start, end, resolution=None, max_points=MAX_POINTS):
+        """Return the rollup series of a target's metric over [start, end)
+
+        Without a resolution, the finest one whose retention still covers
+        start and that gives at most max_points buckets is used, so long
+        ranges only read the coarse buckets. The series is a dict of 'time'
+        (bucket starts), 'min', 'max', 'avg', 'p95' and 'count' arrays, plus
+        the 'resolution' used.
+        """
+        start, end = parse_timestamp(start), parse_timestamp(end)
+        rollups = self.targets.get(target)
+        if rollups is None:
+            rollups = TargetRollups(self.resolutions, self.counters, self.percentile)
+        latest = end if rollups.latest is None else rollups.latest
+        if resolution is None:
+            tier = rollups.tiers[-1]
+            for candidate in rollups.tiers:
+                if start >= latest - candidate.retention and (end - start) / candidate.resolution <= max_points:
+                    tier = candidate
+                    break
+        else:
+            tier = next((tier for tier in rollups.tiers if tier.resolution == resolution), None)
+            if tier is None:
+                raise ValueError(f"No {resolution} second rollups")
+        series = tier.query(start, end, rollups.columns.get(metric))
+        series['resolution'] = tier.resolution
+        return series
+
+    def nbytes(self):
+        """Return the memory held by the rollup buckets"""
+        return sum(tier.nbytes() for rollups in self.targets.values() for tier in rollups.tiers)
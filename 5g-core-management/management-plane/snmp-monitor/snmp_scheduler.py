@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+
+"""
+Drift-free polling scheduler
+Runs jobs on absolute deadlines: a job's next deadline is its previous one
+plus its interval, whatever the poll and export took, so a 30 second poll
+stays on a 30 second grid instead of drifting by its own run time. Each job
+is offset by a stable phase derived from its key (the target, or target and
+metric group), so pollers of many targets sharing an interval do not all
+fire at once. A run that overruns its interval skips the deadlines it
+missed rather than bursting to catch up; missed deadlines and how late each
+run started are counted per job and can be exported as Prometheus metrics.
+"""
+
+import time
+import zlib
+
+
+def phase(key, interval, jitter):
+    """Return a stable offset in [0, jitter * interval) for key"""
+    return zlib.crc32(key.encode()) / 2 ** 32 * interval * jitter
+
+
+class Job:
+    """A job run every interval seconds from its first deadline"""
+
+    def __init__(self, name, interval, action, deadline):
+        self.name = name
+        self.interval = interval
+        self.action = action
+        self.deadline = deadline
+        self.stats = {'runs': 0, 'missed': 0, 'errors': 0, 'lag': 0.0, 'max_lag': 0.0}
+
+
+class Scheduler:
+    """Runs jobs at absolute deadlines on a monotonic clock
+
+    run() sleeps until the next deadline and runs the job; callers with their
+    own loop (such as asyncio) use next(), started() and finished() instead.
+    """
+
+    def __init__(self, clock=time.monotonic, sleep=time.sleep):
+        self.clock = clock
+        self.sleep = sleep
+        self.jobs = []
+
+    def add(self, name, interval, action=None, jitter=0.0, key=None):
+        """Add a job first due after its phase: jitter is the fraction of the interval it is spread over"""
+        if interval <= 0:
+            raise ValueError(f"Interval of {name} must be positive")
+        job = Job(name, interval, action, self.clock() + phase(key or name, interval, jitter))
+        self.jobs.append(job)
+        return job
+
+    def next(self):
+        """Return the job due first and the seconds until its deadline (negative when late)"""
+        job = min(self.jobs, key=lambda job: job.deadline)
+        return job, job.deadline - self.clock()
+
+    def started(self, job):
+        """Record that job starts now, returning how late it is"""
+        lag = max(0.0, self.clock() - job.deadline)
+        job.stats['runs'] += 1
+        job.stats['lag'] = lag
+        job.stats['max_lag'] = max(job.stats['max_lag'], lag)
+        return lag
+
+    def finished(self, job):
+        """Move job to its next deadline still ahead, counting the ones its run overran"""
+        deadline = job.deadline + job.interval
+        now = self.clock()
+        if deadline <= now:
+            missed = int((now - deadline) // job.interval) + 1
+            job.stats['missed'] += missed
+            deadline += missed * job.interval
+        job.deadline = deadline
+
+    def run_once(self):
+        """Wait for the next deadline and run its job"""
+        job, delay = self.next()
+        if delay > 0:
+            self.sleep(delay)
+        self.started(job)
+        try:
+            job.action()
+        except Exception as e:
+            job.stats['errors'] += 1
+            print(f"Error running {job.name}: {e}")
+        finally:
+            self.finished(job)
+        return job
+
+    def run(self, runs=None):
+        """Run jobs at their deadlines, forever or for runs runs"""
+        while runs is None or runs > 0:
+            self.run_once()
+            if runs is not None:
+                runs -= 1
+
+    def families(self):
+        """Return the jobs' statistics as extra Prometheus families (see snmp_exporter)"""
+        def samples(key):
+            return [({'job': job.name}, job.stats[key]) for job in self.jobs]
+        return [('snmp_schedule_runs_total', 'Runs of the polling job', 'counter', samples('runs')),
+                ('snmp_schedule_missed_deadlines_total', 'Deadlines skipped because a run overran', 'counter',
+                 samples('missed')),
+                ('snmp_schedule_errors_total', 'Runs that raised an error', 'counter', samples('errors')),
+                ('snmp_schedule_lag_seconds', 'How late the last run started', 'gauge', samples('lag')),
+                ('snmp_schedule_max_lag_seconds', 'Most a run has started after its deadline', 'gauge',
+                 samples('max_lag'))]
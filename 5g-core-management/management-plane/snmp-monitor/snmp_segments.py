@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+
+"""
+Binary columnar segments for 5G Core poll results
+Stores poll results in append-only segment files of fixed-width typed
+columns, one per metric plus a timestamp column, so a month of polls loads
+in milliseconds instead of re-parsing text.
+
+A segment file starts with a small header (magic, then a JSON index of its
+column names and types) and is followed by blocks of rows, each a block
+header (row count and first and last timestamp) and then every column's
+values for those rows, back to back. Writers buffer rows and append a whole
+block at a time; readers map the file and view the columns of the blocks in
+the requested time range in place. A block cut short by a crash is ignored
+and overwritten by the next writer. A directory of segments (SegmentLog)
+starts a new segment when the metrics polled change or a segment is full.
+
+    python snmp_segments.py metrics.csv metrics_*.json --output segments
+"""
+
+import argparse
+import csv
+import glob
+import json
+import mmap
+import os
+import struct
+import time
+import urllib.parse
+
+import numpy as np
+
+from snmp_store import POLL_FIELDS, parse_timestamp
+
+MAGIC = b'5GSEG\x00\x00\x01'
+# Magic and header index length, then the index padded to 8 bytes
+FILE_HEADER = struct.Struct('<8sI')
+# Rows, padding, first and last timestamp
+BLOCK_HEADER = struct.Struct('<I4xdd')
+
+TIMESTAMP_DTYPE = np.dtype('<f8')
+DTYPES = ('<f4', '<f8', '<i4', '<i8')
+
+# Poll fields kept as a column like the metrics, so recorded fleet polls keep their latency
+RECORDED_POLL_FIELDS = ('latency_ms',)
+
+# Rows per block when a writer is not flushed earlier, and per segment (30 days at 10 second polls)
+BLOCK_ROWS = 1024
+SEGMENT_ROWS = 259200
+
+
+def padded(size):
+    return (size + 7) & ~7
+
+
+def missing_value(dtype):
+    """Return the value stored for a missing sample: NaN, or the smallest integer"""
+    return np.nan if dtype.kind == 'f' else np.iinfo(dtype).min
+
+
+class Segment:
+    """Memory-mapped reader of one segment file"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, length = FILE_HEADER.unpack_from(self._map, 0)
+            if magic != MAGIC:
+                raise ValueError(f"{path} is not a metrics segment")
+            index = json.loads(bytes(self._map[FILE_HEADER.size:FILE_HEADER.size + length]))
+        except (struct.error, ValueError):
+            self._map.close()
+            raise
+        self.columns = [name for name, _ in index['columns']]
+        self.dtypes = {name: np.dtype(dtype) for name, dtype in index['columns']}
+        self.blocks = []
+        self.rows = 0
+        # End of the last complete block: anything after it is an interrupted write
+        self.size = padded(FILE_HEADER.size + length)
+        self._scan()
+
+    def _scan(self):
+        while self.size + BLOCK_HEADER.size <= len(self._map):
+            rows, first, last = BLOCK_HEADER.unpack_from(self._map, self.size)
+            offset = self.size + BLOCK_HEADER.size
+            offsets = {'timestamp': offset}
+            offset += padded(rows * TIMESTAMP_DTYPE.itemsize)
+            for name in self.columns:
+                offsets[name] = offset
+                offset += padded(rows * self.dtypes[name].itemsize)
+            if offset > len(self._map):
+                break
+            self.blocks.append((rows, first, last, offsets))
+            self.rows += rows
+            self.size = offset
+
+    def _column(self, name, blocks):
+        dtype = TIMESTAMP_DTYPE if name == 'timestamp' else self.dtypes[name]
+        return np.concatenate([np.frombuffer(self._map, dtype, rows, offsets[name])
+                               for rows, _, _, offsets in blocks] or [np.empty(0, dtype)])
+
+    def read(self, start=None, end=None, metrics=None):
+        """Return (times, {metric: values}) of the rows with start <= time < end
+
+        Only the blocks overlapping the range are read. Metrics the segment
+        does not hold are returned as missing values.
+        """
+        start = -np.inf if start is None else parse_timestamp(start)
+        end = np.inf if end is None else parse_timestamp(end)
+        blocks = [block for block in self.blocks if block[2] >= start and block[1] < end]
+        times = self._column('timestamp', blocks)
+        selected = (times >= start) & (times < end)
+        times = times[selected]
+        values = {}
+        for name in self.columns if metrics is None else metrics:
+            if name in self.dtypes:
+                values[name] = self._column(name, blocks)[selected]
+            else:
+                values[name] = np.full(len(times), np.nan)
+        return times, values
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SegmentWriter:
+    """Buffered appender of poll results to one segment file
+
+    Rows are written a block at a time: when block_rows are buffered, when
+    the oldest buffered row is flush_after seconds old, or on flush() and
+    close(). Appending to an existing segment requires the same columns.
+    dtypes is the type of every column, or a {metric: type} dict of the
+    columns that are not float64.
+    """
+
+    def __init__(self, path, columns, dtypes=None, block_rows=BLOCK_ROWS, flush_after=None):
+        self.path = path
+        self.columns = list(columns)
+        if isinstance(dtypes, dict):
+            self.dtypes = {name: np.dtype(dtypes.get(name, '<f8')) for name in self.columns}
+        else:
+            self.dtypes = {name: np.dtype(dtypes or '<f8') for name in self.columns}
+        for name, dtype in self.dtypes.items():
+            if dtype.str not in DTYPES:
+                raise ValueError(f"Unsupported column type {dtype} for {name}")
+        self.block_rows = block_rows
+        self.flush_after = flush_after
+        self.rows = 0
+        self._buffer = {name: [] for name in ['timestamp'] + self.columns}
+        self._buffered_at = None
+        if os.path.exists(path) and os.path.getsize(path):
+            with Segment(path) as segment:
+                if segment.columns != self.columns or segment.dtypes != self.dtypes:
+                    raise ValueError(f"{path} holds different columns")
+                self.rows, size = segment.rows, segment.size
+            self._file = open(path, 'r+b')
+            # Drop a block cut short by an earlier crash
+            self._file.truncate(size)
+            self._file.seek(size)
+        else:
+            self._file = open(path, 'wb')
+            index = json.dumps({'columns': [[name, self.dtypes[name].str] for name in self.columns]}).encode()
+            header = FILE_HEADER.pack(MAGIC, len(index)) + index
+            self._file.write(header.ljust(padded(len(header)), b'\0'))
+            self._file.flush()
+
+    def append(self, metrics):
+        """Buffer one poll result: the poller's {name: value} dict with its "timestamp" """
+        self._buffer['timestamp'].append(parse_timestamp(metrics['timestamp']))
+        for name in self.columns:
+            value = metrics.get(name)
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                value = missing_value(self.dtypes[name])
+            self._buffer[name].append(value)
+        self.rows += 1
+        if self._buffered_at is None:
+            self._buffered_at = time.monotonic()
+        buffered = len(self._buffer['timestamp'])
+        if buffered >= self.block_rows or (
+                self.flush_after is not None and time.monotonic() - self._buffered_at >= self.flush_after):
+            self.flush()
+
+    def flush(self):
+        """Append the buffered rows as one block"""
+        times = np.array(self._buffer['timestamp'], dtype=TIMESTAMP_DTYPE)
+        if not len(times):
+            return
+        parts = [BLOCK_HEADER.pack(len(times), times.min(), times.max()), times.tobytes()]
+        for name in self.columns:
+            data = np.array(self._buffer[name], dtype=np.float64)
+            if self.dtypes[name].kind != 'f':
+                data = np.where(np.isnan(data), missing_value(self.dtypes[name]), np.round(data))
+            data = data.astype(self.dtypes[name]).tobytes()
+            # Keep every column 8 byte aligned
+            parts.append(data.ljust(padded(len(data)), b'\0'))
+        self._file.write(b''.join(parts))
+        self._file.flush()
+        for values in self._buffer.values():
+            values.clear()
+        self._buffered_at = None
+
+    def close(self):
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SegmentLog:
+    """A directory of segment files written in time order
+
+    A new segment is started when a poll result has different metrics than
+    the current segment or the segment holds segment_rows rows.
+    """
+
+    def __init__(self, directory, dtypes=None, segment_rows=SEGMENT_ROWS, block_rows=BLOCK_ROWS,
+                 flush_after=None):
+        self.directory = directory
+        self.dtypes = dtypes
+        self.segment_rows = segment_rows
+        self.block_rows = block_rows
+        self.flush_after = flush_after
+        self._writer = None
+        os.makedirs(directory, exist_ok=True)
+
+    def segments(self):
+        """Return the segment file paths, oldest first"""
+        return sorted(glob.glob(os.path.join(self.directory, '*.seg')))
+
+    def _open(self, columns, timestamp):
+        """Return a writer for columns, continuing the newest segment if it matches"""
+        paths = self.segments()
+        if paths:
+            try:
+                writer = SegmentWriter(paths[-1], columns, self.dtypes, self.block_rows, self.flush_after)
+                if writer.rows < self.segment_rows:
+                    return writer
+                writer.close()
+            except ValueError:
+                pass
+        # Named after the first timestamp, so the names sort in time order
+        sequence = 0
+        while True:
+            path = os.path.join(self.directory, f"{int(timestamp):010d}-{sequence:04d}.seg")
+            if not os.path.exists(path):
+                break
+            sequence += 1
+        return SegmentWriter(path, columns, self.dtypes, self.block_rows, self.flush_after)
+
+    def append(self, metrics):
+        """Append one poll result, starting a new segment if needed"""
+        columns = [name for name in metrics if name not in POLL_FIELDS or name in RECORDED_POLL_FIELDS]
+        writer = self._writer
+        if writer is None or writer.columns != columns or writer.rows >= self.segment_rows:
+            if writer is not None:
+                writer.close()
+            writer = self._writer = self._open(columns, parse_timestamp(metrics['timestamp']))
+        writer.append(metrics)
+        if writer.rows >= self.segment_rows:
+            writer.close()
+            self._writer = None
+
+    def read(self, start=None, end=None, metrics=None):
+        """Return (times, {metric: values}) of every segment's rows with start <= time < end
+
+        Without metrics, every metric of any segment in the range is returned,
+        missing values (NaN) where a segment does not hold it.
+        """
+        self.flush()
+        parts = []
+        for path in self.segments():
+            with Segment(path) as segment:
+                parts.append(segment.read(start, end, metrics))
+        parts = [part for part in parts if len(part[0])]
+        if metrics is None:
+            metrics = list(dict.fromkeys(name for _, values in parts for name in values))
+        if not parts:
+            return np.empty(0), {name: np.empty(0) for name in metrics}
+        times = np.concatenate([times for times, _ in parts])
+        values = {name: np.concatenate([part.get(name, np.full(len(part_times), np.nan))
+                                        for part_times, part in parts]) for name in metrics}
+        return times, values
+
+    def flush(self):
+        if self._writer is not None:
+            self._writer.flush()
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def read_poll_results(path):
+    """Yield the poll results of a poller CSV file, JSON export or JSON lines file"""
+    with open(path, newline='') as f:
+        if path.endswith('.csv'):
+            yield from csv.DictReader(f)
+            return
+        text = f.read()
+    try:
+        results = json.loads(text)
+    except json.JSONDecodeError:
+        results = [json.loads(line) for line in text.splitlines() if line.strip()]
+    yield from [results] if isinstance(results, dict) else results
+
+
+def target_directory(target):
+    """Return the subdirectory name of a target's segment log
+
+    Targets come from the polled data, so every character that is not safe
+    in a file name, path separators included, is percent-encoded, as are the
+    dots of "." and "..": the log always stays inside its parent directory.
+    """
+    name = urllib.parse.quote(str(target), safe='')
+    return '%2E' * len(name) if name in ('.', '..') else name
+
+
+def directory_target(name):
+    """Return the target whose segment log is in the subdirectory name"""
+    return urllib.parse.unquote(name)
+
+
+def convert(paths, directory, dtypes=None):
+    """Append the poll results of poller exports to segment logs, returning the rows written
+
+    Results with a "target" (the fleet poller's) go to a log per target in
+    a subdirectory of directory named by target_directory(), the others to
+    directory itself.
+    """
+    logs = {}
+    rows = 0
+    try:
+        for path in paths:
+            for metrics in read_poll_results(path):
+                target = metrics.get('target')
+                log = logs.get(target)
+                if log is None:
+                    log = logs[target] = SegmentLog(
+                        os.path.join(directory, target_directory(target)) if target else directory, dtypes)
+                log.append(metrics)
+                rows += 1
+    finally:
+        for log in logs.values():
+            log.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert poller CSV and JSON exports to metric segments")
+    parser.add_argument("paths", nargs='+', help="poller CSV, JSON or JSON lines files, in time order")
+    parser.add_argument("--output", default="metrics_segments", help="segment directory")
+    parser.add_argument("--dtype", default="<f8", choices=DTYPES, help="type of every metric column")
+    args = parser.parse_args()
+
+    started = time.monotonic()
+    rows = convert(args.paths, args.output, args.dtype)
+    print(f"Converted {rows} poll results from {len(args.paths)} files in {time.monotonic() - started:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
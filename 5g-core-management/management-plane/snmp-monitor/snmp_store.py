@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+
+"""
+In-memory time-series store for polled 5G Core metrics
+Keeps the samples of every polled target in fixed-size NumPy ring buffers:
+one timestamp array per target and one typed value array per metric, all
+written at the same slot, so the metrics of a target are aligned by
+construction and a series never grows past its capacity, nor a target past
+its metric limit. Time windows are found with a binary search over the (at
+most two) contiguous runs of the ring and returned as arrays without a
+Python loop over the samples.
+"""
+
+from datetime import datetime
+
+import numpy as np
+
+# Fields of a poll result that describe the poll rather than the target (latency_ms: how long the poll took)
+POLL_FIELDS = ('timestamp', 'target', 'error', 'latency_ms')
+
+# Metrics stored per target; the values of further new metrics are dropped
+MAX_METRICS = 1024
+
+
+def parse_timestamp(value):
+    """Return Unix seconds for a poller timestamp (ISO 8601 string or number)"""
+    if isinstance(value, str):
+        return datetime.fromisoformat(value).timestamp()
+    return float(value)
+
+
+class TargetSeries:
+    """The last capacity samples of one target's metrics"""
+
+    def __init__(self, capacity, dtype=np.float64):
+        self.capacity = capacity
+        self.dtype = dtype
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.columns = {}
+        # Slot the next sample is written to, and samples held
+        self.head = 0
+        self.count = 0
+
+    def append(self, timestamp, values):
+        """Record {metric: number} sampled at timestamp; metrics missing from values are NaN
+
+        Returns False, recording nothing, for a sample older than the latest one.
+        """
+        if self.count and timestamp < self.times[(self.head - 1) % self.capacity]:
+            return False
+        slot = self.head
+        self.times[slot] = timestamp
+        for name, value in values.items():
+            if name not in self.columns:
+                self.columns[name] = np.full(self.capacity, np.nan, dtype=self.dtype)
+            self.columns[name][slot] = value
+        for name, column in self.columns.items():
+            if name not in values:
+                column[slot] = np.nan
+        self.head = (slot + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        return True
+
+    def _runs(self):
+        """Return the (start, end) slot ranges holding the samples, oldest first"""
+        first = (self.head - self.count) % self.capacity
+        if first + self.count <= self.capacity:
+            return [(first, first + self.count)]
+        return [(first, self.capacity), (0, self.head)]
+
+    def _slices(self, start, end):
+        """Return the slot ranges of the samples with start <= time < end"""
+        slices = []
+        for low, high in self._runs():
+            times = self.times[low:high]
+            first, last = np.searchsorted(times, (start, end), side='left')
+            if first < last:
+                slices.append((low + first, low + last))
+        return slices
+
+    def window(self, start, end, metrics=None):
+        """Return (times, values) of the samples with start <= time < end
+
+        values is a (samples, metrics) array, one column per metric in the
+        order given (all the target's metrics, sorted, by default).
+        """
+        metrics = sorted(self.columns) if metrics is None else list(metrics)
+        slices = self._slices(start, end)
+        times = np.concatenate([self.times[low:high] for low, high in slices]) if slices else np.empty(0)
+        values = np.full((len(times), len(metrics)), np.nan, dtype=self.dtype)
+        for index, name in enumerate(metrics):
+            column = self.columns.get(name)
+            if column is not None and slices:
+                values[:, index] = np.concatenate([column[low:high] for low, high in slices])
+        return times, values
+
+    def nbytes(self):
+        return self.times.nbytes + sum(column.nbytes for column in self.columns.values())
+
+
+class MetricStore:
+    """Ring-buffered series of every polled target's metrics
+
+    Each target holds its last capacity samples (a day of 10 second polls by
+    default), in dtype values per metric. Values that are not numbers (NF
+    instance ids, addresses, "N/A") are stored as NaN. Only the metrics in
+    metrics are stored if given, and at most max_metrics per target; samples
+    older than a target's latest one are counted as late and dropped.
+    """
+
+    def __init__(self, capacity=8640, dtype=np.float64, max_metrics=MAX_METRICS, metrics=None):
+        self.capacity = capacity
+        self.dtype = dtype
+        self.max_metrics = max_metrics
+        self.metrics = None if metrics is None else set(metrics)
+        self.targets = {}
+        self.stats = {'samples': 0, 'late': 0, 'dropped_values': 0}
+
+    def append(self, target, metrics, timestamp=None):
+        """Record one poll of a target: the poller's {name: value} dict with its "timestamp" """
+        if timestamp is None:
+            timestamp = metrics['timestamp']
+        values = {}
+        for name, value in metrics.items():
+            if name in POLL_FIELDS or (self.metrics is not None and name not in self.metrics):
+                continue
+            try:
+                values[name] = float(value)
+            except (TypeError, ValueError):
+                values[name] = np.nan
+        series = self.targets.get(target)
+        if series is None:
+            series = self.targets[target] = TargetSeries(self.capacity, self.dtype)
+        new = [name for name in values if name not in series.columns]
+        for name in new[max(0, self.max_metrics - len(series.columns)):]:
+            del values[name]
+            self.stats['dropped_values'] += 1
+        added = series.append(parse_timestamp(timestamp), values)
+        self.stats['samples' if added else 'late'] += 1
+
+    def window(self, target, start, end, metrics=None):
+        """Return (times, values) of a target's samples with start <= time < end, aligned per metric"""
+        series = self.targets.get(target)
+        if series is None:
+            return np.empty(0), np.empty((0, 0 if metrics is None else len(metrics)), dtype=self.dtype)
+        return series.window(parse_timestamp(start), parse_timestamp(end), metrics)
+
+    def series(self, target, metric, start, end):
+        """Return (times, values) of one metric of a target with start <= time < end"""
+        times, values = self.window(target, start, end, [metric])
+        return times, values[:, 0]
+
+    def aligned(self, targets, metric, start, end, step):
+        """Return (grid, values) of a metric of several targets on a common time grid
+
+        grid holds the times start, start + step, ... before end; values is a
+        (targets, grid) array of each target's latest sample at or before each
+        grid time and less than step old, NaN where there is none.
+        """
+        start, end = parse_timestamp(start), parse_timestamp(end)
+        grid = np.arange(start, end, step)
+        values = np.full((len(targets), len(grid)), np.nan, dtype=self.dtype)
+        for row, target in enumerate(targets):
+            times, samples = self.series(target, metric, start - step, end)
+            if not len(times):
+                continue
+            latest = np.searchsorted(times, grid, side='right') - 1
+            fresh = (latest >= 0) & (grid - times[np.maximum(latest, 0)] < step)
+            values[row, fresh] = samples[latest[fresh]]
+        return grid, values
+
+    def nbytes(self):
+        """Return the memory held by the ring buffers"""
+        return sum(series.nbytes() for series in self.targets.values())
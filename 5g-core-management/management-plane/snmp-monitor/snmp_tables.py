@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+
+"""
+Per-instance network function tables for the 5G Core SNMP agent
+Serves one conceptual table per NF type (AMF, SMF, UPF) with a row for
+every instance in the network-functions data, indexed by the instance id.
+sync() compares the instances with the rows already served and only adds
+or removes the rows that changed, so the agent's sorted OID index is
+merged incrementally instead of being rebuilt.
+
+Table layout under BASE_OID + (2,):
+    amfTable (2.1)  amfEntry (2.1.1)  columns: id, status, capacity, region-id, set-id, pointer
+    smfTable (2.2)  smfEntry (2.2.1)  columns: id, status, capacity, number of UPFs
+    upfTable (2.3)  upfEntry (2.3.1)  columns: id, status, capacity, address, gtp-u-port
+Rows are indexed by the instance id as a length-prefixed string.
+"""
+
+import functools
+import json
+import sys
+import threading
+import urllib.request
+
+from pysnmp.proto.api import v2c
+
+from snmp_mib import gauge
+
+BASE_OID = (1, 3, 6, 1, 4, 1, 55555)
+NF_TABLES_OID = BASE_OID + (2,)
+
+
+def upf_count(entry):
+    """Return the number of UPFs an SMF is associated with"""
+    return len(entry.get("upf", []))
+
+
+# NF type -> (table OID, [(column, leaf or function, SNMP type)])
+NF_TABLES = {
+    "amf": (NF_TABLES_OID + (1,), [
+        (1, "id", v2c.OctetString),
+        (2, "status", v2c.OctetString),
+        (3, "capacity", gauge),
+        (4, "region-id", gauge),
+        (5, "set-id", gauge),
+        (6, "pointer", gauge)
+    ]),
+    "smf": (NF_TABLES_OID + (2,), [
+        (1, "id", v2c.OctetString),
+        (2, "status", v2c.OctetString),
+        (3, "capacity", gauge),
+        (4, upf_count, gauge)
+    ]),
+    "upf": (NF_TABLES_OID + (3,), [
+        (1, "id", v2c.OctetString),
+        (2, "status", v2c.OctetString),
+        (3, "capacity", gauge),
+        (4, "address", v2c.IpAddress),
+        (5, "gtp-u-port", gauge)
+    ])
+}
+
+
+@functools.lru_cache(maxsize=65536)
+def _snmp_value(syntax, value):
+    return syntax(value)
+
+
+def snmp_value(syntax, value):
+    """Return syntax(value), sharing the immutable SNMP value between reads of the same data"""
+    try:
+        return _snmp_value(syntax, value)
+    except TypeError:
+        # Unhashable data is converted on every read
+        return syntax(value)
+
+
+def string_index(text):
+    """Return the OID index of a string: its length followed by its bytes"""
+    data = str(text).encode("utf-8")
+    return (len(data),) + tuple(data)
+
+
+def nf_instances(nf_type, entries, log=None):
+    """Return {id: entry} of the well-formed instances in entries, reporting the others on log
+
+    log is stderr by default.
+    """
+    instances = {}
+    for entry in entries:
+        if not isinstance(entry, dict) or not isinstance(entry.get("id"), (str, int)):
+            print(f"Skipping malformed {nf_type} instance: {entry!r}", file=log or sys.stderr)
+            continue
+        instances[entry["id"]] = entry
+    return instances
+
+
+class NfTables:
+    """Rows of the NF instance tables, kept in sync with network-functions data"""
+
+    def __init__(self, tree, tables=NF_TABLES):
+        self.tree = tree
+        self.tables = tables
+        self._rows = {nf_type: {} for nf_type in tables}
+
+    def rows(self, nf_type):
+        """Return the served instances of an NF type by id"""
+        return self._rows[nf_type]
+
+    def _getter(self, nf_type, nf_id, leaf, syntax):
+        rows = self._rows[nf_type]
+        if callable(leaf):
+            return lambda: snmp_value(syntax, leaf(rows[nf_id]))
+        return lambda: snmp_value(syntax, rows[nf_id][leaf])
+
+    def sync(self, network_functions, log=None):
+        """Serve exactly the instances in a network-functions dictionary
+
+        Returns the number of rows added and removed. Rows that stay only
+        have their values replaced; their OIDs are left in the index.
+        Malformed instances are skipped, and an NF type whose instances are
+        not a list keeps its rows, each reported on log (stderr by default).
+        """
+        if not isinstance(network_functions, dict):
+            raise ValueError(f"network-functions is not an object: {network_functions!r}")
+        added, removed = [], []
+        rows_added = rows_removed = 0
+        changed = False
+        for nf_type, (table_oid, columns) in self.tables.items():
+            rows = self._rows[nf_type]
+            entries = network_functions.get(nf_type, [])
+            if not isinstance(entries, list):
+                print(f"Keeping the {nf_type} rows: instances are not a list: {entries!r}", file=log or sys.stderr)
+                continue
+            instances = nf_instances(nf_type, entries, log)
+            for nf_id in [nf_id for nf_id in rows if nf_id not in instances]:
+                del rows[nf_id]
+                rows_removed += 1
+                removed.extend((table_oid + (1, column), string_index(nf_id)) for column, _, _ in columns)
+            for nf_id, entry in instances.items():
+                if nf_id not in rows:
+                    rows_added += 1
+                    # Columns missing from an entry read as noSuchInstance and are skipped by walks
+                    added.extend((table_oid + (1, column), string_index(nf_id),
+                                  self._getter(nf_type, nf_id, leaf, syntax))
+                                 for column, leaf, syntax in columns)
+                elif rows[nf_id] != entry:
+                    changed = True
+                rows[nf_id] = entry
+        self.tree.update(added=added, removed=removed)
+        if changed:
+            self.tree.invalidate()
+        return rows_added, rows_removed
+
+
+def fetch_network_functions(url, timeout=5):
+    """Return the network-functions dictionary from a RESTCONF endpoint"""
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.load(response)
+
+
+def sync_network_functions(tables, url, interval=30, stop=None):
+    """Keep tables in sync with a RESTCONF network-functions endpoint until stop is set"""
+    stop = stop or threading.Event()
+    while not stop.is_set():
+        try:
+            tables.sync(fetch_network_functions(url))
+        except (OSError, ValueError) as e:
+            print(f"Error fetching network functions from {url}: {e}")
+        stop.wait(interval)
@@ -0,0 +1,451 @@
+#!/usr/bin/env python3
+
+"""
+asyncio transport for the 5G Core SNMP agent
+Answers SNMPv1 and SNMPv2c GET, GETNEXT and GETBULK requests straight from
+the agent's MIB tree. Requests are decoded and responses encoded with a
+small BER codec covering the subset of SNMP the agent serves, instead of
+going through the pysnmp engine, and the datagrams are received and sent
+by an asyncio datagram endpoint.
+
+Several worker processes can serve the same address: each one binds its
+own socket with SO_REUSEPORT and the kernel spreads the clients across
+them.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import signal
+import socket
+import sys
+from functools import lru_cache
+
+from pyasn1.codec.ber import encoder
+from pysnmp.proto.api import v2c
+
+SNMP_V1 = 0
+SNMP_V2C = 1
+
+GET = 0xa0
+GETNEXT = 0xa1
+RESPONSE = 0xa2
+SET = 0xa3
+GETBULK = 0xa5
+
+# Error statuses
+NO_ERROR = 0
+TOO_BIG = 1
+NO_SUCH_NAME = 2
+GEN_ERR = 5
+NOT_WRITABLE = 17
+
+END_OF_MIB_VIEW = b'\x82\x00'
+NULL = b'\x05\x00'
+
+# Largest UDP payload, as for the pysnmp engine
+MAX_MESSAGE_SIZE = 65507
+
+
+class DecodeError(Exception):
+    """A datagram that is not an SNMP message the agent can answer"""
+
+
+def encode_length(length):
+    if length < 0x80:
+        return bytes((length,))
+    data = length.to_bytes((length.bit_length() + 7) // 8, 'big')
+    return bytes((0x80 | len(data),)) + data
+
+
+def tlv(tag, content):
+    return bytes((tag,)) + encode_length(len(content)) + content
+
+
+def encode_integer(tag, value):
+    return tlv(tag, value.to_bytes(value.bit_length() // 8 + 1, 'big', signed=True))
+
+
+def encode_unsigned(tag, value):
+    # One extra bit keeps values with the high bit set positive
+    return tlv(tag, value.to_bytes((value.bit_length() + 8) // 8, 'big'))
+
+
+@lru_cache(maxsize=65536)
+def encode_oid(oid):
+    """Return the BER encoding of an OID tuple"""
+    if len(oid) < 2:
+        oid = tuple(oid) + (0,) * (2 - len(oid))
+    content = bytearray()
+    for arc in (oid[0] * 40 + oid[1],) + oid[2:]:
+        chunk = [arc & 0x7f]
+        arc >>= 7
+        while arc:
+            chunk.append(0x80 | (arc & 0x7f))
+            arc >>= 7
+        content.extend(reversed(chunk))
+    return tlv(0x06, bytes(content))
+
+
+@lru_cache(maxsize=65536)
+def decode_oid(content):
+    """Return the OID tuple of the contents of a BER object identifier"""
+    arcs = []
+    arc = 0
+    for byte in content:
+        arc = (arc << 7) | (byte & 0x7f)
+        if not byte & 0x80:
+            arcs.append(arc)
+            arc = 0
+    if not arcs or content[-1] & 0x80:
+        raise DecodeError("malformed OID")
+    first = min(arcs[0] // 40, 2)
+    return (first, arcs[0] - first * 40) + tuple(arcs[1:])
+
+
+def _value_encoder(value):
+    tag = value.tagSet[0]
+    tag = tag.tagClass | tag.tagFormat | tag.tagId
+    if isinstance(value, v2c.ObjectIdentifier):
+        return lambda value: encode_oid(tuple(value))
+    if isinstance(value, (v2c.Gauge32, v2c.Counter32, v2c.TimeTicks, v2c.Counter64, v2c.Unsigned32)):
+        return lambda value, tag=tag: encode_unsigned(tag, int(value))
+    if isinstance(value, v2c.Integer):
+        return lambda value, tag=tag: encode_integer(tag, int(value))
+    if isinstance(value, (v2c.OctetString, v2c.IpAddress, v2c.Opaque)):
+        return lambda value, tag=tag: tlv(tag, value.asOctets())
+    if isinstance(value, (v2c.NoSuchObject, v2c.NoSuchInstance, v2c.EndOfMibView)):
+        return lambda value, data=bytes((tag, 0)): data
+    return encoder.encode
+
+
+_value_encoders = {}
+
+
+def encode_value(value):
+    """Return the BER encoding of a pysnmp value"""
+    encode = _value_encoders.get(type(value))
+    if encode is None:
+        encode = _value_encoders[type(value)] = _value_encoder(value)
+    return encode(value)
+
+
+def read_tlv(data, position, expected=None):
+    """Return (tag, start, end) of the contents of the BER element at position"""
+    try:
+        tag = data[position]
+        length = data[position + 1]
+        position += 2
+        if length & 0x80:
+            size = length & 0x7f
+            length = int.from_bytes(data[position:position + size], 'big')
+            position += size
+    except IndexError:
+        raise DecodeError("truncated element")
+    if expected is not None and tag != expected:
+        raise DecodeError(f"unexpected tag {tag:#x}")
+    if position + length > len(data):
+        raise DecodeError("truncated element")
+    return tag, position, position + length
+
+
+def read_integer(data, position):
+    _, start, end = read_tlv(data, position, 0x02)
+    return int.from_bytes(data[start:end], 'big', signed=True), end
+
+
+class Request:
+    """A decoded SNMP request
+
+    key identifies the request apart from its request-id, so identical
+    requests share a cached response.
+    """
+
+    __slots__ = ('version', 'community', 'pdu_type', 'request_id', 'error_status', 'error_index', 'oids', 'key')
+
+    @classmethod
+    def decode(cls, data):
+        request = cls()
+        _, position, end = read_tlv(data, 0, 0x30)
+        request.version, position = read_integer(data, position)
+        _, start, position = read_tlv(data, position, 0x04)
+        request.community = bytes(data[start:position])
+        request.pdu_type, position, end = read_tlv(data, position)
+        request.request_id, position = read_integer(data, position)
+        request.key = (request.version, request.community, request.pdu_type, bytes(data[position:end]))
+        request.error_status, position = read_integer(data, position)
+        request.error_index, position = read_integer(data, position)
+        _, position, end = read_tlv(data, position, 0x30)
+        oids = []
+        while position < end:
+            _, start, position = read_tlv(data, position, 0x30)
+            _, start, oid_end = read_tlv(data, start, 0x06)
+            oids.append(decode_oid(bytes(data[start:oid_end])))
+        request.oids = oids
+        return request
+
+
+def encode_body(status, index, varbinds):
+    """Return the part of a response PDU after the request-id"""
+    return encode_integer(0x02, status) + encode_integer(0x02, index) + tlv(0x30, b''.join(varbinds))
+
+
+def encode_response(request, body):
+    """Return the encoded response to a request, given the PDU body from encode_body()"""
+    pdu = encode_integer(0x02, request.request_id) + body
+    return tlv(0x30, encode_integer(0x02, request.version) + tlv(0x04, request.community) + tlv(RESPONSE, pdu))
+
+
+def varbind(oid, value):
+    return tlv(0x30, encode_oid(oid) + value)
+
+
+class SnmpResponder:
+    """Answers SNMP requests from a MibTree
+
+    Only requests carrying the read community are answered; others are
+    dropped, as the pysnmp engine does. With a metrics snapshot, every
+    variable binding of one request is read from the same generation.
+
+    The values only change when the collectors publish a new snapshot
+    generation or the tree changes, so for each (generation, tree version)
+    the responder caches the encoded variable binding of every instance it
+    read, the instance following every served instance a GETNEXT or GETBULK
+    stepped from, and the encoded body of up to cache_size responses. A repeated request is then a
+    dictionary lookup plus the encoding of its request-id. Objects under the
+    uncached OID prefixes, whose values change on every read, are never
+    cached. A cache_size of 0 disables caching.
+    """
+
+    def __init__(self, tree, community='public', snapshot=None, max_size=MAX_MESSAGE_SIZE, cache_size=1024,
+                 uncached=()):
+        self.tree = tree
+        self.community = community.encode()
+        self.snapshot = snapshot
+        self.max_size = max_size
+        self.cache_size = cache_size
+        self.uncached = tuple(tuple(prefix) for prefix in uncached)
+        self.stats = {'requests': 0, 'bad_community': 0, 'parse_errors': 0, 'cache_hits': 0, 'cache_misses': 0}
+        self._generation = None
+        self._responses = {}
+        self._varbinds = {}
+        self._next = {}
+        self._cacheable = True
+
+    def respond(self, data):
+        """Return the response datagram to a request datagram, or None to drop it"""
+        try:
+            request = Request.decode(data)
+        except DecodeError:
+            self.stats['parse_errors'] += 1
+            return None
+        if request.version not in (SNMP_V1, SNMP_V2C) or request.pdu_type not in (GET, GETNEXT, SET, GETBULK):
+            self.stats['parse_errors'] += 1
+            return None
+        if request.community != self.community:
+            self.stats['bad_community'] += 1
+            return None
+        self.stats['requests'] += 1
+        if self.snapshot is None:
+            return self.answer(request)
+        # Read the generation before the values: values newer than their key are replaced on the next lookup
+        generation = (self.snapshot.generation, self.tree.version)
+        if generation != self._generation:
+            self._generation = generation
+            self._responses, self._varbinds, self._next = {}, {}, {}
+        body = self._responses.get(request.key)
+        if body is not None:
+            self.stats['cache_hits'] += 1
+            return self._response(request, body)
+        self.stats['cache_misses'] += 1
+        with self.snapshot.pinned():
+            self._cacheable = True
+            body = self._answer_body(request)
+        if self._cacheable and len(self._responses) < self.cache_size:
+            self._responses[request.key] = body
+        return self._response(request, body)
+
+    def answer(self, request):
+        """Return the encoded response to a decoded request"""
+        return self._response(request, self._answer_body(request))
+
+    def _response(self, request, body):
+        response = encode_response(request, body)
+        if len(response) > self.max_size:
+            return encode_response(request, encode_body(TOO_BIG, 0, []))
+        return response
+
+    def _answer_body(self, request):
+        if request.pdu_type == GET:
+            status, index, varbinds = self._get(request)
+        elif request.pdu_type == GETNEXT:
+            status, index, varbinds = self._get_next(request)
+        elif request.pdu_type == GETBULK and request.version == SNMP_V2C:
+            status, index, varbinds = self._get_bulk(request)
+        elif request.pdu_type == SET:
+            # Every object is read-only
+            status = NO_SUCH_NAME if request.version == SNMP_V1 else NOT_WRITABLE
+            index, varbinds = 1, None
+        else:
+            # GETBULK is not part of SNMPv1
+            status, index, varbinds = GEN_ERR, 0, None
+        if varbinds is None:
+            varbinds = [varbind(oid, NULL) for oid in request.oids]
+        return encode_body(status, index, varbinds)
+
+    def _is_cacheable(self, oid):
+        """Return True if the value of an instance can be cached for the generation"""
+        if self.snapshot is None or not self.cache_size:
+            return False
+        for prefix in self.uncached:
+            if oid[:len(prefix)] == prefix:
+                # Nor can a response containing it
+                self._cacheable = False
+                return False
+        return True
+
+    def _get_varbind(self, oid):
+        """Return the encoded variable binding of an instance, or None if it is not served"""
+        binding = self._varbinds.get(oid)
+        if binding is None:
+            value = self.tree.get(oid)
+            if value is None:
+                return None
+            binding = varbind(oid, encode_value(value))
+            if self._is_cacheable(oid):
+                self._varbinds[oid] = binding
+        return binding
+
+    def _next_varbind(self, oid):
+        """Return (oid, encoded variable binding) of the instance after oid, or None at the end of the MIB"""
+        found = self._next.get(oid)
+        if found is None:
+            found = self.tree.next(oid)
+            if found is None:
+                return None
+            found = (found[0], varbind(found[0], encode_value(found[1])))
+            if self._is_cacheable(found[0]):
+                self._varbinds[found[0]] = found[1]
+                # Key only served instances, so the cache is bounded by the tree rather than by the OIDs clients send
+                if oid in self._varbinds:
+                    self._next[oid] = found
+        return found
+
+    def _get(self, request):
+        varbinds = []
+        for position, oid in enumerate(request.oids):
+            binding = self._get_varbind(oid)
+            if binding is None:
+                if request.version == SNMP_V1:
+                    return NO_SUCH_NAME, position + 1, None
+                value = v2c.NoSuchInstance() if self.tree.is_object(oid) else v2c.NoSuchObject()
+                binding = varbind(oid, encode_value(value))
+            varbinds.append(binding)
+        return NO_ERROR, 0, varbinds
+
+    def _get_next(self, request):
+        varbinds = []
+        for position, oid in enumerate(request.oids):
+            found = self._next_varbind(oid)
+            if found is None:
+                if request.version == SNMP_V1:
+                    return NO_SUCH_NAME, position + 1, None
+                varbinds.append(varbind(oid, END_OF_MIB_VIEW))
+            else:
+                varbinds.append(found[1])
+        return NO_ERROR, 0, varbinds
+
+    def _get_bulk(self, request):
+        oids = request.oids
+        non_repeaters = min(max(request.error_status, 0), len(oids))
+        repetitions = max(request.error_index, 0)
+        varbinds = []
+        for oid in oids[:non_repeaters]:
+            found = self._next_varbind(oid)
+            varbinds.append(varbind(oid, END_OF_MIB_VIEW) if found is None else found[1])
+        # Room left for variable bindings once the response header is encoded; the lengths of the message,
+        # the PDU and the variable binding list may each grow to as many bytes as max_size takes to encode
+        header = len(encode_response(request, encode_body(NO_ERROR, 0, [])))
+        room = self.max_size - header - 3 * (len(encode_length(self.max_size)) - 1)
+        size = sum(map(len, varbinds))
+        if size > room:
+            return TOO_BIG, 0, []
+        names = list(oids[non_repeaters:])
+        ended = [False] * len(names)
+        for _ in range(repetitions if names else 0):
+            for column, oid in enumerate(names):
+                found = None if ended[column] else self._next_varbind(oid)
+                if found is None:
+                    # The column stays at endOfMibView for the remaining repetitions
+                    binding = varbind(oid, END_OF_MIB_VIEW)
+                    ended[column] = True
+                else:
+                    names[column], binding = found
+                size += len(binding)
+                if size > room:
+                    # Truncated to what fits, as RFC 3416 allows
+                    return NO_ERROR, 0, varbinds
+                varbinds.append(binding)
+            if all(ended):
+                break
+        return NO_ERROR, 0, varbinds
+
+
+class SnmpProtocol(asyncio.DatagramProtocol):
+    """Datagram endpoint answering every request as it is received"""
+
+    def __init__(self, responder):
+        self.responder = responder
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, address):
+        try:
+            response = self.responder.respond(data)
+        except Exception as e:
+            print(f"Error answering SNMP request from {address[0]}: {e}")
+            return
+        if response is not None:
+            self.transport.sendto(response, address)
+
+
+async def serve(responder, host, port, reuse_port=False, started=None):
+    """Serve SNMP requests on host:port until cancelled"""
+    loop = asyncio.get_running_loop()
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    transport, _ = await loop.create_datagram_endpoint(lambda: SnmpProtocol(responder), local_addr=(host, port),
+                                                       family=family, reuse_port=reuse_port or None)
+    if started is not None:
+        started(transport.get_extra_info('sockname'))
+    try:
+        await asyncio.Future()
+    finally:
+        transport.close()
+
+
+def run_workers(target, workers, started=None):
+    """Run target(index) in several worker processes until interrupted
+
+    Workers are forked, so each one starts from the caller's state and
+    runs its own threads. started() is called in the caller once they are
+    running, to start the caller's own threads, which must not be running
+    when the workers are forked.
+    """
+    context = multiprocessing.get_context('fork')
+    processes = [context.Process(target=target, args=(index,), daemon=True) for index in range(workers)]
+    for process in processes:
+        process.start()
+    if started is not None:
+        started()
+    # Stop the workers with the parent when it is terminated
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        for process in processes:
+            process.join()
+    finally:
+        for process in processes:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+                process.join()
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+
+"""
+Threshold notifications for the 5G Core SNMP agent
+Threshold rules with hysteresis are evaluated on every metrics snapshot
+the collectors publish. A rule crossing its threshold sends a rising
+notification and, once the metric is back past its clear level, a cleared
+notification, as SNMPv2c traps or informs to the configured receivers.
+
+Informs are retried with exponential backoff until the receiver
+acknowledges them. A token bucket limits the notifications sent per
+second and the informs awaiting acknowledgement are capped, so a storm of
+threshold crossings is dropped (and counted) instead of flooding the
+agent or the receivers. Cleared notifications are never dropped, as each
+follows a rising one that was sent, and a dropped rising notification
+leaves its rule clear, so the crossing is notified again with the next
+snapshot still past the threshold.
+
+Run this module to start a local trap receiver for testing:
+
+    python snmp_traps.py --port 1162
+"""
+
+import argparse
+import asyncio
+import itertools
+import socket
+import threading
+import time
+
+from pyasn1.codec.ber import decoder, encoder
+from pysnmp.proto.api import v2c
+
+from snmp_mib import gauge
+from snmp_transport import (DecodeError, Request, RESPONSE, SNMP_V2C, encode_integer, encode_oid, encode_value,
+                            tlv, varbind)
+
+BASE_OID = (1, 3, 6, 1, 4, 1, 55555)
+
+SYS_UP_TIME_OID = (1, 3, 6, 1, 2, 1, 1, 3, 0)
+SNMP_TRAP_OID = (1, 3, 6, 1, 6, 3, 1, 1, 4, 1, 0)
+
+# Notifications and their objects under BASE_OID + (4,)
+THRESHOLD_RISING_OID = BASE_OID + (4, 0, 1)
+THRESHOLD_CLEARED_OID = BASE_OID + (4, 0, 2)
+RULE_NAME_OID = BASE_OID + (4, 1, 1, 0)
+RULE_THRESHOLD_OID = BASE_OID + (4, 1, 2, 0)
+# Anomalies detected by the poller (snmp_anomaly) and their objects
+ANOMALY_OID = BASE_OID + (4, 0, 3)
+ANOMALY_CLEARED_OID = BASE_OID + (4, 0, 4)
+ANOMALY_SERIES_OID = BASE_OID + (4, 1, 3, 0)
+ANOMALY_SCORE_OID = BASE_OID + (4, 1, 4, 0)
+ANOMALY_VALUE_OID = BASE_OID + (4, 1, 5, 0)
+ANOMALY_EXPECTED_OID = BASE_OID + (4, 1, 6, 0)
+
+TRAP = 0xa7
+INFORM = 0xa6
+
+
+class ThresholdRule:
+    """A threshold with hysteresis on one metric
+
+    With direction "above" the rule rises when the metric reaches threshold
+    and clears when it falls back to clear or below; with "below" the other
+    way round. Between the two levels the rule keeps its state, so a metric
+    hovering around the threshold does not flap.
+    """
+
+    def __init__(self, name, metric, threshold, clear, direction="above"):
+        if direction not in ("above", "below"):
+            raise ValueError(f"Unknown threshold direction: {direction}")
+        if (clear > threshold) if direction == "above" else (clear < threshold):
+            raise ValueError(f"Clear level of rule {name} is past its threshold")
+        self.name = name
+        self.metric = metric
+        self.threshold = threshold
+        self.clear = clear
+        self.direction = direction
+        self.active = False
+
+    def evaluate(self, value):
+        """Return "rising" or "cleared" when value changes the rule's state, None otherwise"""
+        if self.direction == "above":
+            crossed, cleared = value >= self.threshold, value <= self.clear
+        else:
+            crossed, cleared = value <= self.threshold, value >= self.clear
+        if not self.active and crossed:
+            self.active = True
+            return "rising"
+        if self.active and cleared:
+            self.active = False
+            return "cleared"
+        return None
+
+
+def parse_receivers(text):
+    """Parse "trap:host:port,inform:host:port" into [(kind, (host, port))]"""
+    receivers = []
+    for item in filter(None, (item.strip() for item in text.split(','))):
+        kind, host, port = item.rsplit(':', 2)
+        if kind not in ("trap", "inform"):
+            raise ValueError(f"Unknown notification type: {kind}")
+        receivers.append((kind, (host, int(port))))
+    return receivers
+
+
+def encode_notification(pdu_type, community, request_id, varbinds):
+    """Return an SNMPv2c trap or inform message with encoded variable bindings"""
+    pdu = (encode_integer(0x02, request_id) + encode_integer(0x02, 0) + encode_integer(0x02, 0) +
+           tlv(0x30, b''.join(varbinds)))
+    return tlv(0x30, encode_integer(0x02, SNMP_V2C) + tlv(0x04, community) + tlv(pdu_type, pdu))
+
+
+class TokenBucket:
+    """Allows rate events per second with bursts of up to burst events; take() can be called from any thread"""
+
+    def __init__(self, rate, burst, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.clock = clock
+        self.tokens = burst
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def take(self):
+        with self._lock:
+            now = self.clock()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class NotificationSender:
+    """Sends traps and informs from an asyncio loop on its own thread
+
+    notify() can be called from any thread. Informs are resent after
+    timeout, 2 * timeout, 4 * timeout... seconds, up to retries times.
+    """
+
+    def __init__(self, receivers, community='public', rate=10, burst=20, max_pending=100, timeout=1.0, retries=3):
+        self.receivers = receivers
+        self.community = community.encode()
+        self.bucket = TokenBucket(rate, burst)
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.retries = retries
+        self.stats = {'traps_sent': 0, 'informs_sent': 0, 'informs_acknowledged': 0, 'informs_failed': 0,
+                      'retries': 0, 'rate_limited': 0}
+        self.started = time.monotonic()
+        self._request_ids = itertools.count(1)
+        self._pending = {}
+        self._loop = None
+        self._transport = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    def start(self):
+        """Run the sender loop on a daemon thread"""
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def stop(self):
+        """Stop the sender loop, giving up on informs still awaiting acknowledgement"""
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        sender = self
+
+        class Protocol(asyncio.DatagramProtocol):
+            def datagram_received(self, data, address):
+                sender._acknowledged(data)
+
+        self._transport, _ = self._loop.run_until_complete(
+            self._loop.create_datagram_endpoint(Protocol, family=socket.AF_INET, local_addr=('0.0.0.0', 0)))
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            tasks = asyncio.all_tasks(self._loop)
+            for task in tasks:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            self._transport.close()
+            self._loop.close()
+
+    def uptime(self):
+        """Return the agent's uptime in hundredths of a second"""
+        return int((time.monotonic() - self.started) * 100) % 2 ** 32
+
+    def notify(self, notification_oid, varbinds, limited=True):
+        """Send a notification with extra (oid, value) variable bindings to every receiver
+
+        Returns False if it was not sent. With limited false, the rate limit
+        and the cap on pending informs do not apply, for notifications that
+        clear one that was sent.
+        """
+        if not self.receivers:
+            return False
+        if limited and not self.bucket.take():
+            self.stats['rate_limited'] += 1
+            return False
+        bindings = [varbind(SYS_UP_TIME_OID, encode_value(v2c.TimeTicks(self.uptime()))),
+                    varbind(SNMP_TRAP_OID, encode_oid(notification_oid))]
+        bindings.extend(varbind(oid, encode_value(value)) for oid, value in varbinds)
+        self._loop.call_soon_threadsafe(self._send, bindings, limited)
+        return True
+
+    def _send(self, bindings, limited=True):
+        for kind, address in self.receivers:
+            request_id = next(self._request_ids) & 0x7fffffff
+            if kind == "trap":
+                self._transport.sendto(encode_notification(TRAP, self.community, request_id, bindings), address)
+                self.stats['traps_sent'] += 1
+            elif limited and len(self._pending) >= self.max_pending:
+                self.stats['rate_limited'] += 1
+            else:
+                message = encode_notification(INFORM, self.community, request_id, bindings)
+                self._pending[request_id] = self._loop.create_future()
+                self._loop.create_task(self._inform(request_id, message, address))
+
+    async def _inform(self, request_id, message, address):
+        acknowledged = self._pending[request_id]
+        timeout = self.timeout
+        try:
+            for attempt in range(self.retries + 1):
+                if attempt:
+                    self.stats['retries'] += 1
+                self._transport.sendto(message, address)
+                self.stats['informs_sent'] += 1
+                try:
+                    await asyncio.wait_for(asyncio.shield(acknowledged), timeout)
+                    self.stats['informs_acknowledged'] += 1
+                    return
+                except asyncio.TimeoutError:
+                    timeout *= 2
+            self.stats['informs_failed'] += 1
+            print(f"SNMP inform to {address[0]}:{address[1]} not acknowledged after {self.retries} retries")
+        finally:
+            del self._pending[request_id]
+
+    def _acknowledged(self, data):
+        try:
+            response = Request.decode(data)
+        except DecodeError:
+            return
+        acknowledged = self._pending.get(response.request_id)
+        if response.pdu_type == RESPONSE and acknowledged is not None and not acknowledged.done():
+            acknowledged.set_result(True)
+
+
+class ThresholdMonitor:
+    """Evaluates threshold rules on every published metrics snapshot
+
+    objects maps metric names to (OID, scale), as METRIC_OBJECTS in the
+    agent, to name the metric instance and encode its value and threshold.
+    """
+
+    def __init__(self, rules, sender, objects):
+        self.rules = rules
+        self.sender = sender
+        self.objects = objects
+
+    def attach(self, snapshot):
+        snapshot.add_listener(self.evaluate)
+
+    def evaluate(self, values, generation=None):
+        for rule in self.rules:
+            if rule.metric not in values:
+                continue
+            change = rule.evaluate(values[rule.metric])
+            if change is None:
+                continue
+            oid, scale = self.objects[rule.metric]
+            rising = change == "rising"
+            sent = self.sender.notify(THRESHOLD_RISING_OID if rising else THRESHOLD_CLEARED_OID, [
+                (oid + (0,), gauge(values[rule.metric], scale)),
+                (RULE_NAME_OID, v2c.OctetString(rule.name)),
+                (RULE_THRESHOLD_OID, gauge(rule.threshold if rising else rule.clear, scale))
+            ], limited=rising)
+            if rising and not sent:
+                # Receivers never heard of the crossing: report it again with the next snapshot
+                rule.active = False
+
+
+class TrapReceiver(asyncio.DatagramProtocol):
+    """Prints the SNMPv2c traps and informs it receives and acknowledges informs"""
+
+    def __init__(self, received=None):
+        self.received = received
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, address):
+        try:
+            message, _ = decoder.decode(data, asn1Spec=v2c.Message())
+        except Exception as e:
+            print(f"Undecodable notification from {address[0]}: {e}")
+            return
+        pdu = v2c.apiMessage.getPDU(message)
+        varbinds = [(tuple(oid), value) for oid, value in v2c.apiPDU.getVarBinds(pdu)]
+        kind = "inform" if pdu.isSameTypeWith(v2c.InformRequestPDU()) else "trap"
+        if kind == "inform":
+            response = v2c.apiPDU.getResponse(pdu)
+            v2c.apiPDU.setVarBinds(response, v2c.apiPDU.getVarBinds(pdu))
+            v2c.apiMessage.setPDU(message, response)
+            self.transport.sendto(encoder.encode(message), address)
+        print(f"{kind} from {address[0]}:{address[1]}")
+        for oid, value in varbinds:
+            print(f"  {'.'.join(map(str, oid))} = {value.prettyPrint()}")
+        if self.received is not None:
+            self.received(kind, varbinds)
+
+
+async def receive(host, port, received=None, started=None):
+    """Run a trap receiver on host:port until cancelled"""
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(lambda: TrapReceiver(received), local_addr=(host, port))
+    if started is not None:
+        started(transport.get_extra_info('sockname'))
+    try:
+        await asyncio.Future()
+    finally:
+        transport.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local SNMPv2c trap and inform receiver")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=1162)
+    args = parser.parse_args()
+    print(f"Receiving SNMP notifications on {args.host}:{args.port}")
+    try:
+        asyncio.run(receive(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
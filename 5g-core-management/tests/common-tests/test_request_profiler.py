@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+
+"""
+Request Profiler Tests
+"""
+
+import unittest
+from unittest import mock
+import sys
+import os
+import tempfile
+
+# Add the common directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'management-plane', 'common'))
+
+from flask import Flask
+from request_profiler import RequestProfiler, install_request_profiler, profiler_from_env
+
+class TestRequestProfiler(unittest.TestCase):
+
+    def test_profiler_off_by_default(self):
+        """Test that nothing is installed when profiling is not enabled"""
+        self.assertIsNone(profiler_from_env({}))
+        app = Flask(__name__)
+        with mock.patch.dict(os.environ):
+            os.environ.pop('MGMT_PROFILE', None)
+            self.assertIsNone(install_request_profiler(app))
+        self.assertEqual(app.before_request_funcs, {})
+
+    def test_header_request_writes_folded_stacks(self):
+        """Test that a request carrying the profile header is dumped as folded stacks"""
+        with tempfile.TemporaryDirectory() as output_dir:
+            app = Flask(__name__)
+            profiler = RequestProfiler(mode='header', output_dir=output_dir, interval=0.0005)
+            install_request_profiler(app, profiler)
+
+            @app.route('/slow')
+            def slow():
+                total = 0
+                for i in range(300000):
+                    total += i
+                return str(total)
+
+            client = app.test_client()
+            client.get('/slow')
+            client.get('/slow', headers={'X-Profile': '1'})
+            profiler.flush()
+
+            with open(os.path.join(output_dir, 'slow.folded')) as f:
+                lines = f.read().splitlines()
+            self.assertTrue(lines)
+            self.assertTrue(any('slow' in line.rsplit(' ', 1)[0] for line in lines))
+
+    def test_one_cprofile_at_a_time(self):
+        """Test that cProfile mode skips requests overlapping a profiled one and writes pstats"""
+        with tempfile.TemporaryDirectory() as output_dir:
+            profiler = RequestProfiler(profiler='cprofile', output_dir=output_dir)
+            first = profiler.begin('get_amf')
+            self.assertIsNone(profiler.begin('get_smf'))
+            sum(range(10000))
+            profiler.end(first)
+            second = profiler.begin('get_amf')
+            profiler.end(second)
+            profiler.flush()
+            self.assertEqual(profiler.skipped, 1)
+            self.assertEqual(os.listdir(output_dir), ['get_amf.pstats'])
+
+    def test_sampling_one_in_n(self):
+        """Test that 'on' mode profiles one in every N requests and named routes"""
+        profiler = RequestProfiler(sample_rate=3, routes=['get_amf'])
+        picked = [profiler.should_profile('get_all_data', '/restconf/data', {}) for _ in range(6)]
+        self.assertEqual(picked.count(True), 2)
+        self.assertTrue(profiler.should_profile('get_amf', None, {}))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -29,5 +29,22 @@ class TestNETCONFServer(unittest.TestCase):
         self.assertTrue(len(netconf_server.network_data["network-functions"]["upf"]) > 0)
         self.assertTrue(len(netconf_server.network_data["subscribers"]["subscriber"]) > 0)
 
+    def test_create_amf_requires_id(self):
+        """Test that creating an AMF without an id is a client error, not a server error"""
+        import netconf_server
+        client = netconf_server.app.test_client()
+        self.assertEqual(client.post('/restconf/data/network-functions/amf', json={'name': 'AMF-2'}).status_code, 400)
+        self.assertEqual(client.post('/restconf/data/network-functions/amf', json=['amf-002']).status_code, 400)
+
+    def test_amf_leaf_names_are_validated(self):
+        """Test that AMF writes with keys that are not XML element names are rejected"""
+        import netconf_server
+        client = netconf_server.app.test_client()
+        for body in ({'id': 'amf-009', 'a b': 1}, {'id': 'amf-009', 'guami': {'x<y': 1}}, {'id': 'amf-009', '1st': 1}):
+            self.assertEqual(client.post('/restconf/data/network-functions/amf', json=body).status_code, 400)
+            self.assertEqual(client.put('/restconf/data/network-functions/amf/amf-001', json=body).status_code, 400)
+        self.assertIsNone(netconf_server.datastore.get(netconf_server.AMF_PATH, 'amf-009'))
+        self.assertEqual(client.put('/restconf/data/network-functions/amf/amf-001', json=['x']).status_code, 400)
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
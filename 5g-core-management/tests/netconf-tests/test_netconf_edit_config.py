@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+"""
+NETCONF edit-config Tests
+"""
+
+import unittest
+import copy
+import io
+import sys
+import time
+import os
+
+# Add the netconf-server directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'management-plane', 'netconf-server'))
+
+import netconf_server
+from datastore import LIST_KEYS, Datastore
+from netconf_edit import EditConfigError, apply_config, config_events
+
+NC = 'xmlns:nc="urn:ietf:params:xml:ns:netconf:base:1.0"'
+SUBSCRIBERS = ('subscribers', 'subscriber')
+
+def config(body):
+    return f'<config {NC}>{body}</config>'
+
+class TestEditConfig(unittest.TestCase):
+
+    def setUp(self):
+        self.datastore = Datastore(copy.deepcopy(netconf_server.network_data))
+
+    def apply(self, body, default_operation='merge'):
+        return apply_config(self.datastore, config_events(config(body)), default_operation)
+
+    def test_merge_updates_and_creates_by_key(self):
+        """Test that merge updates existing entries in place and creates new ones"""
+        self.apply('<network-functions><amf><id>amf-001</id><capacity>80</capacity></amf>'
+                   '<amf><id>amf-002</id><status>active</status></amf></network-functions>')
+        amf = self.datastore.get(('network-functions', 'amf'), 'amf-001')
+        self.assertEqual(amf['capacity'], 80)
+        self.assertEqual(amf['mcc'], '001')
+        self.assertIsNotNone(self.datastore.get(('network-functions', 'amf'), 'amf-002'))
+
+    def test_replace_create_delete_remove(self):
+        """Test the replace, create, delete and remove operations"""
+        self.apply('<subscribers><subscriber nc:operation="replace"><imsi>001010000000001</imsi>'
+                   '<status>inactive</status><ambr><uplink>1</uplink></ambr></subscriber></subscribers>')
+        self.assertEqual(self.datastore.get(SUBSCRIBERS, '001010000000001'),
+                         {'imsi': '001010000000001', 'status': 'inactive', 'ambr': {'uplink': '1'}})
+
+        self.apply('<subscribers><subscriber nc:operation="create"><imsi>2</imsi><qci>7</qci></subscriber></subscribers>')
+        self.assertEqual(self.datastore.get(SUBSCRIBERS, '2')['qci'], 7)
+        with self.assertRaises(EditConfigError) as raised:
+            self.apply('<subscribers><subscriber nc:operation="create"><imsi>2</imsi></subscriber></subscribers>')
+        self.assertEqual(raised.exception.tag, 'data-exists')
+
+        self.apply('<subscribers><subscriber nc:operation="delete"><imsi>2</imsi></subscriber></subscribers>')
+        self.assertIsNone(self.datastore.get(SUBSCRIBERS, '2'))
+        with self.assertRaises(EditConfigError) as raised:
+            self.apply('<subscribers><subscriber nc:operation="delete"><imsi>2</imsi></subscriber></subscribers>')
+        self.assertEqual(raised.exception.tag, 'data-missing')
+        self.apply('<subscribers><subscriber nc:operation="remove"><imsi>2</imsi></subscriber></subscribers>')
+
+    def test_delete_keeps_key_index_consistent(self):
+        """Test that removing an entry keeps keyed lookups of the others correct"""
+        body = ''.join(f'<subscriber><imsi>{i}</imsi></subscriber>' for i in range(10))
+        self.apply(f'<subscribers>{body}</subscribers>')
+        self.apply('<subscribers><subscriber nc:operation="delete"><imsi>3</imsi></subscriber></subscribers>')
+        self.assertEqual([entry['imsi'] for entry in self.datastore.entries(SUBSCRIBERS)][-9:],
+                         [str(i) for i in range(10) if i != 3])
+        for i in range(10):
+            entry = self.datastore.get(SUBSCRIBERS, str(i))
+            if i == 3:
+                self.assertIsNone(entry)
+            else:
+                self.assertEqual(entry['imsi'], str(i))
+
+    def test_bulk_removals(self):
+        """Test that runs of removals mixed with other operations keep the list order and key index"""
+        body = ''.join(f'<subscriber><imsi>{i}</imsi></subscriber>' for i in range(20000))
+        self.apply(f'<subscribers>{body}</subscribers>')
+        remove = lambda i, operation='remove': f'<subscriber nc:operation="{operation}"><imsi>{i}</imsi></subscriber>'
+        started = time.perf_counter()
+        self.apply('<subscribers>' + ''.join(remove(i, 'delete') for i in range(0, 10000)) + remove(10) +
+                   '<subscriber nc:operation="create"><imsi>5</imsi></subscriber>' + remove(10000) + remove(19999) +
+                   '</subscribers>')
+        self.assertLess(time.perf_counter() - started, 5)
+        expected = ['001010000000001'] + [str(i) for i in range(10001, 19999)] + ['5']
+        self.assertEqual([entry['imsi'] for entry in self.datastore.entries(SUBSCRIBERS)], expected)
+        self.assertEqual([self.datastore.get(SUBSCRIBERS, imsi)['imsi'] for imsi in expected], expected)
+        self.assertEqual(len(self.datastore), sum(len(self.datastore.entries(path)) for path in LIST_KEYS))
+
+        # A failing delete still applies the removals queued before it
+        with self.assertRaises(EditConfigError) as raised:
+            self.apply('<subscribers>' + remove(10001, 'delete') + remove(10001, 'delete') + '</subscribers>')
+        self.assertEqual(raised.exception.tag, 'data-missing')
+        self.assertIsNone(self.datastore.get(SUBSCRIBERS, '10001'))
+        self.assertEqual(self.datastore.get(SUBSCRIBERS, '10002')['imsi'], '10002')
+
+    def test_nested_delete(self):
+        """Test that delete on a leaf inside a container is applied and rejected inside nested list entries"""
+        self.apply('<subscribers><subscriber><imsi>001010000000001</imsi><ambr>'
+                   '<uplink nc:operation="delete"/><downlink>9</downlink></ambr></subscriber></subscribers>')
+        ambr = self.datastore.get(SUBSCRIBERS, '001010000000001')['ambr']
+        self.assertNotIn('uplink', ambr)
+        self.assertEqual(ambr['downlink'], '9')
+        with self.assertRaises(EditConfigError) as raised:
+            self.apply('<network-functions><smf><id>smf-001</id>'
+                       '<upf nc:operation="delete"><id>upf-001</id></upf></smf></network-functions>')
+        self.assertEqual(raised.exception.tag, 'operation-not-supported')
+
+    def test_streaming_file_applies_every_entry(self):
+        """Test that a large config file is applied entry by entry"""
+        body = ''.join(f'<subscriber><imsi>9{i:014d}</imsi><status>active</status></subscriber>'
+                       for i in range(5000))
+        applied = apply_config(self.datastore, config_events(io.BytesIO(config(f'<subscribers>{body}</subscribers>').encode())))
+        self.assertEqual(applied, 5000)
+        self.assertEqual(len(self.datastore.entries(SUBSCRIBERS)), 5001)
+
+    def test_netconf_edit_config_rejects_unknown_target(self):
+        """Test that only the running datastore can be edited"""
+        self.assertFalse(netconf_server.netconf_edit_config('candidate', config('')))
+
+if __name__ == '__main__':
+    unittest.main()
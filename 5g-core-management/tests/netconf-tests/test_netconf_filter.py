@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+"""
+NETCONF get-config Filter Tests
+"""
+
+import unittest
+import copy
+import sys
+import os
+
+# Add the netconf-server directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'management-plane', 'netconf-server'))
+
+from lxml import etree
+import netconf_server
+from datastore import Datastore
+from netconf_filter import FilterError, parse_filter, select_entries
+
+SUBSCRIBERS = ('subscribers', 'subscriber')
+
+def selected(datastore, filter_xml):
+    selection = parse_filter(etree.fromstring(filter_xml))
+    return {path: entries for path, entries, _ in select_entries(datastore, selection)}
+
+class TestGetConfigFilter(unittest.TestCase):
+
+    def setUp(self):
+        self.datastore = Datastore(copy.deepcopy(netconf_server.network_data))
+        for i in range(100):
+            self.datastore.create(SUBSCRIBERS, {'imsi': str(i), 'status': 'active' if i % 10 else 'inactive',
+                                                'apn': 'internet', 'qci': 9})
+
+    def test_xpath_key_equality(self):
+        """Test an XPath key predicate selecting a single subscriber"""
+        result = selected(self.datastore, '<filter type="xpath" select="/subscribers/subscriber[imsi=\'42\']"/>')
+        self.assertEqual(list(result), [SUBSCRIBERS])
+        self.assertEqual([e['imsi'] for e in result[SUBSCRIBERS]], ['42'])
+
+    def test_xpath_secondary_index_and_projection(self):
+        """Test a leaf predicate answered by a secondary index with a projected field"""
+        result = selected(self.datastore,
+                          '<filter type="xpath" select="/sub:subscribers/sub:subscriber[status=&quot;inactive&quot;]/qci"/>')
+        self.assertEqual(sorted(e['imsi'] for e in result[SUBSCRIBERS]), [str(i) for i in range(0, 100, 10)])
+        self.assertEqual(set(result[SUBSCRIBERS][0]), {'imsi', 'qci'})
+
+    def test_subtree_content_match_and_selection_nodes(self):
+        """Test subtree filtering with content match and selection nodes"""
+        result = selected(self.datastore,
+                          '<filter type="subtree"><network-functions><upf><address>10.0.0.10</address>'
+                          '<status/></upf></network-functions></filter>')
+        self.assertEqual(result, {('network-functions', 'upf'):
+                                  [{'id': 'upf-001', 'status': 'active', 'address': '10.0.0.10'}]})
+
+    def test_secondary_index_follows_writes(self):
+        """Test that secondary indexes are updated by merge and remove"""
+        self.datastore.merge(SUBSCRIBERS, {'imsi': '1', 'status': 'inactive'})
+        self.datastore.remove(SUBSCRIBERS, '10')
+        keys = sorted(self.datastore.lookup(SUBSCRIBERS, 'status', 'inactive'), key=int)
+        self.assertEqual(keys, ['0', '1', '20', '30', '40', '50', '60', '70', '80', '90'])
+
+    def test_missing_leaf_never_matches(self):
+        """Test that a predicate on a leaf an entry lacks does not match it, even with the value 'None'"""
+        self.datastore.create(SUBSCRIBERS, {'imsi': '100', 'status': 'active'})
+        self.assertEqual(self.datastore.select(SUBSCRIBERS, {'msisdn': 'None'}), [])
+        self.assertEqual(self.datastore.select(SUBSCRIBERS, {'qci': 'None'}), [])
+        self.assertNotIn('100', [entry['imsi'] for entry in self.datastore.select(SUBSCRIBERS, {'qci': 9})])
+
+    def test_unsupported_xpath(self):
+        """Test that expressions outside the supported subset are rejected"""
+        with self.assertRaises(FilterError):
+            parse_filter(etree.fromstring('<filter type="xpath" select="//subscriber[qci &gt; 5]"/>'))
+
+if __name__ == '__main__':
+    unittest.main()
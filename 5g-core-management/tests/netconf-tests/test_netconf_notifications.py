@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+"""
+NETCONF Notification Tests
+"""
+
+import unittest
+import asyncio
+import time
+import sys
+import os
+from unittest import mock
+
+# Add the netconf-server directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'management-plane', 'netconf-server'))
+
+import netconf_server
+from netconf_transport import NetconfServer, EOM_DELIMITER
+from netconf_notify import NotificationStream, Subscription, format_time
+
+CLIENT_HELLO = (
+    b'<hello xmlns="urn:ietf:params:xml:ns:netconf:base:1.0"><capabilities>'
+    b'<capability>urn:ietf:params:netconf:base:1.0</capability>'
+    b'</capabilities></hello>'
+)
+
+def rpc(message_id, body):
+    return (f'<rpc message-id="{message_id}" xmlns="urn:ietf:params:xml:ns:netconf:base:1.0">'
+            f'{body}</rpc>').encode() + EOM_DELIMITER
+
+def subscription(body=''):
+    return f'<create-subscription xmlns="urn:ietf:params:xml:ns:netconf:notification:1.0">{body}</create-subscription>'
+
+async def read_eom(reader):
+    data = await asyncio.wait_for(reader.readuntil(EOM_DELIMITER), 5)
+    return data[:-len(EOM_DELIMITER)].decode()
+
+async def open_session(host, port):
+    reader, writer = await asyncio.open_connection(host, port)
+    await read_eom(reader)
+    writer.write(CLIENT_HELLO + EOM_DELIMITER)
+    return reader, writer
+
+class TestNETCONFNotifications(unittest.TestCase):
+
+    def run_with_server(self, client):
+        async def main():
+            server = NetconfServer(netconf_server.netconf_hello_handler, netconf_server.RPC_HANDLERS,
+                                   host='127.0.0.1', port=0, stream_handlers=netconf_server.STREAM_HANDLERS,
+                                   notifications=netconf_server.notifications)
+            host, port = await server.start()
+            try:
+                return await client(host, port)
+            finally:
+                await server.close()
+        return asyncio.run(main())
+
+    def test_nf_changes_are_delivered_to_filtered_subscribers(self):
+        """Test that a write on one session notifies a subscriber on another"""
+        edit = ('<edit-config><target><running/></target><config><network-functions>'
+                '<amf><id>amf-001</id><capacity>75</capacity></amf>'
+                '<upf><id>upf-970</id><status>active</status></upf>'
+                '</network-functions></config></edit-config>')
+        remove = ('<edit-config><target><running/></target><config xmlns:nc="urn:ietf:params:xml:ns:netconf:base:1.0">'
+                  '<network-functions><upf nc:operation="remove"><id>upf-970</id></upf></network-functions>'
+                  '</config></edit-config>')
+        nf_filter = ('<filter type="subtree"><nf-state-change xmlns="urn:5g-core:notifications">'
+                     '<nf-type>upf</nf-type></nf-state-change></filter>')
+
+        async def client(host, port):
+            subscriber, subscriber_writer = await open_session(host, port)
+            subscriber_writer.write(rpc(1, subscription(nf_filter)))
+            ok = await read_eom(subscriber)
+            editor, editor_writer = await open_session(host, port)
+            editor_writer.write(rpc(1, edit) + rpc(2, remove))
+            await read_eom(editor)
+            await read_eom(editor)
+            events = [await read_eom(subscriber), await read_eom(subscriber)]
+            subscriber_writer.close()
+            editor_writer.close()
+            return ok, events
+
+        ok, (created, deleted) = self.run_with_server(client)
+        self.assertIn('<ok/>', ok)
+        self.assertIn('<id>upf-970</id><operation>created</operation><status>active</status>', created)
+        self.assertIn('<eventTime>', created)
+        self.assertIn('<id>upf-970</id><operation>deleted</operation>', deleted)
+
+    def test_replay_from_start_time(self):
+        """Test that startTime replays buffered events followed by replayComplete"""
+        start = format_time(time.time() - 1)
+        netconf_server.datastore.merge(("network-functions", "smf"), {"id": "smf-001", "capacity": 41})
+
+        async def client(host, port):
+            reader, writer = await open_session(host, port)
+            writer.write(rpc(1, subscription(f'<filter><nf-state-change xmlns="urn:5g-core:notifications"><nf-type>smf</nf-type>'
+                                            f'</nf-state-change></filter><startTime>{start}</startTime>')))
+            messages = [await read_eom(reader) for _ in range(3)]
+            writer.close()
+            return messages
+
+        ok, replayed, complete = self.run_with_server(client)
+        self.assertIn('<ok/>', ok)
+        self.assertIn('<id>smf-001</id><operation>updated</operation><status>active</status><capacity>41</capacity>',
+                      replayed)
+        self.assertIn('<replayComplete xmlns="urn:ietf:params:xml:ns:netmod:notification"/>', complete)
+
+    def test_slow_subscriber_policies(self):
+        """Test that slow subscribers lose their oldest events or are disconnected"""
+        for policy in ('drop', 'disconnect'):
+            stream = NotificationStream(queue_limit=2, slow_policy=policy)
+            close = mock.Mock()
+            subscriber = Subscription(stream, lambda: None, close)
+            events = [stream.publish('test', {}, f'<n>{i}</n>') for i in range(3)]
+            for event in events:
+                subscriber.offer(event)
+            if policy == 'drop':
+                self.assertEqual(list(subscriber.queue), [events[1].xml, events[2].xml])
+                self.assertEqual(subscriber.dropped, 1)
+            else:
+                close.assert_called_once()
+                self.assertTrue(subscriber.finished)
+
+    def test_replay_buffer_is_bounded(self):
+        """Test that the replay buffer keeps only the newest events"""
+        stream = NotificationStream(replay_size=4)
+        for i in range(10):
+            stream.publish('test', {}, f'<n>{i}</n>')
+        self.assertEqual([event.seq for event in stream.replay(0)], [7, 8, 9, 10])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+
+"""
+NETCONF get-config Rendering Tests
+"""
+
+import unittest
+import copy
+import sys
+import threading
+import os
+from unittest import mock
+
+# Add the netconf-server directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'management-plane', 'netconf-server'))
+
+from lxml import etree
+import netconf_server
+import netconf_render
+from datastore import Datastore
+from netconf_filter import select_all, select_entries
+from netconf_render import ConfigRenderer
+
+SUBSCRIBERS = ('subscribers', 'subscriber')
+
+class TestConfigRenderer(unittest.TestCase):
+
+    def setUp(self):
+        self.datastore = Datastore(copy.deepcopy(netconf_server.network_data))
+        self.renderer = ConfigRenderer(self.datastore)
+
+    def render(self):
+        return self.renderer.render(select_entries(self.datastore, select_all()))
+
+    def test_every_container_is_rendered(self):
+        """Test that get-config covers network functions, subscribers, sessions and QoS profiles"""
+        data = etree.fromstring(self.render())
+        names = [etree.QName(child).localname for child in data]
+        self.assertEqual(names, ['network-functions', 'subscribers', 'sessions', 'qos-profiles'])
+        ns = '{urn:ietf:params:xml:ns:netconf:base:1.0}'
+        self.assertEqual(data.findtext(f'{ns}subscribers/{ns}subscriber/{ns}ambr/{ns}uplink'), '100000000')
+
+    def test_only_changed_entries_are_rerendered(self):
+        """Test that a write re-renders only the written entry"""
+        for i in range(50):
+            self.datastore.create(SUBSCRIBERS, {'imsi': str(i), 'status': 'active'})
+        self.render()
+        with mock.patch.object(netconf_render, 'render_entry', wraps=netconf_render.render_entry) as rendered:
+            self.assertIn('<imsi>7</imsi><status>active</status>', self.render())
+            self.assertEqual(rendered.call_count, 0)
+            self.datastore.merge(SUBSCRIBERS, {'imsi': '7', 'status': 'inactive'})
+            self.assertIn('<imsi>7</imsi><status>inactive</status>', self.render())
+            self.assertEqual(rendered.call_count, 1)
+
+    def test_streamed_render_matches_and_is_bounded(self):
+        """Test that iter_render yields the same XML in bounded chunks"""
+        for i in range(2000):
+            self.datastore.create(SUBSCRIBERS, {'imsi': str(i), 'status': 'active', 'ambr': {'uplink': '1'}})
+        chunks = list(self.renderer.iter_render(select_entries(self.datastore, select_all()), chunk_size=4096))
+        self.assertGreater(len(chunks), 10)
+        self.assertTrue(all(len(chunk) < 4096 + 512 for chunk in chunks))
+        self.assertEqual(''.join(chunks), self.render())
+
+    def test_streamed_reply_holds_no_lock(self):
+        """Test that a partly sent get-config reply does not block writers and stays one snapshot"""
+        datastore = Datastore(copy.deepcopy(netconf_server.network_data))
+        for i in range(2000):
+            datastore.create(SUBSCRIBERS, {'imsi': str(i), 'status': 'active'})
+        with mock.patch.object(netconf_server, 'datastore', datastore), \
+                mock.patch.object(netconf_server, 'renderer', ConfigRenderer(datastore)):
+            reply = netconf_server.iter_get_config('running')
+            first = next(reply)
+            writer = threading.Thread(target=datastore.merge, args=(SUBSCRIBERS, {'imsi': '1999', 'status': 'gone'}))
+            writer.start()
+            writer.join(5)
+            self.assertFalse(writer.is_alive())
+            text = first + ''.join(reply)
+        self.assertIn('<imsi>1999</imsi><status>active</status>', text)
+        self.assertEqual(datastore.get(SUBSCRIBERS, '1999')['status'], 'gone')
+
+    def test_leaf_values_are_escaped(self):
+        """Test that leaf values are XML escaped"""
+        self.datastore.create(SUBSCRIBERS, {'imsi': 'x', 'apn': 'a<b&c'})
+        self.assertIn('<apn>a&lt;b&amp;c</apn>', self.render())
+
+    def test_booleans_and_unset_leaves(self):
+        """Test that booleans render as YANG booleans and None leaves are left out"""
+        self.datastore.create(SUBSCRIBERS, {'imsi': 'x', 'roaming': True, 'barred': False, 'apn': None})
+        self.assertIn('<subscriber><imsi>x</imsi><roaming>true</roaming><barred>false</barred></subscriber>',
+                      self.render())
+        etree.fromstring(self.render())
+
+if __name__ == '__main__':
+    unittest.main()
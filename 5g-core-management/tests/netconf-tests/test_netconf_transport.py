@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+
+"""
+NETCONF Transport Tests
+"""
+
+import unittest
+import asyncio
+import copy
+import socket
+import sys
+import os
+from unittest import mock
+
+# Add the netconf-server directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'management-plane', 'netconf-server'))
+
+import netconf_server
+from datastore import Datastore
+from netconf_render import ConfigRenderer
+from netconf_transport import NetconfServer, EOM_DELIMITER
+from netconf_framing import (ChunkedDecoder, EomDecoder, FramingError, MESSAGE_END,
+                             encode_chunk, CHUNKED_END)
+
+CLIENT_HELLO_1_1 = (
+    b'<hello xmlns="urn:ietf:params:xml:ns:netconf:base:1.0"><capabilities>'
+    b'<capability>urn:ietf:params:netconf:base:1.1</capability>'
+    b'</capabilities></hello>'
+)
+
+CLIENT_HELLO = (
+    b'<hello xmlns="urn:ietf:params:xml:ns:netconf:base:1.0"><capabilities>'
+    b'<capability>urn:ietf:params:netconf:base:1.0</capability>'
+    b'</capabilities></hello>'
+)
+
+def rpc(message_id, body):
+    return (f'<rpc message-id="{message_id}" xmlns="urn:ietf:params:xml:ns:netconf:base:1.0">'
+            f'{body}</rpc>').encode()
+
+async def read_eom(reader):
+    data = await reader.readuntil(EOM_DELIMITER)
+    return data[:-len(EOM_DELIMITER)].decode()
+
+async def read_chunked(reader):
+    message = b''
+    while True:
+        await reader.readexactly(2)
+        marker = await reader.readuntil(b'\n')
+        if marker == b'#\n':
+            return message.decode()
+        message += await reader.readexactly(int(marker[:-1]))
+
+def decode_all(decoder, pieces):
+    messages, current = [], b''
+    for piece in pieces:
+        decoder.feed(piece)
+        for part in decoder.events():
+            if part is MESSAGE_END:
+                messages.append(current)
+                current = b''
+            else:
+                current += part
+    return messages, current
+
+class TestNETCONFFraming(unittest.TestCase):
+
+    def test_eom_delimiter_split_across_reads(self):
+        """Test that a delimiter split across reads still ends the message"""
+        data = b'<rpc>one</rpc>]]>]]><rpc>two</rpc>]]>]]>'
+        messages, rest = decode_all(EomDecoder(), [data[i:i + 3] for i in range(0, len(data), 3)])
+        self.assertEqual(messages, [b'<rpc>one</rpc>', b'<rpc>two</rpc>'])
+        self.assertEqual(rest, b'')
+
+    def test_chunked_decoding_byte_by_byte(self):
+        """Test that chunked framing decodes regardless of read boundaries"""
+        data = encode_chunk(b'<rpc>') + encode_chunk(b'hello</rpc>') + CHUNKED_END + encode_chunk(b'x') + CHUNKED_END
+        messages, rest = decode_all(ChunkedDecoder(), [data[i:i + 1] for i in range(len(data))])
+        self.assertEqual(messages, [b'<rpc>hello</rpc>', b'x'])
+
+    def test_chunked_rejects_bad_header(self):
+        """Test that an invalid chunk header is a framing error"""
+        decoder = ChunkedDecoder(b'\n#012\nabc')
+        with self.assertRaises(FramingError):
+            list(decoder.events())
+
+    def test_message_size_cap(self):
+        """Test that a message larger than the decoder's max_size is a framing error in both framings"""
+        messages, _ = decode_all(EomDecoder(max_size=16), [b'<rpc>0123456789', b']]>]]>'])
+        self.assertEqual(messages, [b'<rpc>0123456789'])
+        with self.assertRaises(FramingError):
+            decode_all(EomDecoder(max_size=16), [b'<rpc>', b'0123456789', b'</rpc>', b']]>]]>'])
+        with self.assertRaises(FramingError):
+            decode_all(ChunkedDecoder(max_size=16), [encode_chunk(b'<rpc>'), encode_chunk(b'0123456789</rpc>')])
+
+class TestNETCONFTransport(unittest.TestCase):
+
+    def run_with_server(self, client, **options):
+        async def main():
+            server = NetconfServer(netconf_server.netconf_hello_handler, netconf_server.RPC_HANDLERS,
+                                   host='127.0.0.1', port=0, stream_handlers=netconf_server.STREAM_HANDLERS,
+                                   **options)
+            host, port = await server.start()
+            try:
+                return await client(host, port)
+            finally:
+                await server.close()
+        return asyncio.run(main())
+
+    def test_hello_and_get_config(self):
+        """Test the hello exchange and a get-config over the wire"""
+        async def client(host, port):
+            reader, writer = await asyncio.open_connection(host, port)
+            server_hello = await read_eom(reader)
+            writer.write(CLIENT_HELLO + EOM_DELIMITER)
+            writer.write(rpc(101, '<get-config><source><running/></source></get-config>') + EOM_DELIMITER)
+            reply = await read_eom(reader)
+            writer.write(rpc(102, '<close-session/>') + EOM_DELIMITER)
+            closed = await read_eom(reader)
+            writer.close()
+            return server_hello, reply, closed
+
+        server_hello, reply, closed = self.run_with_server(client)
+        self.assertIn('<nc:session-id>', server_hello)
+        self.assertIn('message-id="101"', reply)
+        self.assertIn('amf-001', reply)
+        self.assertIn('<ok/>', closed)
+
+    def test_stalled_reader_is_dropped(self):
+        """Test that a session that stops reading a large reply is closed after the write timeout"""
+        datastore = Datastore(copy.deepcopy(netconf_server.network_data))
+        for i in range(50000):
+            datastore.create(('subscribers', 'subscriber'), {'imsi': f'{i:015d}', 'apn': 'internet' * 40})
+
+        async def client(host, port):
+            sock = socket.socket()
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+            sock.connect((host, port))
+            reader, writer = await asyncio.open_connection(sock=sock)
+            await read_eom(reader)
+            writer.write(CLIENT_HELLO + EOM_DELIMITER)
+            writer.write(rpc(1, '<get-config><source><running/></source></get-config>') + EOM_DELIMITER)
+            await writer.drain()
+            await asyncio.sleep(1.5)
+            received = b''
+            try:
+                while b'</rpc-reply>' not in received:
+                    data = await asyncio.wait_for(reader.read(65536), 5)
+                    if not data:
+                        break
+                    received += data
+            except ConnectionError:
+                pass
+            writer.close()
+            return received
+
+        with mock.patch.object(netconf_server, 'datastore', datastore), \
+                mock.patch.object(netconf_server, 'renderer', ConfigRenderer(datastore)):
+            received = self.run_with_server(client, write_timeout=0.3)
+        self.assertNotIn(b'</rpc-reply>', received)
+
+    def test_chunked_session_streams_large_message(self):
+        """Test base:1.1 chunked framing with a message sent in many small chunks"""
+        async def client(host, port):
+            reader, writer = await asyncio.open_connection(host, port)
+            await read_eom(reader)
+            writer.write(CLIENT_HELLO_1_1 + EOM_DELIMITER)
+            message = rpc(5, '<get-config><source><running/></source>'
+                             '<!--' + ' ' * 200000 + '--></get-config>')
+            for i in range(0, len(message), 4096):
+                writer.write(encode_chunk(message[i:i + 4096]))
+                await writer.drain()
+            writer.write(CHUNKED_END)
+            reply = await read_chunked(reader)
+            writer.close()
+            return reply
+
+        reply = self.run_with_server(client)
+        self.assertIn('message-id="5"', reply)
+        self.assertIn('amf-001', reply)
+        self.assertTrue(reply.endswith('</data></rpc-reply>'))
+
+    def test_edit_config_over_the_wire(self):
+        """Test that edit-config changes are visible to a following get-config"""
+        edit = ('<edit-config><target><running/></target><config>'
+                '<network-functions><upf><id>upf-900</id><address>10.9.9.9</address></upf></network-functions>'
+                '</config></edit-config>')
+        remove = ('<edit-config><target><running/></target><config xmlns:nc="urn:ietf:params:xml:ns:netconf:base:1.0">'
+                  '<network-functions><upf nc:operation="delete"><id>upf-900</id></upf></network-functions>'
+                  '</config></edit-config>')
+
+        async def client(host, port):
+            reader, writer = await asyncio.open_connection(host, port)
+            await read_eom(reader)
+            writer.write(CLIENT_HELLO + EOM_DELIMITER)
+            replies = []
+            for n, body in enumerate([edit, '<get-config><source><running/></source></get-config>',
+                                      remove, remove]):
+                writer.write(rpc(n, body) + EOM_DELIMITER)
+                replies.append(await read_eom(reader))
+            writer.close()
+            return replies
+
+        created, config, deleted, missing = self.run_with_server(client)
+        self.assertIn('<ok/>', created)
+        self.assertIn('10.9.9.9', config)
+        self.assertIn('<ok/>', deleted)
+        self.assertIn('data-missing', missing)
+
+    def test_get_with_xpath_filter(self):
+        """Test a streamed <get> reply restricted by an XPath filter"""
+        async def client(host, port):
+            reader, writer = await asyncio.open_connection(host, port)
+            await read_eom(reader)
+            writer.write(CLIENT_HELLO + EOM_DELIMITER)
+            writer.write(rpc(9, '<get><filter type="xpath" select="/qos-profiles"/></get>') + EOM_DELIMITER)
+            reply = await read_eom(reader)
+            writer.close()
+            return reply
+
+        reply = self.run_with_server(client)
+        self.assertIn('<qos-profiles><profile><profile-id>qos-profile-001</profile-id>', reply)
+        self.assertNotIn('amf-001', reply)
+
+    def test_unsupported_operation(self):
+        """Test that unknown operations return an rpc-error"""
+        async def client(host, port):
+            reader, writer = await asyncio.open_connection(host, port)
+            await read_eom(reader)
+            writer.write(CLIENT_HELLO + EOM_DELIMITER)
+            writer.write(rpc(7, '<lock><target><running/></target></lock>') + EOM_DELIMITER)
+            reply = await read_eom(reader)
+            writer.close()
+            return reply
+
+        reply = self.run_with_server(client)
+        self.assertIn('operation-not-supported', reply)
+
+    def test_pipelined_rpcs(self):
+        """Test that pipelined reads see the writes sent before them and replies keep request order"""
+        get = '<get><filter type="xpath" select="/network-functions/upf[id=\'upf-950\']"/></get>'
+        edit = ('<edit-config><target><running/></target><config>'
+                '<network-functions><upf><id>upf-950</id><address>10.9.5.0</address></upf></network-functions>'
+                '</config></edit-config>')
+        remove = ('<edit-config><target><running/></target><config xmlns:nc="urn:ietf:params:xml:ns:netconf:base:1.0">'
+                  '<network-functions><upf nc:operation="remove"><id>upf-950</id></upf></network-functions>'
+                  '</config></edit-config>')
+
+        async def client(host, port):
+            reader, writer = await asyncio.open_connection(host, port)
+            await read_eom(reader)
+            writer.write(CLIENT_HELLO + EOM_DELIMITER)
+            bodies = [get, get, edit, get, get, remove, get]
+            writer.write(b''.join(rpc(n, body) + EOM_DELIMITER for n, body in enumerate(bodies)))
+            replies = [await read_eom(reader) for _ in bodies]
+            writer.close()
+            return replies
+
+        replies = self.run_with_server(client)
+        for n, reply in enumerate(replies):
+            self.assertIn(f'message-id="{n}"', reply)
+        self.assertEqual(['10.9.5.0' in reply for reply in replies],
+                         [False, False, False, True, True, False, False])
+
+    def test_concurrent_sessions(self):
+        """Test that hundreds of sessions can be served concurrently"""
+        async def one_session(host, port, n):
+            reader, writer = await asyncio.open_connection(host, port)
+            await read_eom(reader)
+            writer.write(CLIENT_HELLO + EOM_DELIMITER)
+            writer.write(rpc(n, '<get-config><source><running/></source></get-config>') + EOM_DELIMITER)
+            reply = await read_eom(reader)
+            writer.close()
+            return f'message-id="{n}"' in reply
+
+        async def client(host, port):
+            return await asyncio.gather(*(one_session(host, port, n) for n in range(200)))
+
+        self.assertTrue(all(self.run_with_server(client)))
+
+if __name__ == '__main__':
+    unittest.main()
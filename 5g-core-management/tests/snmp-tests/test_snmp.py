@@ -29,5 +29,52 @@ class TestSNMPAgent(unittest.TestCase):
         except ImportError:
             self.fail("Failed to import snmp_poller module")
 
+    def test_workers_serve_one_collection(self):
+        """Test that every worker process serves the values and history collected by the parent process"""
+        import multiprocessing
+        import signal
+        import socket
+        import time
+        from pysnmp.proto.api import v2c
+        import snmp_agent
+        from snmp_collectors import Collector
+        from snmp_history import HISTORY_LATEST_OID
+        from test_snmp_transport import request, response
+
+        class PidCollector(Collector):
+            # Each process collecting would serve its own pid
+            def collect(self):
+                return {'amf_active_sessions': os.getpid()}
+
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        agent = snmp_agent.SNMPAgent(nf_url=None, collectors=[PidCollector(0.05)], host='127.0.0.1', port=port,
+                                     transport='asyncio', workers=3)
+        process = multiprocessing.get_context('fork').Process(target=agent.start)
+        process.start()
+        try:
+            served = []
+            deadline = time.monotonic() + 10
+            while len(served) < 30 and time.monotonic() < deadline:
+                # A new socket per request, so the kernel spreads them over the workers
+                with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as client:
+                    client.settimeout(0.2)
+                    client.sendto(request(v2c.GetRequestPDU, [snmp_agent.AMF_ACTIVE_SESSIONS_OID + (0,),
+                                                               HISTORY_LATEST_OID + (0,)]), ('127.0.0.1', port))
+                    try:
+                        _, _, _, varbinds = response(client.recv(65535))
+                    except socket.timeout:
+                        continue
+                sessions, latest = (int(value) for _, value in varbinds)
+                if latest:
+                    # The worker's history has recorded the published snapshots
+                    served.append(sessions)
+        finally:
+            os.kill(process.pid, signal.SIGTERM)
+            process.join(5)
+        self.assertEqual(len(served), 30)
+        self.assertEqual(set(served), {process.pid})
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
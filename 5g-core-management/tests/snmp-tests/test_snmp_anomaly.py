@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+"""
+SNMP Anomaly Detection Tests
+"""
+
+import unittest
+import json
+import sys
+import os
+import tempfile
+import numpy as np
+
+# Add the snmp-monitor directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'management-plane', 'snmp-monitor'))
+
+from snmp_anomaly import AnomalyDetector, AnomalyTraps, replay
+from snmp_poller import export_to_csv
+from snmp_segments import SegmentLog
+from snmp_traps import ANOMALY_CLEARED_OID, ANOMALY_OID, ANOMALY_SCORE_OID, ANOMALY_SERIES_OID
+
+class TestAnomalyDetector(unittest.TestCase):
+
+    def run_series(self, detector, values, start=0.0, step=30.0):
+        """Feed rows of values (one column per series) to detector, returning its events"""
+        events = []
+        detector.add_listener(events.append)
+        indices = [detector.index(f'upf-{i:03d}', 'upf_throughput') for i in range(values.shape[1])]
+        for row, sample in enumerate(values):
+            detector.update(indices, sample, start + row * step)
+        return events
+
+    def test_flags_and_clears_anomalies(self):
+        """Test that a spike and a sustained drop of one series alert once and clear, after the warmup"""
+        rng = np.random.default_rng(1)
+        values = 1000 + rng.normal(0, 5, (200, 20))
+        values[5, 2] = 5000
+        values[150, 7] = 5000
+        values[170:180, 9] = 100
+        values[160:, 4] = np.nan
+        for method in ('ewma', 'robust'):
+            detector = AnomalyDetector(method, threshold=8)
+            events = self.run_series(detector, values)
+            self.assertEqual([(event['event'], event['target'], event['timestamp'] / 30) for event in events],
+                             [('anomaly', 'upf-007', 150), ('cleared', 'upf-007', 151),
+                              ('anomaly', 'upf-009', 170), ('cleared', 'upf-009', 180)])
+            self.assertAlmostEqual(events[0]['expected'], 1000, delta=10)
+            self.assertGreater(events[0]['score'], 100)
+            self.assertEqual(detector.stats, {'samples': 200 * 20 - 40, 'anomalies': 2, 'cleared': 2})
+            self.assertEqual(int(detector.count[detector.index('upf-004', 'upf_throughput')]), 160)
+        with self.assertRaises(ValueError):
+            AnomalyDetector('prophet')
+
+    def test_seasonal_baseline(self):
+        """Test that a daily pattern alerts every day without a seasonal baseline and only when broken with one"""
+        rng = np.random.default_rng(2)
+        hours = np.arange(14 * 24)
+        values = 100 + 400 * (hours % 24 == 2) + rng.normal(0, 5, len(hours))
+        values[12 * 24 + 14] += 300
+        plain = self.run_series(AnomalyDetector(warmup=48), values[:, None], step=3600)
+        seasonal = self.run_series(AnomalyDetector(warmup=48, season=(86400, 24)), values[:, None], step=3600)
+        self.assertGreater(sum(event['event'] == 'anomaly' for event in plain), 10)
+        self.assertEqual([(event['event'], event['timestamp'] / 3600) for event in seasonal],
+                         [('anomaly', 12 * 24 + 14), ('cleared', 12 * 24 + 15)])
+        self.assertEqual(seasonal[0]['value'], values[12 * 24 + 14])
+
+    def test_replay_recorded_results(self):
+        """Test replaying poller CSV output, fleet JSON lines cycles and a segment directory"""
+        rng = np.random.default_rng(3)
+        with tempfile.TemporaryDirectory() as directory:
+            csv_path = os.path.join(directory, 'metrics.csv')
+            jsonl_path = os.path.join(directory, 'fleet.jsonl')
+            segments = os.path.join(directory, 'smf-001')
+            with open(jsonl_path, 'w') as output, SegmentLog(segments) as log:
+                for row in range(120):
+                    timestamp = f'2024-01-01T{row // 60:02d}:{row % 60:02d}:00'
+                    sessions = 5000 if row == 100 else 1000 + rng.normal(0, 5)
+                    export_to_csv({'amf_active_sessions': str(sessions), 'upf_packet_loss': 'N/A',
+                                   'timestamp': timestamp}, csv_path)
+                    log.append({'smf_cpu_utilization': 30 + rng.normal(), 'timestamp': timestamp})
+                    for target in ('upf-001', 'upf-002'):
+                        result = {'target': target, 'upf_throughput': str(200 + rng.normal()),
+                                  'latency_ms': 1.0, 'error': None, 'timestamp': timestamp}
+                        if target == 'upf-002' and row == 110:
+                            result.update(upf_throughput='N/A', error='timeout')
+                        output.write(json.dumps(result) + '\n')
+
+            detector = AnomalyDetector()
+            events = []
+            detector.add_listener(events.append)
+            polls, span, elapsed = replay([csv_path, jsonl_path, segments], detector, target='amf-001')
+        self.assertEqual((polls, span), (120 * 4, 119 * 60))
+        self.assertEqual([(event['target'], event['metric']) for event in events if event['event'] == 'anomaly'],
+                         [('amf-001', 'amf_active_sessions')])
+        # Each fleet target's throughput, but not its poll latency
+        self.assertEqual(sorted(name for name, _ in detector.series), ['amf-001', 'smf-001', 'upf-001', 'upf-002'])
+        self.assertEqual(detector.stats['samples'], 120 * 4 - 1)
+        self.assertLess(elapsed, 10)
+
+    def test_anomaly_notifications(self):
+        """Test that events are sent as anomalyDetected and anomalyCleared notifications"""
+        class FakeSender:
+            def __init__(self):
+                self.sent = []
+                self.limited = []
+
+            def notify(self, notification_oid, varbinds, limited=True):
+                self.sent.append((notification_oid, dict(varbinds)))
+                self.limited.append(limited)
+
+        sender = FakeSender()
+        traps = AnomalyTraps(sender)
+        traps({'event': 'anomaly', 'target': 'amf-001', 'metric': 'amf_cpu_utilization', 'value': 97.0,
+               'expected': 40.5, 'score': 12.345, 'timestamp': 0.0})
+        traps({'event': 'cleared', 'target': 'amf-001', 'metric': 'amf_cpu_utilization', 'value': 41.0,
+               'expected': 41.0, 'score': -1e12, 'timestamp': 30.0})
+        (raised, objects), (cleared, cleared_objects) = sender.sent
+        # Only the anomaly is rate limited, never the notification clearing it
+        self.assertEqual(sender.limited, [True, False])
+        self.assertEqual((raised, cleared), (ANOMALY_OID, ANOMALY_CLEARED_OID))
+        self.assertEqual(str(objects[ANOMALY_SERIES_OID]), 'amf-001/amf_cpu_utilization')
+        self.assertEqual(int(objects[ANOMALY_SCORE_OID]), 1234)
+        self.assertEqual(int(cleared_objects[ANOMALY_SCORE_OID]), -(2 ** 31 - 1))
+
+if __name__ == '__main__':
+    unittest.main()
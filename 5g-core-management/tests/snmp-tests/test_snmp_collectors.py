@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+"""
+SNMP Metric Collector Tests
+"""
+
+import unittest
+import tempfile
+import sys
+import os
+
+# Add the snmp-monitor directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'management-plane', 'snmp-monitor'))
+
+from pysnmp.proto.api import v2c
+
+import snmp_agent
+from snmp_mib import MibTree, MibInstrumController
+from snmp_collectors import (MetricsSnapshot, Collector, CollectorScheduler, DatastoreCollector, ProcCollector,
+                             ReplayCollector)
+
+class TestMetricCollectors(unittest.TestCase):
+
+    def test_snapshot_publishes_complete_generations(self):
+        """Test that readers pinned to a snapshot do not see a publish that happens meanwhile"""
+        snapshot = MetricsSnapshot({'amf_active_sessions': 1, 'smf_active_pdu_sessions': 1})
+        tree = MibTree()
+        snmp_agent.register_metrics(tree, snapshot, {name: snmp_agent.METRIC_OBJECTS[name] for name in snapshot})
+
+        class PublishingController(MibInstrumController):
+            def _readVars(self, varBinds, acInfo):
+                # Publish between the two variable bindings of one request
+                first = super()._readVars(varBinds[:1], acInfo)
+                snapshot.publish({'amf_active_sessions': 2, 'smf_active_pdu_sessions': 2})
+                return first + super()._readVars(varBinds[1:], acInfo)
+
+        instrum = PublishingController(tree, snapshot)
+        names = [v2c.ObjectIdentifier(snmp_agent.AMF_ACTIVE_SESSIONS_OID + (0,)),
+                 v2c.ObjectIdentifier(snmp_agent.SMF_ACTIVE_PDU_SESSIONS_OID + (0,))]
+        values = [int(value) for _, value in instrum.readVars([(name, v2c.Null()) for name in names])]
+        self.assertEqual(values, [1, 1])
+        self.assertEqual(dict(snapshot), {'amf_active_sessions': 2, 'smf_active_pdu_sessions': 2})
+        self.assertEqual(snapshot.generation, 1)
+
+    def test_datastore_counts(self):
+        """Test that the datastore collector counts active subscribers, sessions and users"""
+        data = {
+            "subscribers": {"subscriber": [{"imsi": "1", "status": "active"}, {"imsi": "2", "status": "active"},
+                                           {"imsi": "3", "status": "inactive"}]},
+            "sessions": {"pdu-session": [{"session-id": "a", "imsi": "1", "status": "active"},
+                                         {"session-id": "b", "imsi": "1", "status": "active"},
+                                         {"session-id": "c", "imsi": "2", "status": "released"}]}
+        }
+        collector = DatastoreCollector('http://datastore', fetch=lambda url: data)
+        self.assertEqual(collector.collect(), {'amf_active_sessions': 2, 'smf_active_pdu_sessions': 2,
+                                               'upf_active_users': 1})
+
+    def test_proc_collector(self):
+        """Test CPU, memory and interface rates read from a /proc tree"""
+        with tempfile.TemporaryDirectory() as proc:
+            os.makedirs(os.path.join(proc, '42'))
+            os.makedirs(os.path.join(proc, 'net'))
+
+            def write(path, text):
+                with open(os.path.join(proc, path), 'w') as f:
+                    f.write(text)
+
+            def sample(ticks, rx_bytes, rx_packets, rx_drop):
+                write('42/stat', '42 (open5gs-upfd) S ' + ' '.join(['0'] * 10) + f' {ticks} 0 0 0')
+                write('net/dev', 'Inter-|   Receive\n face |bytes\n'
+                                 f'ogstun: {rx_bytes} {rx_packets} 0 {rx_drop} 0 0 0 0 0 0 0 0 0 0 0 0\n')
+
+            write('42/comm', 'open5gs-upfd\n')
+            write('42/status', 'Name:\topen5gs-upfd\nVmRSS:\t  102400 kB\n')
+            write('meminfo', 'MemTotal:       1024000 kB\n')
+            clock = iter([100.0, 102.0])
+            collector = ProcCollector(processes={'upf': 'open5gs-upfd'}, proc=proc, clock=lambda: next(clock))
+            sample(0, 0, 0, 0)
+            self.assertEqual(collector.collect(), {'upf_memory_utilization': 10.0})
+            sample(os.sysconf('SC_CLK_TCK'), 2000, 198, 2)
+            values = collector.collect()
+        self.assertEqual(values, {'upf_cpu_utilization': 50.0, 'upf_memory_utilization': 10.0,
+                                  'upf_throughput': 8000, 'upf_packet_loss': 1.0})
+
+    def test_replay_of_poller_csv(self):
+        """Test that a poller CSV is replayed in order, unscaled and looping"""
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write('timestamp,amf_active_sessions,upf_packet_loss\n'
+                    '2024-01-01T00:00:00,1200,5\n'
+                    '2024-01-01T00:00:10,N/A,7\n')
+        try:
+            collector = ReplayCollector(f.name, scales={'upf_packet_loss': 100})
+        finally:
+            os.unlink(f.name)
+        self.assertEqual([collector.collect() for _ in range(3)], [
+            {'amf_active_sessions': 1200, 'upf_packet_loss': 0.05},
+            {'upf_packet_loss': 0.07},
+            {'amf_active_sessions': 1200, 'upf_packet_loss': 0.05}
+        ])
+
+    def test_scheduler_runs_each_collector_on_its_interval(self):
+        """Test that collectors are run on their own intervals and failures are contained"""
+        class Counting(Collector):
+            def __init__(self, name, interval, fail=False):
+                super().__init__(interval)
+                self.name, self.fail, self.runs = name, fail, 0
+
+            def collect(self):
+                self.runs += 1
+                if self.fail:
+                    raise OSError("unavailable")
+                return {self.name: self.runs}
+
+        fast, slow, broken = Counting('fast', 0.01), Counting('slow', 0.1), Counting('broken', 0.01, fail=True)
+        snapshot = MetricsSnapshot()
+        scheduler = CollectorScheduler(snapshot, [fast, slow, broken])
+        scheduler.start()
+        scheduler._stop.wait(0.25)
+        scheduler.stop()
+        self.assertGreater(fast.runs, slow.runs * 3)
+        self.assertGreater(broken.runs, 1)
+        self.assertEqual(snapshot['slow'], slow.runs)
+
+if __name__ == '__main__':
+    unittest.main()
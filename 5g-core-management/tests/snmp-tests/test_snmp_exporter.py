@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+"""
+SNMP Prometheus Exporter Tests
+"""
+
+import unittest
+import gzip
+import sys
+import os
+import urllib.error
+import urllib.request
+
+# Add the snmp-monitor directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'management-plane', 'snmp-monitor'))
+
+from snmp_exporter import MetricsExporter, metric_name, serve_metrics
+
+class TestMetricsExporter(unittest.TestCase):
+
+    def test_exposition_format(self):
+        """Test that polls render as target-labelled families with walk objects given valid names"""
+        exporter = MetricsExporter()
+        text = exporter.render({
+            'amf-001': {'amf_active_sessions': '1250', 'upf_packet_loss': 'N/A', 'latency_ms': 2.5,
+                        '3.1': '17', '2.3.1.3[upf-"001"]': '45', '2.3.1.1[upf-001]': 'upf-001',
+                        'timestamp': '2024-01-01T00:00:00'},
+            'amf-002': {'amf_active_sessions': '900', 'timestamp': '2024-01-01T00:00:00'},
+            'amf-003': {'amf_active_sessions': 'N/A', 'error': 'timeout', 'timestamp': '2024-01-01T00:00:00'}},
+            extra=[('snmp_fleet_cycle_seconds', 'Duration of the last polling cycle', 'gauge', [(None, '0.25')])])
+        lines = text.splitlines()
+        self.assertEqual(lines[:5], ['# HELP snmp_up Whether the target answered its last poll', '# TYPE snmp_up gauge',
+                                     'snmp_up{target="amf-001"} 1', 'snmp_up{target="amf-002"} 1',
+                                     'snmp_up{target="amf-003"} 0'])
+        self.assertEqual(lines[5:8], ['# TYPE amf_active_sessions gauge', 'amf_active_sessions{target="amf-001"} 1250',
+                                      'amf_active_sessions{target="amf-002"} 900'])
+        self.assertIn('snmp_poll_latency_seconds{target="amf-001"} 0.0025', lines)
+        self.assertIn('snmp_oid_3_1{target="amf-001"} 17', lines)
+        self.assertIn('snmp_oid_2_3_1_3{target="amf-001",index="upf-\\"001\\""} 45', lines)
+        self.assertNotIn('upf_packet_loss', text)
+        self.assertNotIn('2_3_1_1', text)
+        self.assertEqual(lines[-3:], ['# HELP snmp_fleet_cycle_seconds Duration of the last polling cycle',
+                                      '# TYPE snmp_fleet_cycle_seconds gauge', 'snmp_fleet_cycle_seconds 0.25'])
+        self.assertEqual(metric_name('upf_throughput'), ('upf_throughput', {}))
+
+    def test_publish_replaces_cycle(self):
+        """Test that a publish serves only the targets polled since the previous one"""
+        exporter = MetricsExporter()
+        exporter.append('upf-001', {'upf_throughput': '1'})
+        exporter.append('upf-002', {'upf_throughput': '2'})
+        exporter.publish()
+        self.assertIn(b'target="upf-002"', exporter.body[0])
+        exporter.append('upf-001', {'upf_throughput': '3'})
+        self.assertIn(b'upf_throughput{target="upf-001"} 1', exporter.body[0])
+        exporter.publish()
+        self.assertIn(b'upf_throughput{target="upf-001"} 3', exporter.body[0])
+        self.assertNotIn(b'upf-002', exporter.body[0])
+        self.assertEqual(gzip.decompress(exporter.body[1]), exporter.body[0])
+
+    def test_serves_cached_exposition(self):
+        """Test that /metrics serves the published buffer, gzipped when accepted"""
+        exporter = MetricsExporter()
+        exporter.append('smf-001', {'smf_cpu_utilization': '30'})
+        exporter.publish()
+        server = serve_metrics(exporter, '127.0.0.1', 0)
+        url = f'http://127.0.0.1:{server.server_address[1]}/metrics'
+        try:
+            with urllib.request.urlopen(url) as response:
+                self.assertTrue(response.headers['Content-Type'].startswith('text/plain; version=0.0.4'))
+                self.assertEqual(response.read(), exporter.body[0])
+            request = urllib.request.Request(url, headers={'Accept-Encoding': 'gzip'})
+            with urllib.request.urlopen(request) as response:
+                self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+                self.assertIn(b'smf_cpu_utilization{target="smf-001"} 30', gzip.decompress(response.read()))
+            with self.assertRaises(urllib.error.HTTPError):
+                urllib.request.urlopen(url.replace('/metrics', '/'))
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual((exporter.stats['publishes'], exporter.stats['scrapes']), (1, 2))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+
+"""
+SNMP Fleet Poller Tests
+"""
+
+import unittest
+import asyncio
+import io
+import socket
+import sys
+import os
+
+# Add the snmp-monitor directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'management-plane', 'snmp-monitor'))
+
+import snmp_agent
+from snmp_mib import MibTree
+from snmp_transport import SnmpResponder, serve
+from snmp_fleet import FleetPoller, Target, parse_inventory, network_function_targets
+
+class TestFleetPoller(unittest.TestCase):
+
+    def test_inventories(self):
+        """Test inventory files in both formats and targets from RESTCONF network functions"""
+        self.assertEqual(parse_inventory("# core\namf-1 10.0.0.1\nupf-1 10.0.0.2:1161 private\n"),
+                         [Target('amf-1', '10.0.0.1'), Target('upf-1', '10.0.0.2', 1161, 'private')])
+        self.assertEqual(parse_inventory('[{"name": "smf-1", "host": "10.0.0.3", "port": 2161}]'),
+                         [Target('smf-1', '10.0.0.3', 2161)])
+        with self.assertRaises(ValueError):
+            parse_inventory("amf-1\n")
+        network_functions = {
+            "amf": [{"id": "amf-001", "status": "active"}, {"id": "amf-002", "snmp-address": "10.0.1.2"}],
+            "upf": [{"id": "upf-001", "address": "10.0.0.10", "snmp-port": 1161}, {"address": "10.0.0.11"}]}
+        log = io.StringIO()
+        self.assertEqual(network_function_targets(network_functions, log=log), [Target('amf-002', '10.0.1.2')])
+        # The UPF's user plane address is never polled, and every skipped instance is reported
+        self.assertEqual(log.getvalue().splitlines(), [
+            "Skipping amf amf-001: no snmp-address", "Skipping upf upf-001: no snmp-address",
+            "Skipping upf instance without an id: {'address': '10.0.0.11'}"])
+        self.assertEqual(network_function_targets(network_functions, host='10.0.0.1', log=log),
+                         [Target('amf-001', '10.0.0.1'), Target('amf-002', '10.0.1.2'),
+                          Target('upf-001', '10.0.0.1', 1161)])
+
+    def test_polls_fleet_concurrently(self):
+        """Test that every target is polled, results stream in as they arrive and silent targets time out"""
+        metrics = dict(snmp_agent.metrics)
+        tree = MibTree()
+        snmp_agent.register_metrics(tree, metrics)
+        silent = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        silent.bind(('127.0.0.1', 0))
+
+        async def main():
+            loop = asyncio.get_running_loop()
+            addresses = []
+            servers = []
+            for _ in range(4):
+                address = loop.create_future()
+                servers.append(asyncio.ensure_future(serve(SnmpResponder(tree), '127.0.0.1', 0,
+                                                           started=address.set_result)))
+                addresses.append(await address)
+            targets = [Target(f'nf-{i}', *addresses[i % 4]) for i in range(200)]
+            targets.append(Target('silent', *silent.getsockname()))
+            targets.append(Target('wrong-community', *addresses[0], community='private'))
+            poller = FleetPoller(targets, concurrency=16, timeout=0.2, retries=1)
+            results = [result async for result in poller.poll()]
+            for server in servers:
+                server.cancel()
+            return poller, results
+
+        try:
+            poller, results = asyncio.run(main())
+        finally:
+            silent.close()
+        self.assertEqual(len(results), 202)
+        self.assertEqual(sorted(result['target'] for result in results[-2:]), ['silent', 'wrong-community'])
+        answered = [result for result in results if 'error' not in result]
+        self.assertEqual(len(answered), 200)
+        self.assertEqual(answered[0]['amf_active_sessions'], str(metrics['amf_active_sessions']))
+        self.assertEqual(answered[0]['upf_packet_loss'], '5')
+        self.assertEqual(results[-1]['error'], 'timeout')
+        self.assertEqual(results[-1]['upf_throughput'], 'N/A')
+        self.assertEqual((poller.stats['responses'], poller.stats['timeouts'], poller.stats['retries']), (200, 2, 2))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+"""
+SNMP Metric History Tests
+"""
+
+import unittest
+import time
+import sys
+import os
+
+# Add the snmp-monitor directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'management-plane', 'snmp-monitor'))
+
+from pysnmp.proto.api import v2c
+
+import snmp_agent
+import snmp_poller
+from snmp_mib import MibTree
+from snmp_collectors import MetricsSnapshot
+from snmp_history import MetricHistory, HISTORY_ENTRY_OID, HISTORY_LATEST_OID
+from snmp_transport import SnmpResponder
+from test_snmp_transport import request, response
+from test_snmp_poller import agent
+
+def sample(i):
+    return {'amf_active_sessions': 1000 + i, 'upf_packet_loss': i / 100}
+
+class TestMetricHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.snapshot = MetricsSnapshot(dict(snmp_agent.metrics))
+        self.tree = MibTree()
+        snmp_agent.register_metrics(self.tree, self.snapshot)
+        self.history = MetricHistory(self.tree, snmp_agent.METRIC_OBJECTS, size=4, clock=lambda: 1700000000.5)
+        self.history.attach(self.snapshot)
+        self.responder = SnmpResponder(self.tree, snapshot=self.snapshot)
+
+    def test_ring_keeps_the_latest_samples(self):
+        """Test that only the last size samples are kept and served, with fixed-size buffers"""
+        for i in range(1, 7):
+            self.snapshot.publish(sample(i))
+        self.assertEqual([sequence for sequence, _, _ in self.history.samples()], [3, 4, 5, 6])
+        self.assertEqual([values['amf_active_sessions'] for _, _, values in self.history.samples(since=4)],
+                         [1005, 1006])
+        self.assertEqual(len(self.history._values['upf_throughput']), 4)
+        # Two scalars plus 11 columns of 4 rows next to the 9 metrics
+        self.assertEqual(len(self.tree), 9 + 2 + 11 * 4)
+        self.assertIsNone(self.tree.get(HISTORY_ENTRY_OID + (1, 2)))
+        self.assertEqual(self.tree.get(HISTORY_LATEST_OID + (0,)), v2c.Unsigned32(6))
+
+    def test_record_updates_the_index_in_place(self):
+        """Test that recording a sample inserts and evicts its rows without rebuilding the MIB index"""
+        self.tree.update(added=[(snmp_agent.BASE_OID + (2, 9, 1, 1), (row,), lambda: v2c.Gauge32(1))
+                                for row in range(20000)])
+        for i in range(1, 5):
+            self.snapshot.publish(sample(i))
+        index = self.tree._oids
+        started = time.perf_counter()
+        for i in range(5, 205):
+            self.snapshot.publish(sample(i))
+        self.assertLess(time.perf_counter() - started, 2)
+        self.assertIs(self.tree._oids, index)
+        self.assertEqual(len(self.tree), 20000 + 9 + 2 + 11 * 4)
+
+    def test_getbulk_since_last_sequence(self):
+        """Test that one GETBULK of every column from a sequence returns the newer rows in order"""
+        for i in range(1, 6):
+            self.snapshot.publish(sample(i))
+        columns = [HISTORY_ENTRY_OID + (column,) for column in range(1, 12)]
+        _, status, _, varbinds = response(self.responder.respond(request(
+            v2c.GetBulkRequestPDU, [column + (3,) for column in columns], MaxRepetitions=3)))
+        self.assertEqual(status, 0)
+        rows = [varbinds[i:i + 11] for i in range(0, len(varbinds), 11)]
+        self.assertEqual([[oid for oid, _ in row] for row in rows[:2]],
+                         [[column + (sequence,) for column in columns] for sequence in (4, 5)])
+        self.assertEqual([int(row[0][1]) for row in rows[:2]], [4, 5])
+        self.assertEqual(int(rows[0][1][1]), 1700000000)
+        self.assertEqual((rows[0][2][1], rows[1][10][1]), (v2c.Gauge32(1004), v2c.Gauge32(5)))
+        # Past the newest sample each column runs into the next one
+        self.assertEqual(rows[2][0][0], columns[1] + (2,))
+
+    def test_poller_catches_up(self):
+        """Test that the poller fetches every sample since its last sequence from a running agent"""
+        for i in range(1, 5):
+            self.snapshot.publish(sample(i))
+        with agent(self.responder):
+            samples = snmp_poller.poll_history(since=1)
+        self.assertEqual([row['sequence'] for row in samples], ['2', '3', '4'])
+        self.assertEqual([row['amf_active_sessions'] for row in samples], ['1002', '1003', '1004'])
+
+if __name__ == '__main__':
+    unittest.main()
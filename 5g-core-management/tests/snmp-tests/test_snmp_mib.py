@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+"""
+SNMP MIB Instrumentation Tests
+"""
+
+import unittest
+import random
+import sys
+import os
+
+# Add the snmp-monitor directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'management-plane', 'snmp-monitor'))
+
+from pysnmp.proto.api import v2c
+
+import snmp_agent
+from snmp_mib import MibTree, MibInstrumController
+
+def oid(text):
+    return v2c.ObjectIdentifier(text)
+
+class TestMibInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = dict(snmp_agent.metrics)
+        self.tree = MibTree()
+        snmp_agent.register_metrics(self.tree, self.metrics)
+        self.instrum = MibInstrumController(self.tree)
+
+    def test_get_serves_live_metric_values(self):
+        """Test that GET returns the current metrics values at their instance OIDs"""
+        name = oid('1.3.6.1.4.1.55555.1.1.1.0')
+        self.assertEqual(int(self.instrum.readVars([(name, v2c.Null())])[0][1]), self.metrics['amf_active_sessions'])
+        self.metrics['amf_active_sessions'] = 1400
+        self.assertEqual(int(self.instrum.readVars([(name, v2c.Null())])[0][1]), 1400)
+        self.metrics['upf_packet_loss'] = 0.07
+        loss = self.instrum.readVars([(oid('1.3.6.1.4.1.55555.1.3.3.0'), v2c.Null())])[0][1]
+        self.assertEqual(int(loss), 7)
+
+    def test_get_unknown_oids(self):
+        """Test noSuchInstance and noSuchObject for OIDs that are not served"""
+        (_, instance), (_, missing) = self.instrum.readVars([
+            (oid('1.3.6.1.4.1.55555.1.1.1'), v2c.Null()),
+            (oid('1.3.6.1.4.1.55555.9.9.0'), v2c.Null())
+        ])
+        self.assertEqual(instance.tagSet, v2c.NoSuchInstance.tagSet)
+        self.assertEqual(missing.tagSet, v2c.NoSuchObject.tagSet)
+
+    def test_getnext_walks_in_oid_order(self):
+        """Test that GETNEXT visits every metric in lexicographic order and ends with endOfMibView"""
+        walked = []
+        name = oid('1.3.6.1.4.1.55555')
+        while True:
+            name, value = self.instrum.readNextVars([(name, v2c.Null())])[0]
+            if value.tagSet == v2c.EndOfMibView.tagSet:
+                break
+            walked.append(tuple(name))
+        expected = sorted(object_oid + (0,) for object_oid, _ in snmp_agent.METRIC_OBJECTS.values())
+        self.assertEqual(walked, expected)
+
+    def test_unregistered_instances_disappear(self):
+        """Test that instances can be removed from the sorted index"""
+        self.tree.unregister(snmp_agent.AMF_CPU_UTILIZATION_OID, (0,))
+        name, _ = self.instrum.readNextVars([(oid('1.3.6.1.4.1.55555.1.1.1.0'), v2c.Null())])[0]
+        self.assertEqual(tuple(name), snmp_agent.AMF_MEMORY_UTILIZATION_OID + (0,))
+        self.assertEqual(len(self.tree), len(snmp_agent.METRIC_OBJECTS) - 1)
+
+    def test_updates_keep_the_index_sorted(self):
+        """Test that small updates edit the index in place and large ones rebuild it, both in OID order"""
+        table = snmp_agent.BASE_OID + (9, 1, 1)
+        rng = random.Random(4)
+        rows = list(range(1000))
+        rng.shuffle(rows)
+        self.tree.update(added=[(table + (column,), (row,), lambda: v2c.Gauge32(1)) for row in rows for column in (1, 2)])
+        index = self.tree._oids
+        served = set(index)
+        for _ in range(50):
+            removed = [(table + (rng.choice((1, 2)),), (rng.randrange(2000),)) for _ in range(5)]
+            added = [(table + (rng.choice((1, 2)),), (rng.randrange(2000),), lambda: v2c.Gauge32(1)) for _ in range(5)]
+            self.tree.update(added=added, removed=removed)
+            served -= {object_oid + index for object_oid, index in removed}
+            served |= {object_oid + index for object_oid, index, _ in added}
+        self.assertIs(self.tree._oids, index)
+        self.assertEqual(self.tree._oids, sorted(served))
+        walked, found = [], self.tree.next(table)
+        while found is not None:
+            walked.append(found[0])
+            found = self.tree.next(found[0])
+        self.assertEqual(walked, [oid for oid in sorted(served) if oid > table])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+
+"""
+SNMP Poller Tests
+"""
+
+import unittest
+import asyncio
+import contextlib
+import queue
+import threading
+import sys
+import os
+
+# Add the snmp-monitor directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'management-plane', 'snmp-monitor'))
+
+import snmp_agent
+import snmp_poller
+from snmp_history import MetricHistory
+from snmp_mib import MibTree
+from snmp_tables import NfTables
+from snmp_transport import TOO_BIG, SnmpResponder, serve
+
+@contextlib.contextmanager
+def agent(responder):
+    """Serve responder on a loopback port and point the poller at it"""
+    address = queue.Queue()
+    stop = threading.Event()
+
+    async def main():
+        server = asyncio.ensure_future(serve(responder, '127.0.0.1', 0, started=address.put))
+        while not stop.is_set():
+            await asyncio.sleep(0.05)
+        server.cancel()
+
+    thread = threading.Thread(target=asyncio.run, args=(main(),), daemon=True)
+    thread.start()
+    target = (snmp_poller.SNMP_TARGET, snmp_poller.SNMP_PORT)
+    try:
+        snmp_poller.SNMP_TARGET, snmp_poller.SNMP_PORT = address.get(timeout=5)
+        yield
+    finally:
+        snmp_poller.SNMP_TARGET, snmp_poller.SNMP_PORT = target
+        stop.set()
+        thread.join()
+
+class TestSnmpPoller(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = dict(snmp_agent.metrics)
+        del self.metrics['smf_cpu_utilization']
+        self.tree = MibTree()
+        snmp_agent.register_metrics(self.tree, self.metrics, {
+            name: objects for name, objects in snmp_agent.METRIC_OBJECTS.items() if name in self.metrics})
+
+    def test_pack_oids(self):
+        """Test that OIDs are packed into as few requests as fit the message size"""
+        oids = [oid for _, oid in snmp_poller.OID_LIST]
+        self.assertEqual(snmp_poller.pack_oids(oids), [oids])
+        self.assertEqual(snmp_poller.oid_size('1.3.6.1.4.1.55555.1.1.1.0'), 12)
+        batches = snmp_poller.pack_oids(oids, max_size=snmp_poller.MESSAGE_OVERHEAD + 120)
+        self.assertEqual(sum(batches, []), oids)
+        self.assertEqual([len(batch) for batch in batches], [3, 3, 3])
+
+    def test_poll_metrics_in_one_request(self):
+        """Test that all metrics are fetched with one GET and a missing instance is reported as N/A"""
+        responder = SnmpResponder(self.tree)
+        with agent(responder):
+            metrics = snmp_poller.poll_metrics()
+            session = snmp_poller.get_session()
+            snmp_poller.poll_metrics()
+            self.assertIs(snmp_poller.get_session(), session)
+        self.assertEqual(responder.stats['requests'], 2)
+        self.assertEqual(metrics['amf_active_sessions'], str(self.metrics['amf_active_sessions']))
+        self.assertEqual(metrics['upf_packet_loss'], '5')
+        self.assertEqual(metrics['smf_cpu_utilization'], 'N/A')
+
+    def test_too_big_responses_are_split(self):
+        """Test that a GET answered with tooBig is retried in smaller requests"""
+        responder = SnmpResponder(self.tree, max_size=200)
+        with agent(responder):
+            metrics = snmp_poller.poll_metrics()
+        self.assertGreater(responder.stats['requests'], 2)
+        self.assertEqual(metrics['upf_throughput'], str(self.metrics['upf_throughput']))
+        self.assertEqual(metrics['smf_cpu_utilization'], 'N/A')
+
+    def test_walk_discovers_and_caches_layout(self):
+        """Test that the subtree walk finds table rows and later polls use the cached layout"""
+        tables = NfTables(self.tree)
+        upf = lambda count: [{"id": f"upf-{i:03d}", "status": "active", "capacity": i, "address": "10.0.0.1",
+                              "gtp-u-port": 2152} for i in range(count)]
+        tables.sync({"amf": [{"id": "amf-001", "status": "active", "capacity": 45}], "upf": upf(3)})
+        history = MetricHistory(self.tree, snmp_agent.METRIC_OBJECTS, size=100)
+        for _ in range(100):
+            history.record(self.metrics)
+
+        class Responder(SnmpResponder):
+            # An agent answering tooBig to GETBULKs of more than four columns
+            def _get_bulk(self, request):
+                if len(request.oids) > 4:
+                    return TOO_BIG, 0, None
+                return super()._get_bulk(request)
+
+        responder = Responder(self.tree)
+        snmp_agent.register_responder_stats(self.tree, responder)
+        poller = snmp_poller.SubtreePoller(max_repetitions=10)
+        with agent(responder):
+            first = poller.poll()
+            walked = responder.stats['requests']
+            second = poller.poll()
+            cached = responder.stats['requests'] - walked
+            tables.sync({"amf": [{"id": "amf-001", "status": "active", "capacity": 45}], "upf": upf(4)})
+            third = poller.poll()
+            with_stats = snmp_poller.SubtreePoller(exclude=[snmp_poller.HISTORY_OID]).poll()
+
+        # 8 scalars, 5 UPF columns of 3 rows and 3 AMF columns of 1 row, 10 per GETBULK,
+        # and one more request past each of the agent statistics and the history table
+        self.assertLessEqual(walked, 5)
+        self.assertEqual(len(poller.scalars), 8)
+        self.assertEqual(len(first), 8 + 5 * 3 + 3 + 1)
+        self.assertIn('3.1', with_stats)
+        self.assertFalse([key for key in with_stats if key.startswith('5.')])
+        self.assertEqual(first['amf_active_sessions'], str(self.metrics['amf_active_sessions']))
+        self.assertEqual(first['2.3.1.1[upf-002]'], 'upf-002')
+        self.assertEqual(first['2.1.1.3[amf-001]'], '45')
+        # One GET for the scalars, a GETBULK of all the columns answered tooBig and one for each half
+        self.assertEqual(cached, 4)
+        self.assertEqual({key: value for key, value in second.items() if key != 'timestamp'},
+                         {key: value for key, value in first.items() if key != 'timestamp'})
+        self.assertEqual(third['2.3.1.3[upf-003]'], '3')
+        self.assertEqual(poller.columns[snmp_poller.BASE_ARCS + (2, 3, 1, 5)], 4)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+
+"""
+SNMP Metric Rollup Tests
+"""
+
+import unittest
+from unittest import mock
+import time
+import sys
+import os
+
+import numpy as np
+
+# Add the snmp-monitor directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'management-plane', 'snmp-monitor'))
+
+import snmp_agent
+import snmp_poller
+from snmp_mib import MibTree
+from snmp_rollups import RollupEngine
+from snmp_scheduler import Scheduler
+from snmp_store import parse_timestamp
+from snmp_transport import SnmpResponder
+from test_snmp_poller import agent
+
+class TestRollups(unittest.TestCase):
+
+    def test_aggregates_per_resolution(self):
+        """Test that min/max/avg/p95 are kept per bucket at every resolution"""
+        engine = RollupEngine(resolutions=[(60, 3600), (300, 86400)])
+        for second in range(0, 600, 10):
+            engine.append('upf-001', {'upf_throughput': str(second), 'upf_packet_loss': 'N/A', 'timestamp': second})
+        minute = engine.query('upf-001', 'upf_throughput', 0, 600, resolution=60)
+        np.testing.assert_array_equal(minute['time'], np.arange(0, 600, 60))
+        np.testing.assert_array_equal(minute['min'], np.arange(0, 600, 60))
+        np.testing.assert_array_equal(minute['max'], np.arange(50, 600, 60))
+        np.testing.assert_array_equal(minute['avg'], np.arange(25, 600, 60))
+        np.testing.assert_array_equal(minute['count'], [6] * 10)
+        # The open bucket's percentile is computed on query
+        np.testing.assert_allclose(minute['p95'], np.percentile(np.arange(0, 60, 10), 95) + np.arange(0, 600, 60))
+        five = engine.query('upf-001', 'upf_throughput', 0, 600, resolution=300)
+        np.testing.assert_array_equal(five['avg'], [145, 445])
+        np.testing.assert_array_equal(five['count'], [30, 30])
+        loss = engine.query('upf-001', 'upf_packet_loss', 0, 120, resolution=60)
+        self.assertTrue(np.isnan(loss['avg']).all())
+        np.testing.assert_array_equal(loss['count'], [0, 0])
+
+    def test_long_ranges_use_coarse_resolutions(self):
+        """Test that queries pick the finest resolution within retention and the point limit"""
+        engine = RollupEngine(resolutions=[(60, 3600), (300, 86400), (3600, 30 * 86400)])
+        for minute in range(3 * 24 * 60):
+            engine.append('amf-001', {'amf_cpu_utilization': minute % 100, 'timestamp': minute * 60})
+        end = 3 * 86400
+        self.assertEqual(engine.query('amf-001', 'amf_cpu_utilization', end - 1800, end)['resolution'], 60)
+        self.assertEqual(engine.query('amf-001', 'amf_cpu_utilization', end - 7200, end)['resolution'], 300)
+        self.assertEqual(engine.query('amf-001', 'amf_cpu_utilization', end - 86400, end, max_points=100)['resolution'],
+                         3600)
+        series = engine.query('amf-001', 'amf_cpu_utilization', 0, end)
+        self.assertEqual(series['resolution'], 3600)
+        self.assertEqual(len(series['time']), 72)
+        np.testing.assert_array_equal(series['count'], [60] * 72)
+        # Minute buckets older than their retention have been overwritten
+        old = engine.query('amf-001', 'amf_cpu_utilization', 0, 600, resolution=60)
+        np.testing.assert_array_equal(old['count'], [0] * 10)
+        self.assertEqual(engine.nbytes(), (60 + 288 + 720) * (8 + 36))
+
+    def test_counter_rates(self):
+        """Test that counters are rolled up as rates across 32 and 64 bit wraps, skipping resets"""
+        engine = RollupEngine(resolutions=[(10, 1000)], counters={'in_octets': 32, 'hc_in_octets': 64})
+        readings = [(0, 2 ** 32 - 1000, 2 ** 64 - 1000), (10, 1000, 1000), (20, 3000, 3000),
+                    (30, 10, 10 ** 9), (40, 510, 10 ** 9 + 500)]
+        for second, octets, hc_octets in readings:
+            engine.append('upf-001', {'in_octets': str(octets), 'hc_in_octets': str(hc_octets), 'timestamp': second})
+        rates = engine.query('upf-001', 'in_octets', 0, 50)
+        np.testing.assert_array_equal(rates['avg'], [np.nan, 200, 200, np.nan, 50])
+        hc_rates = engine.query('upf-001', 'hc_in_octets', 0, 50)
+        np.testing.assert_array_equal(hc_rates['avg'], [np.nan, 200, 200, 99999700, 50])
+
+    def test_counter_rates_through_polling(self):
+        """Test that continuous polling reads the default counters, which the walk skips, and rolls up their rates"""
+        tree = MibTree()
+        snmp_agent.register_metrics(tree, dict(snmp_agent.metrics))
+        responder = SnmpResponder(tree)
+        snmp_agent.register_responder_stats(tree, responder)
+        engine = RollupEngine(resolutions=[(86400, 86400)])
+        polls = []
+        sleeps = []
+        append = engine.append
+
+        def record(target, metrics):
+            polls.append((parse_timestamp(metrics['timestamp']), int(metrics['3.1'])))
+            append(target, metrics)
+
+        def sleep(seconds):
+            sleeps.append(seconds)
+            if len(polls) == 4 or len(sleeps) > 20:
+                raise KeyboardInterrupt
+            time.sleep(seconds)
+
+        with agent(responder), mock.patch.object(engine, 'append', record), \
+                mock.patch.object(snmp_poller, 'Scheduler', lambda: Scheduler(sleep=sleep)):
+            snmp_poller.continuous_polling(interval=0.1, export_format='none', walk=True, rollups=engine)
+            target = snmp_poller.SNMP_TARGET
+
+        self.assertEqual(len(polls), 4)
+        rates = [(requests - previous) / (now - then) for (then, previous), (now, requests) in zip(polls, polls[1:])]
+        self.assertTrue(all(rate > 0 for rate in rates))
+        series = engine.query(target, '3.1', polls[0][0], polls[-1][0] + 1)
+        held = series['count'] > 0
+        self.assertEqual(series['count'].sum(), 3)
+        self.assertAlmostEqual((series['avg'][held] * series['count'][held]).sum() / 3, sum(rates) / 3)
+
+if __name__ == '__main__':
+    unittest.main()
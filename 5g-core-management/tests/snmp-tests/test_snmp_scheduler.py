@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+"""
+SNMP Polling Scheduler Tests
+"""
+
+import unittest
+from unittest import mock
+import sys
+import os
+
+# Add the snmp-monitor directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'management-plane', 'snmp-monitor'))
+
+import snmp_poller
+from snmp_exporter import MetricsExporter
+from snmp_scheduler import Scheduler, phase
+
+class FakeClock:
+    """A clock that only moves when slept on or advanced, stopping polling at a time limit"""
+
+    def __init__(self, limit=None):
+        self.now = 1000.0
+        self.limit = limit
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+        if self.limit is not None and self.now > self.limit:
+            raise KeyboardInterrupt
+
+class TestScheduler(unittest.TestCase):
+
+    def test_deadlines_do_not_drift(self):
+        """Test that runs stay on their interval grid whatever they take, skipping deadlines they overran"""
+        clock = FakeClock()
+        scheduler = Scheduler(clock=clock, sleep=clock.sleep)
+        starts = []
+        durations = iter([3, 3, 25, 3, 3])
+        job = scheduler.add('poll', 10, lambda: (starts.append(clock.now), clock.sleep(next(durations))))
+        scheduler.run(5)
+        # The 25 second run overran the deadlines at 1030 and 1040
+        self.assertEqual(starts, [1000, 1010, 1020, 1050, 1060])
+        self.assertEqual((job.stats['runs'], job.stats['missed'], job.stats['errors']), (5, 2, 0))
+
+        late = scheduler.add('late', 10, lambda: None)
+        clock.now += 4
+        scheduler.run_once()
+        self.assertEqual(late.stats['lag'], 4)
+        self.assertIn(('snmp_schedule_missed_deadlines_total', 'Deadlines skipped because a run overran', 'counter',
+                       [({'job': 'poll'}, 2), ({'job': 'late'}, 0)]), scheduler.families())
+
+    def test_phases_are_stable_and_spread(self):
+        """Test that jitter gives each key a fixed offset within its share of the interval"""
+        offsets = [phase(f'upf-{i:03d}', 60, 0.5) for i in range(100)]
+        self.assertEqual(offsets, [phase(f'upf-{i:03d}', 60, 0.5) for i in range(100)])
+        self.assertTrue(all(0 <= offset < 30 for offset in offsets))
+        self.assertGreater(len({int(offset) for offset in offsets}), 20)
+        self.assertEqual(phase('upf-001', 60, 0), 0)
+
+    def test_metric_groups_polled_on_own_intervals(self):
+        """Test that continuous polling runs each metric group on its interval and exports the latest values"""
+        clock = FakeClock(limit=1000 + 125)
+        polls = []
+
+        def poll_metrics(names=None):
+            polls.append((clock.now, names))
+            return dict({name: str(int(clock.now)) for name in names}, timestamp=str(clock.now))
+
+        exporter = MetricsExporter()
+        groups = {'upf': (10, ['upf_throughput']), 'amf': (60, ['amf_cpu_utilization'])}
+        with mock.patch.object(snmp_poller, 'poll_metrics', poll_metrics), \
+                mock.patch.object(snmp_poller, 'Scheduler', lambda: Scheduler(clock=clock, sleep=clock.sleep)):
+            snmp_poller.continuous_polling(interval=30, export_format='none', groups=groups, exporter=exporter)
+
+        times = {}
+        for now, names in polls:
+            times.setdefault(tuple(names), []).append(now - 1000)
+        self.assertEqual(times[('upf_throughput',)], list(range(0, 130, 10)))
+        self.assertEqual(times[('amf_cpu_utilization',)], [0, 60, 120])
+        self.assertEqual(len(times[tuple(name for name, _ in snmp_poller.OID_LIST
+                                         if name not in ('upf_throughput', 'amf_cpu_utilization'))]), 5)
+        text = exporter.body[0].decode()
+        self.assertIn('upf_throughput{target="localhost"} 1120', text)
+        self.assertIn('amf_cpu_utilization{target="localhost"} 1120', text)
+        self.assertIn('snmp_schedule_runs_total{job="upf"} 13', text)
+        with self.assertRaises(ValueError):
+            snmp_poller.continuous_polling(groups={'bad': (10, ['no_such_metric'])})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+
+"""
+SNMP Metric Segment Tests
+"""
+
+import unittest
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+import numpy as np
+
+# Add the snmp-monitor directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'management-plane', 'snmp-monitor'))
+
+import snmp_poller
+from snmp_segments import Segment, SegmentLog, SegmentWriter, convert, directory_target, target_directory
+
+class TestMetricSegments(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_blocks_and_typed_columns(self):
+        """Test that buffered rows are written in blocks of typed columns and read back by time range"""
+        path = os.path.join(self.directory, 'amf.seg')
+        with SegmentWriter(path, ['sessions', 'cpu'], {'sessions': '<i4'}, block_rows=4) as writer:
+            for second in range(10):
+                writer.append({'sessions': str(1000 + second), 'cpu': 'N/A' if second == 3 else second / 2,
+                               'timestamp': second})
+            with Segment(path) as segment:
+                # Two full blocks written, two rows still buffered
+                self.assertEqual([block[0] for block in segment.blocks], [4, 4])
+        with Segment(path) as segment:
+            self.assertEqual(segment.rows, 10)
+            times, values = segment.read(3, 7)
+            self.assertEqual(values['sessions'].dtype, np.int32)
+        np.testing.assert_array_equal(times, [3, 4, 5, 6])
+        np.testing.assert_array_equal(values['sessions'], [1003, 1004, 1005, 1006])
+        np.testing.assert_array_equal(values['cpu'], [np.nan, 2, 2.5, 3])
+        with self.assertRaises(ValueError):
+            SegmentWriter(path, ['sessions'])
+
+    def test_interrupted_block_is_dropped(self):
+        """Test that a block cut short by a crash is ignored and replaced by the next writer"""
+        path = os.path.join(self.directory, 'upf.seg')
+        with SegmentWriter(path, ['throughput'], block_rows=2) as writer:
+            for second in range(4):
+                writer.append({'throughput': second, 'timestamp': second})
+        size = os.path.getsize(path)
+        with open(path, 'r+b') as f:
+            f.truncate(size - 4)
+        with Segment(path) as segment:
+            self.assertEqual(segment.rows, 2)
+        with SegmentWriter(path, ['throughput']) as writer:
+            writer.append({'throughput': 9, 'timestamp': 9})
+        with Segment(path) as segment:
+            times, values = segment.read()
+        np.testing.assert_array_equal(times, [0, 1, 9])
+        np.testing.assert_array_equal(values['throughput'], [0, 1, 9])
+
+    def test_convert_poller_exports(self):
+        """Test that CSV, JSON and fleet JSON lines exports convert to segment logs"""
+        csv_path = os.path.join(self.directory, 'metrics.csv')
+        first = {name: '1' for name, _ in snmp_poller.OID_LIST}
+        snmp_poller.export_to_csv(dict(first, timestamp='2024-01-01T00:00:00'), csv_path)
+        snmp_poller.export_to_csv(dict(first, timestamp='2024-01-01T00:00:10'), csv_path)
+        json_path = os.path.join(self.directory, 'metrics_20240101_000020.json')
+        snmp_poller.export_to_json(dict(first, amf_active_sessions='7', timestamp='2024-01-01T00:00:20'), json_path)
+        fleet_path = os.path.join(self.directory, 'fleet.jsonl')
+        with open(fleet_path, 'w') as f:
+            for target in ('amf-001', 'amf-002'):
+                f.write(json.dumps({'target': target, 'amf_active_sessions': '3', 'latency_ms': 1.2,
+                                    'timestamp': '2024-01-01T00:00:00'}) + '\n')
+
+        output = os.path.join(self.directory, 'segments')
+        self.assertEqual(convert([csv_path, json_path, fleet_path], output), 5)
+        with SegmentLog(output) as log:
+            self.assertEqual(len(log.segments()), 1)
+            times, values = log.read()
+        self.assertEqual(list(values), [name for name, _ in snmp_poller.OID_LIST])
+        np.testing.assert_array_equal(np.diff(times), [10, 10])
+        np.testing.assert_array_equal(values['amf_active_sessions'], [1, 1, 7])
+        with SegmentLog(os.path.join(output, 'amf-002')) as log:
+            times, values = log.read()
+        self.assertEqual(list(values), ['amf_active_sessions', 'latency_ms'])
+        np.testing.assert_array_equal(values['latency_ms'], [1.2])
+
+    def test_convert_keeps_targets_inside_the_output(self):
+        """Test that target names from the data cannot place segment logs outside the output directory"""
+        fleet_path = os.path.join(self.directory, 'fleet.jsonl')
+        targets = ['../escaped', '..', '.', '/tmp/absolute', 'a/b', 'upf-001%2F', 'upf 001']
+        with open(fleet_path, 'w') as f:
+            for target in targets:
+                f.write(json.dumps({'target': target, 'amf_active_sessions': '3',
+                                    'timestamp': '2024-01-01T00:00:00'}) + '\n')
+        output = os.path.join(self.directory, 'segments')
+        self.assertEqual(convert([fleet_path], output), len(targets))
+        self.assertEqual(sorted(os.listdir(self.directory)), ['fleet.jsonl', 'segments'])
+        names = os.listdir(output)
+        self.assertEqual(len(names), len(targets))
+        self.assertEqual(sorted(map(directory_target, names)), sorted(targets))
+        self.assertEqual(target_directory('../escaped'), '..%2Fescaped')
+        self.assertEqual(target_directory('..'), '%2E%2E')
+
+    def test_new_segment_when_metrics_change(self):
+        """Test that the log starts a segment when the polled metrics change or a segment is full"""
+        with SegmentLog(self.directory, segment_rows=3) as log:
+            for second in range(4):
+                log.append({'cpu': second, 'timestamp': second})
+            log.append({'cpu': 4, 'memory': 40, 'timestamp': 4})
+            times, values = log.read(1)
+        with SegmentLog(self.directory) as log:
+            self.assertEqual(len(log.segments()), 3)
+            log.append({'cpu': 5, 'memory': 50, 'timestamp': 5})
+            self.assertEqual(len(log.segments()), 3)
+        np.testing.assert_array_equal(times, [1, 2, 3, 4])
+        np.testing.assert_array_equal(values['memory'], [np.nan, np.nan, np.nan, 40])
+
+if __name__ == '__main__':
+    unittest.main()
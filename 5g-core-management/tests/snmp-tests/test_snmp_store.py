@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+"""
+SNMP Time-Series Store Tests
+"""
+
+import unittest
+import sys
+import os
+
+import numpy as np
+
+# Add the snmp-monitor directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'management-plane', 'snmp-monitor'))
+
+from snmp_store import MetricStore, parse_timestamp
+
+class TestMetricStore(unittest.TestCase):
+
+    def test_ring_keeps_latest_samples(self):
+        """Test that a full ring overwrites the oldest samples and windows span the wrap"""
+        store = MetricStore(capacity=4)
+        for second in range(6):
+            store.append('amf-001', {'amf_active_sessions': str(100 + second), 'timestamp': second})
+        times, values = store.window('amf-001', 0, 10)
+        np.testing.assert_array_equal(times, [2, 3, 4, 5])
+        np.testing.assert_array_equal(values[:, 0], [102, 103, 104, 105])
+        times, values = store.window('amf-001', 3, 5, ['amf_active_sessions', 'unknown'])
+        np.testing.assert_array_equal(times, [3, 4])
+        self.assertTrue(np.isnan(values[:, 1]).all())
+        self.assertEqual(store.nbytes(), 2 * 4 * 8)
+        # A sample older than the latest is counted and dropped, not stored
+        store.append('amf-001', {'amf_active_sessions': '1', 'timestamp': 1})
+        self.assertEqual(store.stats, {'samples': 6, 'late': 1, 'dropped_values': 0})
+        np.testing.assert_array_equal(store.window('amf-001', 0, 10)[0], [2, 3, 4, 5])
+
+    def test_poller_results(self):
+        """Test that poller results are stored by timestamp with N/A and new metrics as NaN"""
+        store = MetricStore(capacity=8, dtype=np.float32)
+        store.append('upf-001', {'target': 'upf-001', 'upf_throughput': '950', 'upf_packet_loss': 'N/A',
+                                 'timestamp': '2024-01-01T00:00:00'})
+        store.append('upf-001', {'target': 'upf-001', 'upf_throughput': '960', 'upf_packet_loss': '5',
+                                 'latency_ms': 1.5, 'timestamp': '2024-01-01T00:00:10'})
+        start = parse_timestamp('2024-01-01T00:00:00')
+        times, values = store.window('upf-001', '2024-01-01T00:00:00', start + 60)
+        np.testing.assert_array_equal(times - start, [0, 10])
+        # The poll's latency is not a metric of the target
+        self.assertEqual(sorted(store.targets['upf-001'].columns), ['upf_packet_loss', 'upf_throughput'])
+        self.assertEqual(values.dtype, np.float32)
+        np.testing.assert_array_equal(values[:, 1], [950, 960])
+        self.assertEqual(np.isnan(values[0]).sum(), 1)
+        self.assertEqual(values[1, 0], 5)
+
+    def test_metric_limits(self):
+        """Test that a target stores at most max_metrics metrics, and only allowed metrics if given"""
+        store = MetricStore(capacity=4, max_metrics=3)
+        for second in range(3):
+            store.append('upf-001', {f'2.3.1.3[upf-{i:03d}]': i for i in range(second * 2, second * 2 + 4)}
+                         | {'timestamp': second})
+        self.assertEqual(sorted(store.targets['upf-001'].columns),
+                         ['2.3.1.3[upf-000]', '2.3.1.3[upf-001]', '2.3.1.3[upf-002]'])
+        self.assertEqual(store.stats['dropped_values'], 1 + 3 + 4)
+        self.assertEqual(store.nbytes(), 4 * 4 * 8)
+
+        store = MetricStore(capacity=4, metrics=['upf_throughput'])
+        store.append('upf-001', {'upf_throughput': '950', 'upf_packet_loss': '5', 'timestamp': 0})
+        self.assertEqual(list(store.targets['upf-001'].columns), ['upf_throughput'])
+
+    def test_aligned_targets(self):
+        """Test that several targets are resampled onto a common grid with stale samples left out"""
+        store = MetricStore(capacity=16)
+        for second in (0, 10, 20, 30):
+            store.append('amf-001', {'cpu': second, 'timestamp': second + 1})
+        store.append('amf-002', {'cpu': 7, 'timestamp': 2})
+        grid, values = store.aligned(['amf-001', 'amf-002', 'amf-003'], 'cpu', 0, 40, 10)
+        np.testing.assert_array_equal(grid, [0, 10, 20, 30])
+        np.testing.assert_array_equal(values[0], [np.nan, 0, 10, 20])
+        np.testing.assert_array_equal(values[1], [np.nan, 7, np.nan, np.nan])
+        self.assertTrue(np.isnan(values[2]).all())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+
+"""
+SNMP NF Instance Table Tests
+"""
+
+import unittest
+from unittest import mock
+import io
+import threading
+import sys
+import os
+
+# Add the snmp-monitor directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'management-plane', 'snmp-monitor'))
+
+from pysnmp.proto.api import v2c
+
+from snmp_mib import MibTree, MibInstrumController
+import snmp_tables
+from snmp_tables import NfTables, NF_TABLES, string_index
+
+UPF_ENTRY = NF_TABLES['upf'][0] + (1,)
+
+def upfs(count, start=0):
+    return [{"id": f"upf-{i:04d}", "status": "active", "capacity": i % 100,
+             "address": f"10.0.{i // 256}.{i % 256}", "gtp-u-port": 2152}
+            for i in range(start, start + count)]
+
+class TestNfTables(unittest.TestCase):
+
+    def setUp(self):
+        self.tree = MibTree()
+        self.tables = NfTables(self.tree)
+        self.instrum = MibInstrumController(self.tree)
+
+    def walk(self, prefix, repetitions=50):
+        """Walk a subtree the way GETBULK does, returning the OIDs and values seen"""
+        walked = []
+        name = v2c.ObjectIdentifier(prefix)
+        while True:
+            for _ in range(repetitions):
+                name, value = self.instrum.readNextVars([(name, v2c.Null())])[0]
+                if value.tagSet == v2c.EndOfMibView.tagSet or tuple(name)[:len(prefix)] != prefix:
+                    return walked
+                walked.append((tuple(name), value))
+
+    def test_rows_are_indexed_by_instance_id(self):
+        """Test that each NF instance becomes a row indexed by its id"""
+        self.tables.sync({"upf": upfs(3)})
+        name = v2c.ObjectIdentifier(UPF_ENTRY + (4,) + string_index("upf-0001"))
+        value = self.instrum.readVars([(name, v2c.Null())])[0][1]
+        self.assertEqual(value.prettyPrint(), "10.0.0.1")
+
+    def test_walk_is_column_major_and_sorted(self):
+        """Test that a table walk returns every column of every row in lexicographic order"""
+        self.tables.sync({"upf": upfs(1000)})
+        walked = [oid for oid, _ in self.walk(UPF_ENTRY)]
+        self.assertEqual(len(walked), 1000 * 5)
+        self.assertEqual(walked, sorted(walked))
+        self.assertEqual(walked[0], UPF_ENTRY + (1,) + string_index("upf-0000"))
+
+    def test_sync_adds_and_removes_only_changed_rows(self):
+        """Test that sync only touches instances that came or went, and values follow updates"""
+        self.assertEqual(self.tables.sync({"upf": upfs(100)}), (100, 0))
+        changed = upfs(90, start=10) + upfs(5, start=200)
+        changed[0]["status"] = "inactive"
+        self.assertEqual(self.tables.sync({"upf": changed}), (5, 10))
+        walked = dict(self.walk(UPF_ENTRY + (2,)))
+        self.assertEqual(len(walked), 95)
+        self.assertEqual(str(walked[UPF_ENTRY + (2,) + string_index("upf-0010")]), "inactive")
+        self.assertNotIn(UPF_ENTRY + (2,) + string_index("upf-0000"), walked)
+
+    def test_malformed_instances_do_not_stop_the_sync(self):
+        """Test that malformed instances are skipped and reported, and the sync thread keeps running"""
+        log = io.StringIO()
+        self.tables.sync({"upf": upfs(2), "smf": [{"id": "smf-1"}]})
+        self.assertEqual(self.tables.sync({"upf": upfs(3) + [{"status": "active"}, "upf-9", {"id": ["x"]}],
+                                           "smf": {"id": "smf-1"}}, log=log), (1, 0))
+        self.assertEqual(sorted(self.tables.rows("upf")), ["upf-0000", "upf-0001", "upf-0002"])
+        # Instances that are not a list keep the rows served before
+        self.assertEqual(list(self.tables.rows("smf")), ["smf-1"])
+        self.assertEqual(len(log.getvalue().splitlines()), 4)
+
+        stop = threading.Event()
+        payloads = iter([["not", "an", "object"], {"upf": [None, 7] + upfs(4)}])
+
+        def fetch(url):
+            try:
+                return next(payloads)
+            except StopIteration:
+                stop.set()
+                raise OSError("connection refused")
+
+        with mock.patch.object(snmp_tables, 'fetch_network_functions', fetch), \
+                mock.patch('sys.stderr', io.StringIO()), mock.patch('sys.stdout', io.StringIO()):
+            snmp_tables.sync_network_functions(self.tables, 'http://nf', interval=0, stop=stop)
+        self.assertEqual(len(self.tables.rows("upf")), 4)
+
+if __name__ == '__main__':
+    unittest.main()
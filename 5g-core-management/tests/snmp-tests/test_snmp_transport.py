@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+
+"""
+SNMP asyncio Transport Tests
+"""
+
+import unittest
+import asyncio
+import socket
+import sys
+import os
+
+# Add the snmp-monitor directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'management-plane', 'snmp-monitor'))
+
+from pyasn1.codec.ber import encoder, decoder
+from pysnmp.proto import api
+from pysnmp.proto.api import v1, v2c
+
+import snmp_agent
+from snmp_mib import MibTree
+from snmp_tables import NfTables
+from snmp_collectors import MetricsSnapshot
+from snmp_transport import SnmpResponder, serve
+
+AMF_SESSIONS = snmp_agent.AMF_ACTIVE_SESSIONS_OID + (0,)
+
+def request(pdu_class, oids, version=v2c, community='public', request_id=7, **fields):
+    pdu = pdu_class()
+    version.apiPDU.setDefaults(pdu)
+    version.apiPDU.setRequestID(pdu, request_id)
+    version.apiPDU.setVarBinds(pdu, [(oid, version.Null()) for oid in oids])
+    for name, value in fields.items():
+        getattr(v2c.apiBulkPDU, 'set' + name)(pdu, value)
+    message = version.Message()
+    version.apiMessage.setDefaults(message)
+    version.apiMessage.setCommunity(message, community)
+    version.apiMessage.setPDU(message, pdu)
+    return encoder.encode(message)
+
+def response(data):
+    version = api.protoModules[int(api.decodeMessageVersion(data))]
+    message, _ = decoder.decode(data, asn1Spec=version.Message())
+    pdu = version.apiMessage.getPDU(message)
+    return (version.apiPDU.getRequestID(pdu), int(version.apiPDU.getErrorStatus(pdu)),
+            int(version.apiPDU.getErrorIndex(pdu)),
+            [(tuple(oid), value) for oid, value in version.apiPDU.getVarBinds(pdu)])
+
+class TestSnmpTransport(unittest.TestCase):
+
+    def setUp(self):
+        self.metrics = dict(snmp_agent.metrics)
+        self.tree = MibTree()
+        snmp_agent.register_metrics(self.tree, self.metrics)
+        self.responder = SnmpResponder(self.tree)
+
+    def test_get_over_udp(self):
+        """Test that a GET sent over UDP is answered from the MIB tree"""
+        async def main():
+            loop = asyncio.get_running_loop()
+            address = loop.create_future()
+            server = asyncio.ensure_future(serve(self.responder, '127.0.0.1', 0, started=address.set_result))
+            host, port = await address
+            client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            client.setblocking(False)
+            try:
+                await loop.sock_sendto(client, request(v2c.GetRequestPDU, [AMF_SESSIONS]), (host, port))
+                return await asyncio.wait_for(loop.sock_recv(client, 65535), 5)
+            finally:
+                client.close()
+                server.cancel()
+
+        request_id, status, _, varbinds = response(asyncio.run(main()))
+        self.assertEqual((request_id, status), (7, 0))
+        self.assertEqual(varbinds, [(AMF_SESSIONS, v2c.Gauge32(self.metrics['amf_active_sessions']))])
+
+    def test_getnext_and_errors(self):
+        """Test GETNEXT, noSuchInstance, SNMPv1 noSuchName, SET and an unknown community"""
+        _, _, _, varbinds = response(self.responder.respond(request(
+            v2c.GetNextRequestPDU, [snmp_agent.BASE_OID, snmp_agent.UPF_PACKET_LOSS_OID + (0,)])))
+        self.assertEqual(varbinds[0], (AMF_SESSIONS, v2c.Gauge32(self.metrics['amf_active_sessions'])))
+        self.assertEqual(varbinds[1][1].tagSet, v2c.EndOfMibView.tagSet)
+
+        _, _, _, varbinds = response(self.responder.respond(request(
+            v2c.GetRequestPDU, [snmp_agent.AMF_ACTIVE_SESSIONS_OID])))
+        self.assertEqual(varbinds[0][1].tagSet, v2c.NoSuchInstance.tagSet)
+
+        _, status, index, _ = response(self.responder.respond(request(
+            v1.GetRequestPDU, [AMF_SESSIONS, snmp_agent.BASE_OID + (9, 0)], version=v1)))
+        self.assertEqual((status, index), (2, 2))
+
+        _, status, _, _ = response(self.responder.respond(request(v2c.SetRequestPDU, [AMF_SESSIONS])))
+        self.assertEqual(status, 17)
+
+        self.assertIsNone(self.responder.respond(request(v2c.GetRequestPDU, [AMF_SESSIONS], community='private')))
+        self.assertIsNone(self.responder.respond(b'\x30\x03\x02\x01'))
+
+    def test_getbulk_walks_tables(self):
+        """Test GETBULK repetitions over the NF tables, endOfMibView and truncation to the message size"""
+        NfTables(self.tree).sync({"upf": [{"id": f"upf-{i:03d}", "status": "active", "capacity": i,
+                                          "address": "10.0.0.1", "gtp-u-port": 2152} for i in range(100)]})
+        upf_table = snmp_agent.BASE_OID + (2, 3)
+        _, status, _, varbinds = response(self.responder.respond(request(
+            v2c.GetBulkRequestPDU, [snmp_agent.BASE_OID, upf_table], NonRepeaters=1, MaxRepetitions=600)))
+        self.assertEqual(status, 0)
+        self.assertEqual(varbinds[0][0], AMF_SESSIONS)
+        walked = [oid for oid, value in varbinds[1:] if value.tagSet != v2c.EndOfMibView.tagSet]
+        self.assertEqual(walked, sorted(walked))
+        self.assertEqual(len(walked), 500)
+        self.assertEqual(varbinds[-1][1].tagSet, v2c.EndOfMibView.tagSet)
+
+        small = SnmpResponder(self.tree, max_size=1400)
+        data = small.respond(request(v2c.GetBulkRequestPDU, [upf_table], MaxRepetitions=600))
+        self.assertLessEqual(len(data), 1400)
+        self.assertGreater(len(response(data)[3]), 20)
+        upf_column = upf_table + (1, 3)
+        column_request = request(v2c.GetBulkRequestPDU, [upf_column], MaxRepetitions=200)
+        for max_size in range(300, 1600):
+            # Truncated to what fits whatever the size of the length fields, never tooBig
+            data = SnmpResponder(self.tree, max_size=max_size).respond(column_request)
+            self.assertTrue(max_size - 40 < len(data) <= max_size, f"max_size {max_size}: {len(data)} bytes")
+
+    def test_response_cache_per_generation(self):
+        """Test that repeated requests are served from the cache until the metrics or tables change"""
+        snapshot = MetricsSnapshot(self.metrics)
+        tree = MibTree()
+        snmp_agent.register_metrics(tree, snapshot)
+        tables = NfTables(tree)
+        responder = SnmpResponder(tree, snapshot=snapshot, uncached=(snmp_agent.AGENT_STATS_OID,))
+        snmp_agent.register_responder_stats(tree, responder)
+        walk = lambda request_id: response(responder.respond(request(
+            v2c.GetBulkRequestPDU, [snmp_agent.BASE_OID], request_id=request_id, MaxRepetitions=9)))
+        amf_capacity = snmp_agent.BASE_OID + (2, 1, 1, 3, 7) + tuple(b'amf-001')
+
+        first = walk(1)
+        second = walk(300000)
+        self.assertEqual(second[0], 300000)
+        self.assertEqual(first[1:], second[1:])
+        self.assertEqual((responder.stats['cache_hits'], responder.stats['cache_misses']), (1, 1))
+
+        snapshot.publish({'amf_active_sessions': 1499})
+        self.assertEqual(walk(2)[3][0][1], v2c.Gauge32(1499))
+        tables.sync({"amf": [{"id": "amf-001", "status": "active", "capacity": 10}]})
+        response(responder.respond(request(v2c.GetRequestPDU, [amf_capacity])))
+        tables.sync({"amf": [{"id": "amf-001", "status": "active", "capacity": 20}]})
+        _, _, _, varbinds = response(responder.respond(request(v2c.GetRequestPDU, [amf_capacity])))
+        self.assertEqual(varbinds[0][1], v2c.Gauge32(20))
+        self.assertEqual(responder.stats['cache_misses'], 4)
+
+        # Responses with the agent statistics are never cached
+        stats = [snmp_agent.RESPONSE_CACHE_HITS_OID + (0,), snmp_agent.RESPONSE_CACHE_HIT_RATE_OID + (0,)]
+        for _ in range(2):
+            _, _, _, varbinds = response(responder.respond(request(v2c.GetRequestPDU, stats)))
+        self.assertEqual([int(value) for _, value in varbinds], [1, 1429])
+
+        # Successors are only cached for served instances, not for every OID a client sends
+        for arc in range(2000):
+            responder.respond(request(v2c.GetNextRequestPDU, [snmp_agent.BASE_OID + (1, arc)]))
+        self.assertLess(len(responder._next), 100)
+        self.assertLessEqual(len(responder._responses), responder.cache_size)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+
+"""
+SNMP Threshold Notification Tests
+"""
+
+import unittest
+import asyncio
+import queue
+import socket
+import threading
+import time
+import sys
+import os
+
+# Add the snmp-monitor directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'management-plane', 'snmp-monitor'))
+
+from pysnmp.proto.api import v2c
+
+import snmp_agent
+from snmp_collectors import MetricsSnapshot
+from snmp_traps import (ThresholdRule, ThresholdMonitor, NotificationSender, TokenBucket, TrapReceiver,
+                        parse_receivers, THRESHOLD_RISING_OID, THRESHOLD_CLEARED_OID, SNMP_TRAP_OID,
+                        RULE_NAME_OID, INFORM)
+from snmp_transport import Request
+
+def start_receiver(drop_informs=0):
+    """Run a trap receiver on a thread; return its address and a queue of (kind, varbinds)"""
+    received = queue.Queue()
+    address = queue.Queue()
+    dropped = []
+
+    class DroppingReceiver(TrapReceiver):
+        def datagram_received(self, data, peer):
+            if len(dropped) < drop_informs and Request.decode(data).pdu_type == INFORM:
+                dropped.append(data)
+                return
+            super().datagram_received(data, peer)
+
+    async def main():
+        loop = asyncio.get_running_loop()
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: DroppingReceiver(lambda kind, varbinds: received.put((kind, dict(varbinds)))),
+            local_addr=('127.0.0.1', 0))
+        address.put(transport.get_extra_info('sockname'))
+        await asyncio.sleep(10)
+
+    threading.Thread(target=asyncio.run, args=(main(),), daemon=True).start()
+    return address.get(timeout=5), received
+
+class TestThresholdNotifications(unittest.TestCase):
+
+    def test_hysteresis(self):
+        """Test that rules rise at the threshold, hold between the levels and clear at the clear level"""
+        rule = ThresholdRule('cpu', 'amf_cpu_utilization', 90, 80)
+        self.assertEqual([rule.evaluate(value) for value in (50, 91, 95, 85, 91, 80, 85)],
+                         [None, 'rising', None, None, None, 'cleared', None])
+        drop = ThresholdRule('throughput', 'upf_throughput', 10, 50, direction='below')
+        self.assertEqual([drop.evaluate(value) for value in (100, 9, 30, 50)], [None, 'rising', None, 'cleared'])
+        with self.assertRaises(ValueError):
+            ThresholdRule('bad', 'amf_cpu_utilization', 80, 90)
+        self.assertEqual(parse_receivers('trap:127.0.0.1:162, inform:nms:1162'),
+                         [('trap', ('127.0.0.1', 162)), ('inform', ('nms', 1162))])
+
+    def test_token_bucket(self):
+        """Test that the token bucket allows bursts and then its rate"""
+        now = [0.0]
+        bucket = TokenBucket(rate=2, burst=3, clock=lambda: now[0])
+        self.assertEqual([bucket.take() for _ in range(4)], [True, True, True, False])
+        now[0] = 1.0
+        self.assertEqual([bucket.take() for _ in range(3)], [True, True, False])
+
+        # Taken from several threads at once, the bucket never allows more than its burst
+        bucket = TokenBucket(rate=0, burst=100, clock=lambda: now[0])
+        taken = []
+        threads = [threading.Thread(target=lambda: taken.extend(bucket.take() for _ in range(1000)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(taken.count(True), 100)
+
+    def test_rate_limit_spares_cleared_notifications(self):
+        """Test that a cleared notification is never rate limited and a dropped rising one is sent again"""
+        (host, port), received = start_receiver()
+        sender = NotificationSender([('trap', (host, port))])
+        now = [0.0]
+        sender.bucket = TokenBucket(rate=1, burst=1, clock=lambda: now[0])
+        sender.start()
+        snapshot = MetricsSnapshot({'upf_packet_loss': 0.01})
+        ThresholdMonitor([ThresholdRule('upf-packet-loss', 'upf_packet_loss', 0.08, 0.05)], sender,
+                         snmp_agent.METRIC_OBJECTS).attach(snapshot)
+        try:
+            for loss in (0.09, 0.02, 0.09):
+                snapshot.publish({'upf_packet_loss': loss})
+            now[0] = 1.0
+            snapshot.publish({'upf_packet_loss': 0.10})
+            notifications = [received.get(timeout=5) for _ in range(3)]
+        finally:
+            sender.stop()
+
+        self.assertEqual([tuple(varbinds[SNMP_TRAP_OID]) for _, varbinds in notifications],
+                         [THRESHOLD_RISING_OID, THRESHOLD_CLEARED_OID, THRESHOLD_RISING_OID])
+        self.assertEqual(notifications[2][1][snmp_agent.UPF_PACKET_LOSS_OID + (0,)], v2c.Gauge32(10))
+        self.assertEqual(sender.stats['rate_limited'], 1)
+
+    def test_traps_and_informs_from_published_metrics(self):
+        """Test that threshold crossings in published snapshots reach trap and inform receivers"""
+        (host, port), received = start_receiver(drop_informs=1)
+        # The receiver drops the rising inform, which is then resent
+        sender = NotificationSender([('inform', (host, port)), ('trap', (host, port))], timeout=0.2)
+        sender.start()
+        snapshot = MetricsSnapshot({'upf_packet_loss': 0.01})
+        ThresholdMonitor([ThresholdRule('upf-packet-loss', 'upf_packet_loss', 0.08, 0.05)], sender,
+                         snmp_agent.METRIC_OBJECTS).attach(snapshot)
+        try:
+            for loss in (0.09, 0.07, 0.02):
+                snapshot.publish({'upf_packet_loss': loss})
+            notifications = [received.get(timeout=5) for _ in range(4)]
+        finally:
+            sender.stop()
+
+        kinds = sorted((kind, tuple(varbinds[SNMP_TRAP_OID])) for kind, varbinds in notifications)
+        self.assertEqual(kinds, [('inform', THRESHOLD_RISING_OID), ('inform', THRESHOLD_CLEARED_OID),
+                                 ('trap', THRESHOLD_RISING_OID), ('trap', THRESHOLD_CLEARED_OID)])
+        rising = next(varbinds for kind, varbinds in notifications
+                      if tuple(varbinds[SNMP_TRAP_OID]) == THRESHOLD_RISING_OID)
+        self.assertEqual(rising[snmp_agent.UPF_PACKET_LOSS_OID + (0,)], v2c.Gauge32(9))
+        self.assertEqual(str(rising[RULE_NAME_OID]), 'upf-packet-loss')
+        self.assertEqual((sender.stats['traps_sent'], sender.stats['retries'],
+                          sender.stats['informs_acknowledged']), (2, 1, 2))
+
+    def test_unacknowledged_informs_back_off_and_fail(self):
+        """Test that informs to a silent receiver are retried with backoff and notifications rate limited"""
+        silent = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        silent.bind(('127.0.0.1', 0))
+        silent.settimeout(2)
+        sender = NotificationSender([('inform', silent.getsockname())], timeout=0.05, retries=2, rate=1, burst=1)
+        sender.start()
+        try:
+            self.assertTrue(sender.notify(THRESHOLD_RISING_OID, []))
+            self.assertFalse(sender.notify(THRESHOLD_RISING_OID, []))
+            arrivals = []
+            for _ in range(3):
+                silent.recv(1500)
+                arrivals.append(time.monotonic())
+        finally:
+            sender.stop()
+            silent.close()
+        # Resent after 0.05 s and then after 0.1 s
+        self.assertGreater(arrivals[2] - arrivals[1], (arrivals[1] - arrivals[0]) * 1.5)
+        self.assertEqual(sender.stats['rate_limited'], 1)
+
+if __name__ == '__main__':
+    unittest.main()